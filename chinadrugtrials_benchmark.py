@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+解析性能基准测试（使用本地保存的响应文件，不访问网站）
+
+    python chinadrugtrials_benchmark.py list output/response_page_*.html
+    python chinadrugtrials_benchmark.py detail output/trial_detail_*.html
+    python chinadrugtrials_benchmark.py memory output/trial_detail_*.html
+    python chinadrugtrials_benchmark.py compress output/temp_response_page_*.html
+    python chinadrugtrials_benchmark.py compress --pack output/pages.pack
+"""
+
+import sys
+import time
+import glob
+import codecs
+import timeit
+import tracemalloc
+import logging
+import argparse
+
+
+def load_pages(patterns):
+    """
+    读取匹配的HTML文件，返回 [(文件名, 内容), ...]
+    """
+    pages = []
+    for pattern in patterns:
+        for filename in sorted(glob.glob(pattern)):
+            with open(filename, 'r', encoding='utf-8') as f:
+                pages.append((filename, f.read()))
+    return pages
+
+
+def bench(func, number):
+    """
+    执行 number 次，返回每次的平均耗时（毫秒），取3轮中最快的一轮
+    """
+    return min(timeit.repeat(func, number=number, repeat=3)) / number * 1000
+
+
+def bench_list(pages, number):
+    """
+    比较列表页的正则快速解析和DOM解析，并检查两者结果一致
+    """
+    from chinadrugtrials_extract import ChinaDrugTrialsSearcher
+    from chinadrugtrials_parser import parse_list_rows, parse_page_info
+
+    searcher = ChinaDrugTrialsSearcher()
+    print(f"{'文件':<40} {'行数':>4} {'正则(ms)':>10} {'DOM(ms)':>10} {'加速':>8}  结果")
+    for filename, html_content in pages:
+        fast = parse_list_rows(html_content)
+        dom = searcher._extract_rows_dom(html_content)
+        if fast is None:
+            status = "未通过校验（使用DOM）"
+        elif fast == dom:
+            status = "一致"
+        else:
+            status = "不一致"
+
+        fast_ms = bench(lambda: (parse_list_rows(html_content), parse_page_info(html_content)), number)
+        dom_ms = bench(lambda: searcher._extract_rows_dom(html_content), number)
+        print(f"{filename:<40} {len(dom):>4} {fast_ms:>10.3f} {dom_ms:>10.3f} {dom_ms / fast_ms:>7.1f}x  {status}")
+
+
+def bench_detail(pages, number):
+    """
+    比较详细信息页整页构建DOM树和一次遍历提取全部部分的事件驱动解析
+    """
+    from bs4 import BeautifulSoup
+    from chinadrugtrials_detail import parse_detail_page
+
+    print(f"{'文件':<40} {'页面(KB)':>9} {'部分数':>6} {'DOM(ms)':>10} {'单遍(ms)':>10} {'加速':>8}")
+    for filename, html_content in pages:
+        record = parse_detail_page(html_content)
+        if not record.part_titles:
+            print(f"{filename:<40} 未找到详细信息部分")
+            continue
+        whole_ms = bench(lambda: BeautifulSoup(html_content, 'html.parser'), number)
+        single_ms = bench(lambda: parse_detail_page(html_content), number)
+        print(f"{filename:<40} {len(html_content) / 1024:>9.1f} {len(record.part_titles):>6} {whole_ms:>10.3f} {single_ms:>10.3f} {whole_ms / single_ms:>7.1f}x")
+
+
+def peak_memory(func):
+    """
+    执行 func()，返回 (内存峰值KB, 耗时ms)
+    """
+    tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        func()
+        elapsed = (time.perf_counter() - started) * 1000
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / 1024, elapsed
+
+
+def bench_memory(filenames, chunk_size):
+    """
+    比较详细信息页的内存峰值：整体读取后解析 vs 按块流式解析（与 --stream 相同，只解析研究者信息部分）
+    """
+    from chinadrugtrials_detail_extractor_v1 import ChinaDrugTrialsDetailExtractor
+    from chinadrugtrials_detail import DetailPageParser
+
+    extractor = ChinaDrugTrialsDetailExtractor(save_raw=False)
+
+    def buffered(filename):
+        with open(filename, 'rb') as f:
+            body = f.read()
+        detail = extractor.extract_trial_detail(body.decode('utf-8'))
+        return {'研究者信息': detail['研究者信息']} if detail else {}
+
+    def streamed(filename):
+        parser = DetailPageParser(parts=('researchers',))
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        with open(filename, 'rb') as f:
+            # 与 iter_content 相同，每次只读取一块
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                parser.feed(decoder.decode(chunk))
+                if parser.done:
+                    break
+        parser.close()
+        detail = parser.record.to_dict()
+        return {'研究者信息': detail['研究者信息']} if '研究者信息' in detail else {}
+
+    print(f"{'文件':<40} {'机构数':>6} {'整体峰值(KB)':>13} {'流式峰值(KB)':>13} {'整体(ms)':>10} {'流式(ms)':>10}  结果")
+    for filename in filenames:
+        result = {}
+        buffered_kb, buffered_ms = peak_memory(lambda: result.update(buffered=buffered(filename)))
+        streamed_kb, streamed_ms = peak_memory(lambda: result.update(streamed=streamed(filename)))
+        institutions = len(result['streamed'].get('研究者信息', {}).get('各参加机构信息', []))
+        status = "一致" if result['buffered'] == result['streamed'] else "不一致"
+        print(f"{filename:<40} {institutions:>6} {buffered_kb:>13.0f} {streamed_kb:>13.0f} {buffered_ms:>10.1f} {streamed_ms:>10.1f}  {status}")
+
+
+def bench_compress(pages, number):
+    """
+    比较原始页面的存储方式：不压缩、zlib、zlib + 训练的预设字典（压缩后大小和解压吞吐量）
+
+    页面不少于4个时用一半页面训练字典、另一半测试，避免用测试页面本身训练。
+    """
+    from chinadrugtrials_pack import compress_page, decompress_page, train_dictionary
+
+    if len(pages) >= 4:
+        training, testing = pages[::2], pages[1::2]
+    else:
+        training = testing = pages
+    started = time.perf_counter()
+    zdict = train_dictionary(training)
+    train_ms = (time.perf_counter() - started) * 1000
+    print(f"训练页面 {len(training)} 个，测试页面 {len(testing)} 个，字典 {len(zdict)} 字节，训练耗时 {train_ms:.0f} ms")
+
+    raw_size = sum(len(page) for page in testing)
+    print(f"{'方式':<16} {'大小(KB)':>10} {'压缩率':>8} {'压缩(ms/页)':>12} {'解压(MB/s)':>12}")
+    print(f"{'不压缩':<16} {raw_size / 1024:>10.0f} {1:>8.2f} {'-':>12} {'-':>12}")
+    for name, method_dict in (("zlib", None), ("zlib + 字典", zdict)):
+        compressed = [compress_page(page, method_dict) for page in testing]
+        size = sum(len(data) for data in compressed)
+        compress_ms = bench(lambda: [compress_page(page, method_dict) for page in testing], number) / len(testing)
+        decompress_ms = bench(lambda: [decompress_page(data, method_dict) for data in compressed], number)
+        assert [decompress_page(data, method_dict) for data in compressed] == testing
+        print(f"{name:<16} {size / 1024:>10.0f} {raw_size / size:>8.2f} {compress_ms:>12.2f} {raw_size / 1024 / 1024 / (decompress_ms / 1000):>12.0f}")
+
+
+def load_packed(pack_file):
+    """
+    读取包文件中每个请求的最新页面（解压后），返回 [(名称, 内容bytes), ...]
+    """
+    from chinadrugtrials_pack import PackStore
+
+    pages = PackStore(pack_file, readonly=True)
+    return [(f"{entry.endpoint}:{entry.payload}", bytes(pages.view(entry.offset, entry.length, entry.flags)))
+            for entry in pages.entries()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='解析性能基准测试（使用本地保存的响应文件）')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    list_parser = subparsers.add_parser('list', help='列表页：正则快速解析 vs DOM解析')
+    list_parser.add_argument('files', nargs='*', default=["response_page_*.html", "output/response_page_*.html"], help='列表页HTML文件（支持通配符）')
+    list_parser.add_argument('-n', '--number', type=int, default=20, help='每轮执行次数，默认为20')
+
+    detail_parser = subparsers.add_parser('detail', help='详细信息页：整页构建DOM vs 单遍提取全部部分')
+    detail_parser.add_argument('files', nargs='*', default=["trial_detail_*.html", "output/trial_detail_*.html"], help='详细信息页HTML文件（支持通配符）')
+    detail_parser.add_argument('-n', '--number', type=int, default=5, help='每轮执行次数，默认为5')
+
+    memory_parser = subparsers.add_parser('memory', help='详细信息页：整体读取后解析 vs 流式解析的内存峰值')
+    memory_parser.add_argument('files', nargs='*', default=["trial_detail_*.html", "output/trial_detail_*.html"], help='详细信息页HTML文件（支持通配符）')
+    memory_parser.add_argument('--chunk-size', type=int, default=16384, help='流式读取的块大小（字节），默认为16384')
+
+    compress_parser = subparsers.add_parser('compress', help='原始页面：不压缩 vs zlib vs zlib + 训练的字典')
+    compress_parser.add_argument('files', nargs='*', default=["response_page_*.html", "output/response_page_*.html", "output/temp_response_page_*.html"], help='HTML文件（支持通配符）')
+    compress_parser.add_argument('--pack', help='改为使用包文件中的页面')
+    compress_parser.add_argument('-n', '--number', type=int, default=5, help='每轮执行次数，默认为5')
+
+    args = parser.parse_args()
+
+    # 基准测试时不输出解析日志
+    logging.disable(logging.INFO)
+
+    if args.command == 'memory':
+        # 内存基准测试自己读取文件，不预先加载
+        filenames = [filename for pattern in args.files for filename in sorted(glob.glob(pattern))]
+        if not filenames:
+            print("没有找到HTML文件")
+            sys.exit(1)
+        bench_memory(filenames, args.chunk_size)
+        return
+
+    if args.command == 'compress':
+        # 按页面类型分别测试（列表页和详细信息页的模板不同）
+        if args.pack:
+            pages = load_packed(args.pack)
+        else:
+            pages = [(filename, content.encode('utf-8')) for filename, content in load_pages(args.files)]
+        if not pages:
+            print("没有找到页面")
+            sys.exit(1)
+        groups = {}
+        for name, content in pages:
+            kind = "详细信息页" if "detail" in name else "列表页"
+            groups.setdefault(kind, []).append(content)
+        for kind, contents in groups.items():
+            print(f"== {kind} ==")
+            bench_compress(contents, args.number)
+        return
+
+    pages = load_pages(args.files)
+    if not pages:
+        print("没有找到HTML文件")
+        sys.exit(1)
+
+    if args.command == 'list':
+        bench_list(pages, args.number)
+    elif args.command == 'detail':
+        bench_detail(pages, args.number)
+
+if __name__ == "__main__":
+    main()
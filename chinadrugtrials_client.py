@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+中国药物临床试验登记与信息公示平台的库接口
+
+命令行脚本之外，可以在程序中直接使用 Client（同步）或 AsyncClient（异步）：
+
+    from chinadrugtrials_client import Client
+
+    with Client(sessions=2) as client:
+        trials = client.search("KRAS", ["胰腺癌", "实体瘤"], limit=10)
+        for trial, detail in client.bulk_details(trials):
+            print(trial.reg_no, detail.main_researcher.get("单位名称"))
+
+客户端只返回数据记录，默认不写入任何文件（原始响应、Cookie罐）。
+"""
+
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from chinadrugtrials_detail_extractor_v1 import ChinaDrugTrialsDetailExtractor
+from chinadrugtrials_extract import RunReport, BASE_URL, DEFAULT_HEADERS
+from chinadrugtrials_http import SessionPool, Deadline, iter_concurrent
+from chinadrugtrials_planner import QueryPlanner
+from chinadrugtrials_store import TrialIndex, RenderCache
+from chinadrugtrials_pack import open_pack, LIST_ENDPOINT
+
+
+@dataclass
+class Trial:
+    """
+    搜索结果列表中的一个临床试验
+    """
+    reg_no: str
+    trial_id: str
+    status: str
+    drug_name: str
+    indication: str
+    title: str
+    detail_url: str = ""
+    seq: str = ""
+
+    # 与搜索器返回的字典字段名的对应关系
+    FIELDS = (
+        ("reg_no", "登记号"),
+        ("trial_id", "试验ID"),
+        ("status", "试验状态"),
+        ("drug_name", "药物名称"),
+        ("indication", "适应症"),
+        ("title", "试验通俗题目"),
+        ("detail_url", "详情URL"),
+        ("seq", "序号"),
+    )
+
+    @classmethod
+    def from_dict(cls, trial):
+        """
+        从搜索器返回的字典（中文字段名）创建记录
+        """
+        return cls(**{name: trial.get(key, "") for name, key in cls.FIELDS})
+
+    def to_dict(self):
+        """
+        转换为搜索器使用的字典（中文字段名），用于生成Markdown等
+        """
+        return {key: getattr(self, name) for name, key in self.FIELDS}
+
+
+@dataclass
+class TrialDetail:
+    """
+    临床试验详细信息（研究者信息）
+    """
+    trial_id: str
+    main_researcher: dict = field(default_factory=dict)
+    institutions: list = field(default_factory=list)
+    # 提取到的全部字段
+    raw: dict = field(default_factory=dict)
+
+    @classmethod
+    def from_dict(cls, trial_id, detail):
+        researcher_info = (detail or {}).get('研究者信息', {})
+        return cls(
+            trial_id=trial_id,
+            main_researcher=researcher_info.get('主要研究者信息', {}),
+            institutions=researcher_info.get('各参加机构信息', []),
+            raw=detail or {},
+        )
+
+
+class Client:
+    """
+    同步客户端：持有一个会话池，多次调用之间复用连接和Cookie
+    """
+    def __init__(self, sessions=1, cookies=None, cookie_jar_file=None, deadline=None, use_local_file=False, save_raw=False, index_file=None, capabilities_file=None, hedge=False, stream=False, pack_file=None, debug=False, render_cache_file=None):
+        """
+        参数:
+            sessions: 会话池中的会话数（独立的Cookie身份）
+            cookies: 初始Cookie字典
+            cookie_jar_file: Cookie罐文件路径，为None时不保存Cookie到磁盘
+            deadline: 时间预算（秒），为None时没有限制
+            use_local_file: 优先使用本地保存的响应内容
+            save_raw: 是否保存原始响应
+            index_file: 登记号索引文件路径，为None时索引只保存在内存中
+            capabilities_file: 能力探测结果文件路径，设置后首次搜索时探测服务器接受的每页记录数，
+                之后直接使用；为None时使用默认的每页20条
+            hedge: 详细信息请求耗时超过p95时用另一个会话发送备用请求
+            stream: 流式解析详细信息页面（边下载边解析，不保存原始响应；不使用对冲）
+            pack_file: 原始页面包文件路径，设置后原始响应写入包文件，--local 时也从中读取；
+                包文件正被其他进程写入时只读取，原始响应保存为HTML文件
+            debug: 设置了包文件时也把原始响应保存为HTML文件
+            render_cache_file: 渲染缓存文件路径，原始页面没有变化的试验不重新渲染；为None时只保存在内存中
+        """
+        transport = SessionPool(
+            BASE_URL, DEFAULT_HEADERS,
+            size=sessions,
+            cookie_jar_file=cookie_jar_file,
+            seed_cookies=cookies
+        )
+        self.searcher = ChinaDrugTrialsDetailExtractor(transport, deadline=Deadline(deadline), report=RunReport(), save_raw=save_raw)
+        self.searcher.index = TrialIndex(index_file)
+        self.searcher.hedge = hedge
+        self.searcher.stream = stream
+        self.searcher.pages = open_pack(pack_file) if pack_file else None
+        self.searcher.debug = debug
+        self.searcher.renders = RenderCache(render_cache_file)
+        if capabilities_file:
+            self.searcher.load_capabilities(capabilities_file)
+        self.planner = QueryPlanner(self.searcher)
+        self.use_local_file = use_local_file
+
+    @property
+    def report(self):
+        """
+        运行报告（因时间预算不足而跳过的页面和详细信息）
+        """
+        return self.searcher.report
+
+    def close(self):
+        if self.searcher.pages is not None:
+            self.searcher.pages.close()
+        self.searcher.transport.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def plan(self, keywords, filter_keywords=None, indication="", reg_no="", state="进行中", drugs_name="", ckm_index="1"):
+        """
+        只获取每个策略的第一页，返回查询计划文本（使用本地文件时优先使用本地保存的第一页）
+        """
+        return self.planner.dry_run(keywords, filter_keywords, indication, reg_no, state, drugs_name, ckm_index, self.use_local_file)
+
+    def search(self, keywords, filter_keywords=None, indication="", reg_no="", state="进行中", drugs_name="", max_pages=None, limit=None, pushdown=False, ckm_index="1"):
+        """
+        搜索临床试验，返回 Trial 列表
+
+        参数:
+            keywords: 搜索关键词
+            filter_keywords: 过滤关键词列表（任一关键词出现在任一字段中即保留）
+            indication, reg_no, state, drugs_name: 二级搜索参数，state 为空字符串时搜索所有状态
+            max_pages: 最大页数
+            limit: 最多返回的临床试验数
+            pushdown: 是否允许把过滤关键词近似下推为适应症搜索
+            ckm_index: ckm_index参数
+        """
+        trials = self.planner.search(
+            keywords, filter_keywords, max_pages, indication, reg_no, state, drugs_name, ckm_index,
+            self.use_local_file, True, allow_approximate=pushdown, limit=limit
+        )
+        return [Trial.from_dict(trial) for trial in trials]
+
+    def iter_trials(self, keywords, filter_keywords=None, indication="", reg_no="", state="进行中", drugs_name="", max_pages=None):
+        """
+        逐页搜索并逐个生成 Trial，调用方停止迭代后不再请求后续页面
+        """
+        page = 1
+        total_pages = None
+        while total_pages is None or page <= total_pages:
+            html_content = None
+            if self.use_local_file:
+                payload = self.searcher.list_payload(keywords, page, indication, reg_no, state, drugs_name)
+                html_content = self.searcher.load_page(LIST_ENDPOINT, payload, f"response_page_{page}.html")
+            if html_content:
+                page_trials = self.searcher.extract_trials_from_table(html_content)
+            else:
+                html_content, page_trials = self.searcher.fetch_trials_page(keywords, page, indication, reg_no, state, drugs_name, "1")
+            if not html_content or not page_trials:
+                return
+
+            if total_pages is None:
+                total_pages = self.searcher.get_total_pages(html_content)
+                if max_pages:
+                    total_pages = min(total_pages, max_pages)
+
+            for trial in self.searcher.filter_trials(page_trials, filter_keywords):
+                yield Trial.from_dict(trial)
+            page += 1
+
+    def resolve_reg_nos(self, reg_nos):
+        """
+        按登记号查找试验，返回 {登记号: Trial}，找不到的登记号不在结果中
+
+        先查登记号索引，只有索引中没有的登记号才按登记号搜索（会话池中有多个会话时并发搜索），
+        搜索到的试验会写入索引。
+        """
+        index = self.searcher.index
+        misses = [reg_no for reg_no in reg_nos if index.get(reg_no) is None]
+        logging.info(f"{len(reg_nos)} 个登记号中 {len(reg_nos) - len(misses)} 个在索引中，{len(misses)} 个需要搜索")
+
+        def lookup(reg_no):
+            # 解析列表页时会把试验写入索引
+            self.searcher.fetch_trials_page("", 1, reg_no=reg_no, state="")
+
+        def pending():
+            for i, reg_no in enumerate(misses):
+                if not self.searcher.has_budget():
+                    for skipped in misses[i:]:
+                        self.report.skip_pages(f"登记号={skipped}", [1])
+                    return
+                yield reg_no
+
+        for _ in iter_concurrent(lookup, pending(), self.searcher.workers):
+            pass
+        index.save()
+
+        resolved = {}
+        for reg_no in reg_nos:
+            trial = index.get(reg_no)
+            if trial is None:
+                continue
+            trial['详情URL'] = f"{self.searcher.base_url}/clinicaltrials.searchlistdetail.dhtml?id={trial['试验ID']}"
+            resolved[reg_no] = Trial.from_dict(trial)
+        return resolved
+
+    def get_details(self, trial_ids):
+        """
+        获取多个临床试验的详细信息，按输入顺序返回 TrialDetail 列表（无法获取的为None）
+        """
+        def fetch(trial_id):
+            detail = self.searcher.get_parsed_detail(trial_id, self.use_local_file)
+            return TrialDetail.from_dict(trial_id, detail) if detail is not None else None
+
+        return [detail for _, detail in iter_concurrent(fetch, list(trial_ids), self.searcher.workers)]
+
+    def bulk_details(self, trials, prefer_recent=False):
+        """
+        按优先级（尚未招募 > 招募中 > 其他）并发获取多个试验的详细信息，
+        按获取顺序生成 (Trial, TrialDetail)，无法获取时 TrialDetail 为None
+
+        参数:
+            trials: Trial 列表
+            prefer_recent: 同一状态内登记号较新的试验优先
+        """
+        by_id = {trial.trial_id: trial for trial in trials}
+        rows = [trial.to_dict() for trial in trials]
+        for row, detail in self.searcher.fetch_details(rows, self.use_local_file, prefer_recent=prefer_recent, parse=True):
+            if detail is not None:
+                detail = TrialDetail.from_dict(row['试验ID'], detail)
+            yield by_id[row['试验ID']], detail
+
+
+class AsyncClient:
+    """
+    异步客户端：在线程池中执行同步客户端的调用，适合嵌入异步Web后端
+    """
+    def __init__(self, *args, **kwargs):
+        """
+        参数与 Client 相同
+        """
+        self.client = Client(*args, **kwargs)
+
+    @property
+    def report(self):
+        return self.client.report
+
+    async def close(self):
+        await self._run(self.client.close)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def _run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, lambda: func(*args, **kwargs))
+
+    async def plan(self, *args, **kwargs):
+        return await self._run(self.client.plan, *args, **kwargs)
+
+    async def search(self, *args, **kwargs):
+        """
+        参数与 Client.search 相同
+        """
+        return await self._run(self.client.search, *args, **kwargs)
+
+    async def resolve_reg_nos(self, reg_nos):
+        return await self._run(self.client.resolve_reg_nos, reg_nos)
+
+    async def get_details(self, trial_ids):
+        return await self._run(self.client.get_details, trial_ids)
+
+    async def iter_trials(self, *args, **kwargs):
+        """
+        参数与 Client.iter_trials 相同，异步生成 Trial
+        """
+        async for item in self._iterate(self.client.iter_trials(*args, **kwargs)):
+            yield item
+
+    async def bulk_details(self, trials, prefer_recent=False):
+        """
+        参数与 Client.bulk_details 相同，异步生成 (Trial, TrialDetail)
+        """
+        async for item in self._iterate(self.client.bulk_details(trials, prefer_recent)):
+            yield item
+
+    async def _iterate(self, iterator):
+        done = object()
+        try:
+            while True:
+                item = await self._run(next, iterator, done)
+                if item is done:
+                    return
+                yield item
+        finally:
+            await self._run(iterator.close)
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import json
+import time
+import logging
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from chinadrugtrials_detail_extractor_v1 import ChinaDrugTrialsDetailExtractor
+from chinadrugtrials_planner import QueryPlanner
+from chinadrugtrials_store import TrialIndex, default_index_file, default_capabilities_file
+from chinadrugtrials_pack import open_pack, default_pack_file
+
+
+class QueryCache:
+    """
+    线程安全的内存缓存，条目在 ttl 秒后过期
+    """
+    def __init__(self, ttl=600):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        返回缓存的值，不存在或已过期时返回None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.time() - entry[0] > self.ttl:
+                del self._entries[key]
+                return None
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class TrialQueryService:
+    """
+    常驻的查询服务：持有一个已初始化的搜索器（会话池和Cookie）以及查询缓存
+    """
+    def __init__(self, pool_size=1, cache_ttl=600, use_local_file=False):
+        """
+        参数:
+            pool_size: 会话池中的会话数
+            cache_ttl: 查询结果的缓存时间（秒）
+            use_local_file: 优先使用本地保存的响应内容
+        """
+        self.searcher = ChinaDrugTrialsDetailExtractor(pool_size=pool_size)
+        self.searcher.index = TrialIndex(default_index_file())
+        self.searcher.pages = open_pack(default_pack_file())
+        self.searcher.load_capabilities(default_capabilities_file())
+        self.planner = QueryPlanner(self.searcher)
+        self.cache = QueryCache(cache_ttl)
+        self.use_local_file = use_local_file
+        self.started_at = time.time()
+
+    def warm_up(self):
+        """
+        预先加载解析库并为每个会话获取Cookie，第一个查询不再承担这些开销
+        """
+        import requests  # noqa: F401
+        from bs4 import BeautifulSoup  # noqa: F401
+        for session in self.searcher.transport.sessions:
+            session.ensure_warm()
+
+    def search(self, params):
+        """
+        搜索临床试验，参数与 search_all_pages 一致
+
+        参数:
+            params: 查询参数字典，支持 keywords、filter（空格分隔）、indication、reg_no、
+                state、all_states、drugs_name、ckm_index、pages、limit、pushdown
+
+        返回:
+            (试验列表, 是否来自缓存)
+        """
+        keywords = params.get("keywords", "")
+        if not keywords:
+            raise ValueError("缺少参数 keywords")
+
+        filter_keywords = params.get("filter") or []
+        if isinstance(filter_keywords, str):
+            filter_keywords = filter_keywords.split()
+        state = "" if _as_bool(params.get("all_states")) else params.get("state", "进行中")
+        query = {
+            "keywords": keywords,
+            "filter_keywords": filter_keywords,
+            "max_pages": _as_int(params.get("pages"), "pages"),
+            "indication": params.get("indication", ""),
+            "reg_no": params.get("reg_no", ""),
+            "state": state,
+            "drugs_name": params.get("drugs_name", ""),
+            "ckm_index": params.get("ckm_index", "1"),
+            "allow_approximate": _as_bool(params.get("pushdown")),
+            "limit": _as_int(params.get("limit"), "limit"),
+        }
+
+        key = "search:" + json.dumps(query, ensure_ascii=False, sort_keys=True)
+        trials = self.cache.get(key)
+        if trials is not None:
+            return trials, True
+
+        # 相同的并发查询只执行一次
+        def run():
+            trials = self.planner.search(use_local_file=self.use_local_file, **query)
+            self.cache.set(key, trials)
+            return trials
+
+        return self.searcher.flight.do(key, run), False
+
+    def detail(self, trial_id):
+        """
+        获取临床试验的详细信息（研究者信息）
+
+        返回:
+            (详细信息字典, 是否来自缓存)，无法获取时详细信息为None
+        """
+        if not trial_id:
+            raise ValueError("缺少参数 id")
+
+        key = f"detail:{trial_id}"
+        detail = self.cache.get(key)
+        if detail is not None:
+            return detail, True
+
+        detail_html = None
+        if self.use_local_file:
+            detail_html = self.searcher.load_detail_page(trial_id)
+        if detail_html:
+            detail = self.searcher.extract_trial_detail(detail_html)
+        else:
+            # 相同试验ID的并发请求共享一次请求和解析结果
+            detail_html, detail = self.searcher.fetch_trial_detail(trial_id)
+        if not detail_html:
+            return None, False
+        self.cache.set(key, detail)
+        return detail, False
+
+    def health(self):
+        """
+        服务状态：运行时间、缓存条目数和各会话的请求统计
+        """
+        return {
+            "status": "ok",
+            "uptime": round(time.time() - self.started_at, 1),
+            "cache_entries": len(self.cache),
+            "sessions": self.searcher.transport.stats(),
+        }
+
+
+def _as_bool(value):
+    if isinstance(value, str):
+        return value.lower() in ("1", "true", "yes")
+    return bool(value)
+
+
+def _as_int(value, name):
+    if value in (None, ""):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"参数 {name} 必须是整数")
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    """
+    JSON API:
+        GET/POST /search  搜索临床试验
+        GET/POST /detail  获取单个试验的详细信息（参数 id 为试验ID）
+        GET /health       服务状态
+    GET 请求使用查询字符串，POST 请求使用JSON请求体。
+    """
+    service = None
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        self._dispatch(url.path, params)
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            params = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._send(400, {"error": "请求体不是有效的JSON"})
+            return
+        if not isinstance(params, dict):
+            self._send(400, {"error": "请求体必须是JSON对象"})
+            return
+        self._dispatch(url.path, params)
+
+    def _dispatch(self, path, params):
+        started = time.time()
+        try:
+            if path == "/search":
+                trials, cached = self.service.search(params)
+                result = {"count": len(trials), "trials": trials, "cached": cached}
+            elif path == "/detail":
+                detail, cached = self.service.detail(params.get("id", ""))
+                if detail is None:
+                    self._send(502, {"error": "无法获取详细信息"})
+                    return
+                result = {"detail": dict(detail), "cached": cached}
+            elif path == "/health":
+                result = self.service.health()
+            else:
+                self._send(404, {"error": f"未知路径: {path}"})
+                return
+        except ValueError as e:
+            self._send(400, {"error": str(e)})
+            return
+        except Exception as e:
+            logging.exception(f"处理请求 {path} 失败")
+            self._send(500, {"error": str(e)})
+            return
+
+        result["elapsed_ms"] = round((time.time() - started) * 1000, 1)
+        self._send(200, result)
+
+    def _send(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logging.info(f"{self.address_string()} - {format % args}")
+
+
+def main():
+    """
+    主函数
+    """
+    parser = argparse.ArgumentParser(description='以常驻服务方式提供临床试验查询（本地HTTP/JSON接口）')
+    parser.add_argument('--host', default="127.0.0.1", help='监听地址，默认为127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765, help='监听端口，默认为8765')
+    parser.add_argument('--sessions', type=int, default=1, help='会话池中的会话数（独立的Cookie身份），默认为1')
+    parser.add_argument('--cache-ttl', type=int, default=600, help='查询结果的缓存时间（秒），默认为600')
+    parser.add_argument('-l', '--local', action='store_true', help='使用本地文件作为响应内容，而不是从网站获取')
+    parser.add_argument('--no-warm', action='store_true', help='启动时不预先获取Cookie，推迟到第一个请求')
+
+    args = parser.parse_args()
+
+    service = TrialQueryService(pool_size=args.sessions, cache_ttl=args.cache_ttl, use_local_file=args.local)
+    if not args.no_warm and not args.local:
+        logging.info("正在预热会话...")
+        service.warm_up()
+
+    QueryHandler.service = service
+    server = ThreadingHTTPServer((args.host, args.port), QueryHandler)
+    print(f"查询服务已启动: http://{args.host}:{args.port}（/search, /detail, /health）")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("查询服务已停止")
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,590 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+临床试验详细信息页的统一解析
+
+详细信息页由若干部分组成（部分标题为 div.searchDetailPartTit，小节标题为 div.sDPTit2）：
+题目和背景信息、申办者信息、临床试验信息（含入选/排除标准）、研究者信息
+（主要研究者、各参加机构）、伦理委员会信息、试验状态信息。DetailPageParser
+按事件驱动的方式一次读完整个页面，把所有部分填入 TrialDetailRecord；
+也可以分块 feed()，只读取指定的部分并在读完后提前结束（用于流式解析）。
+
+表格有两种形式：
+- 字段表格：每行是"标签 th + 值 td"（或两个 td），按标签填入字段
+- 记录表格：第一行全部是 th（表头），其后每行是一条记录（参加机构、伦理委员会等）
+"""
+
+import re
+import zlib
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+from chinadrugtrials_parser import slice_detail_part
+from chinadrugtrials_store import content_hash
+
+# 标题和标签前的编号，例如"六、"、"1、"、"2."
+NUMBER_PREFIX_RE = re.compile(r'^\s*(?:[一二三四五六七八九十]+|\d+)\s*[、.．]\s*')
+# 入选/排除标准每一条前的编号（必须有分隔符，"2型糖尿病"、"18岁以上"开头的数字是内容）
+ITEM_PREFIX_RE = re.compile(r'^\s*\d+\s*[、.．)）]\s*')
+# 空的记录表格中占位行的内容
+NO_DATA = '暂无数据'
+# 每次响应都不同的部分：反爬虫令牌 <meta id=... content=...> 和混淆的脚本
+VOLATILE_RE = re.compile(r'<script\b.*?</script\s*>|<meta\b[^>]*>', re.S | re.I)
+
+# 部分标题关键词 -> 部分
+PART_KEYS = (
+    ('题目和背景', 'basic_info'),
+    ('申办者', 'sponsor'),
+    ('申请人', 'sponsor'),
+    ('临床试验信息', 'design'),
+    ('研究者信息', 'researchers'),
+    ('伦理委员会', 'ethics'),
+    ('试验状态', 'status'),
+)
+
+
+def part_of(label):
+    """
+    部分标题对应的部分，不是已知部分时返回None
+    """
+    for keyword, part in PART_KEYS:
+        if keyword in label:
+            return part
+    return None
+
+
+def normalize_label(text):
+    """
+    规范化标题和标签：去掉编号、空白和结尾的冒号
+    """
+    return NUMBER_PREFIX_RE.sub('', text).strip().rstrip('：:').strip()
+
+
+def split_items(text):
+    """
+    把入选/排除标准拆分为条目列表（每行一条，去掉编号）
+    """
+    items = []
+    for line in text.split('\n'):
+        line = ITEM_PREFIX_RE.sub('', line).strip()
+        if line:
+            items.append(line)
+    return items
+
+
+@dataclass
+class Researcher:
+    """
+    主要研究者
+    """
+    name: str = ""
+    degree: str = ""
+    title: str = ""
+    phone: str = ""
+    email: str = ""
+    address: str = ""
+    postcode: str = ""
+    institution: str = ""
+    # 页面上的全部字段（标签 -> 值）
+    fields: dict = field(default_factory=dict)
+
+    LABELS = {'姓名': 'name', '学位': 'degree', '职称': 'title', '电话': 'phone', 'Email': 'email',
+              '邮政地址': 'address', '邮编': 'postcode', '单位名称': 'institution'}
+
+
+@dataclass
+class Institution:
+    """
+    参加机构
+    """
+    seq: str = ""
+    name: str = ""
+    researcher: str = ""
+    country: str = ""
+    province: str = ""
+    city: str = ""
+    fields: dict = field(default_factory=dict)
+
+    LABELS = {'序号': 'seq', '机构名称': 'name', '主要研究者': 'researcher', '国家': 'country',
+              '省（州）': 'province', '省(州)': 'province', '城市': 'city'}
+
+
+@dataclass
+class EthicsApproval:
+    """
+    伦理委员会审查记录
+    """
+    seq: str = ""
+    committee: str = ""
+    result: str = ""
+    date: str = ""
+    fields: dict = field(default_factory=dict)
+
+    LABELS = {'序号': 'seq', '名称': 'committee', '伦理委员会名称': 'committee', '审查结论': 'result',
+              '批准日期/备案日期': 'date', '批准日期': 'date', '审查日期': 'date'}
+
+
+@dataclass
+class TrialDetailRecord:
+    """
+    临床试验详细信息（所有部分）
+    """
+    title: str = ""
+    reg_no: str = ""
+    public_title: str = ""
+    scientific_title: str = ""
+    indication: str = ""
+    drug_name: str = ""
+    sponsor_name: str = ""
+    objective: str = ""
+    phase: str = ""
+    design_type: str = ""
+    randomization: str = ""
+    blinding: str = ""
+    target_enrollment: str = ""
+    trial_status: str = ""
+    inclusion_criteria: list = field(default_factory=list)
+    exclusion_criteria: list = field(default_factory=list)
+    main_researchers: list = field(default_factory=list)
+    institutions: list = field(default_factory=list)
+    ethics: list = field(default_factory=list)
+    # 各部分的全部字段（部分 -> {标签: 值}），部分标题保存在 part_titles
+    sections: dict = field(default_factory=dict)
+    part_titles: dict = field(default_factory=dict)
+    # 研究者信息部分中出现过的小节: main / institutions
+    researcher_sections: set = field(default_factory=set)
+    # 不在任何部分中的表格字段
+    fields: dict = field(default_factory=dict)
+
+    # 字段标签 -> 属性
+    LABELS = {'登记号': 'reg_no', '试验通俗题目': 'public_title', '试验专业题目': 'scientific_title',
+              '适应症': 'indication', '药物名称': 'drug_name', '试验药': 'drug_name', '申办者名称': 'sponsor_name',
+              '试验目的': 'objective', '试验分期': 'phase', '设计类型': 'design_type', '随机化': 'randomization',
+              '盲法': 'blinding', '目标入组人数': 'target_enrollment', '试验状态': 'trial_status'}
+    # 详细信息字典中各部分的键（页面上的部分标题）-> 部分，LazyTrialDetail 按键只解析对应的部分
+    PART_TITLES = {'题目和背景信息': 'basic_info', '申办者信息': 'sponsor', '申请人信息': 'sponsor',
+                   '临床试验信息': 'design', '研究者信息': 'researchers', '伦理委员会信息': 'ethics',
+                   '试验状态信息': 'status'}
+
+    def to_dict(self):
+        """
+        转换为详细信息字典（extract_trial_detail 的返回格式）：
+        研究者信息为 {'主要研究者信息': {...}, '各参加机构信息': [...]}，
+        其他部分以页面上的部分标题为键
+        """
+        detail = {}
+        if self.title:
+            detail['标题'] = self.title
+        detail.update(self.fields)
+        for part, values in self.sections.items():
+            if values:
+                detail[self.part_titles.get(part, part)] = values
+        if self.ethics:
+            detail[self.part_titles.get('ethics', '伦理委员会信息')] = [approval.fields for approval in self.ethics]
+
+        researcher_info = {}
+        if 'main' in self.researcher_sections:
+            researcher_info['主要研究者信息'] = self.main_researchers[0].fields if self.main_researchers else {}
+        if 'institutions' in self.researcher_sections:
+            researcher_info['各参加机构信息'] = [institution.fields for institution in self.institutions]
+        if researcher_info:
+            detail['研究者信息'] = researcher_info
+        return detail
+
+
+def _typed(cls, values):
+    """
+    按标签映射创建带类型的记录，全部字段保存在 fields 中
+    """
+    record = cls(fields=values)
+    for label, value in values.items():
+        attr = cls.LABELS.get(label)
+        if attr and not getattr(record, attr):
+            setattr(record, attr, value)
+    return record
+
+
+class DetailPageParser(HTMLParser):
+    """
+    事件驱动的详细信息页解析器：一次遍历填充 TrialDetailRecord
+
+    可以分块调用 feed()。指定 parts 时只保留这些部分的内容，其余内容读过即丢弃，
+    指定的部分都读完后 done 为True，调用方可以停止读取。参加机构记录在表格行
+    结束时立即生成，并传给 on_institution 回调。
+    """
+    def __init__(self, parts=None, on_institution=None):
+        """
+        参数:
+            parts: 需要的部分（例如 ('researchers',)），为None时读取所有部分
+            on_institution: 每解析出一个参加机构时调用
+        """
+        super().__init__(convert_charrefs=True)
+        self.parts = set(parts) if parts else None
+        self.on_institution = on_institution
+        self.record = TrialDetailRecord()
+        self.done = False
+        # 读完的部分
+        self.completed = set()
+        self._part = None
+        self._sub = None
+        # 正在读取的标题: part / sub / title
+        self._capture = None
+        self._capture_text = []
+        # 小节标题后、表格外的文本
+        self._sub_text = []
+        # 表格嵌套深度，只解析最外层表格的行和单元格
+        self._depth = 0
+        self._rows = None
+        self._cells = None
+        self._cell = None
+        self._cell_tag = None
+        self._table_rows = 0
+        self._headers = None
+
+    @property
+    def found(self):
+        """
+        是否找到了研究者信息部分
+        """
+        return 'researchers' in self.record.part_titles
+
+    def _selected(self):
+        return self.parts is None or self._part in self.parts
+
+    def handle_starttag(self, tag, attrs):
+        if self.done:
+            return
+        if tag == 'div':
+            classes = (dict(attrs).get('class') or '').split()
+            if 'searchDetailPartTit' in classes:
+                self._end_part()
+                if self.done:
+                    return
+                self._capture, self._capture_text = 'part', []
+                return
+            if 'sDPTit2' in classes and self._part:
+                self._flush_sub_text()
+                self._capture, self._capture_text = 'sub', []
+                return
+        elif tag == 'h3' and not self.record.title and 'text-center' in (dict(attrs).get('class') or '').split():
+            self._capture, self._capture_text = 'title', []
+            return
+
+        if not self._selected():
+            return
+        if tag == 'table':
+            self._depth += 1
+            if self._depth == 1:
+                self._flush_sub_text()
+                self._rows = []
+                self._table_rows = 0
+                self._headers = None
+        elif self._depth == 1:
+            if tag == 'tr':
+                self._end_row()
+                self._cells = []
+            elif tag in ('th', 'td') and self._cells is not None:
+                self._end_cell()
+                self._cell, self._cell_tag = [], tag
+        elif tag == 'br':
+            self._append('\n')
+
+    def handle_endtag(self, tag):
+        if self.done:
+            return
+        if self._capture and tag in ('div', 'h3'):
+            self._end_capture()
+            return
+        if not self._selected():
+            return
+        if tag == 'table' and self._depth:
+            if self._depth == 1:
+                self._end_row()
+                self._end_table()
+            self._depth -= 1
+        elif self._depth == 1:
+            if tag in ('th', 'td'):
+                self._end_cell()
+            elif tag == 'tr':
+                self._end_row()
+        elif self._depth > 1:
+            # 嵌套表格（例如逐条列出的入选标准）：每行一条
+            if tag == 'tr':
+                self._append('\n')
+            elif tag in ('th', 'td'):
+                self._append(' ')
+
+    def handle_data(self, data):
+        if self.done:
+            return
+        if self._capture:
+            self._capture_text.append(data)
+        elif self._selected():
+            self._append(data)
+
+    def _append(self, text):
+        if self._cell is not None:
+            self._cell.append(text)
+        elif self._depth == 0 and self._sub:
+            self._sub_text.append(text)
+
+    def close(self):
+        super().close()
+        self._end_part()
+
+    def _end_capture(self):
+        text = ''.join(self._capture_text).strip()
+        kind, self._capture, self._capture_text = self._capture, None, []
+        if kind == 'title':
+            self.record.title = text
+        elif kind == 'part':
+            label = normalize_label(text)
+            self._part = part_of(label) or 'other:' + label
+            self._sub = None
+            self.record.part_titles.setdefault(self._part, label)
+        else:
+            self._sub = normalize_label(text)
+            if self._part == 'researchers':
+                if '主要研究者' in self._sub:
+                    self.record.researcher_sections.add('main')
+                elif '参加机构' in self._sub:
+                    self.record.researcher_sections.add('institutions')
+
+    def _end_part(self):
+        """
+        一个部分结束（下一个部分标题开始或页面结束）
+        """
+        if self._part is None:
+            return
+        self._flush_sub_text()
+        self.completed.add(self._part)
+        self._part = None
+        self._sub = None
+        if self.parts is not None and self.parts <= self.completed:
+            self.done = True
+
+    def _flush_sub_text(self):
+        text = ''.join(self._sub_text).strip()
+        self._sub_text = []
+        if text and self._sub and self._selected():
+            self._set_field(self._sub, text)
+
+    def _end_cell(self):
+        if self._cell is not None:
+            self._cells.append((self._cell_tag, ''.join(self._cell).strip()))
+            self._cell = None
+
+    def _end_row(self):
+        """
+        最外层表格的一行结束：记录表格的数据行立即生成记录，其余行暂存到表格结束
+        """
+        self._end_cell()
+        if self._cells is None:
+            return
+        cells, self._cells = self._cells, None
+        self._table_rows += 1
+
+        if self._table_rows == 1 and len(cells) >= 2 and all(tag == 'th' for tag, _ in cells):
+            self._headers = [text for _, text in cells]
+            return
+        if self._headers is not None:
+            values = [text for tag, text in cells if tag == 'td']
+            # 空表格只有一行合并单元格的"暂无数据"，不是记录
+            if len(values) >= len(self._headers) and any(value and value != NO_DATA for value in values):
+                self._add_record(dict(zip(self._headers, values)))
+            return
+        self._rows.append(cells)
+
+    def _end_table(self):
+        """
+        最外层表格结束：字段表格按"标签 + 值"配对
+        """
+        rows, self._rows = self._rows or [], None
+        if self._headers is not None:
+            # 记录表格的数据行已经在行结束时处理
+            self._headers = None
+            return
+
+        values = {}
+        for cells in rows:
+            if len(cells) == 2 and cells[0][0] == 'td' and cells[1][0] == 'td':
+                label, value = cells[0][1], cells[1][1]
+                if label and value:
+                    values[normalize_label(label)] = value
+                continue
+            for (tag, text), (next_tag, next_text) in zip(cells, cells[1:]):
+                if tag == 'th' and next_tag == 'td' and text:
+                    values[normalize_label(text)] = next_text
+        if not values:
+            return
+
+        if self._part == 'researchers' and self._sub and '主要研究者' in self._sub:
+            self.record.main_researchers.append(_typed(Researcher, values))
+        elif self._part == 'ethics':
+            self.record.ethics.append(_typed(EthicsApproval, values))
+        else:
+            for label, value in values.items():
+                self._set_field(label, value)
+
+    def _add_record(self, values):
+        if self._part == 'researchers':
+            institution = _typed(Institution, values)
+            self.record.institutions.append(institution)
+            if self.on_institution:
+                self.on_institution(institution)
+        elif self._part == 'ethics':
+            self.record.ethics.append(_typed(EthicsApproval, values))
+        elif self._part:
+            self.record.sections.setdefault(self._part, {}).setdefault(self._sub or '记录', []).append(values)
+        else:
+            self.record.fields.setdefault('记录', []).append(values)
+
+    def _set_field(self, label, value):
+        """
+        保存一个字段：入选/排除标准拆分为条目，已知标签同时填入对应的属性
+        """
+        record = self.record
+        if '入选标准' in label:
+            value = record.inclusion_criteria = split_items(value)
+        elif '排除标准' in label:
+            value = record.exclusion_criteria = split_items(value)
+        else:
+            attr = TrialDetailRecord.LABELS.get(label)
+            if attr and not getattr(record, attr):
+                setattr(record, attr, value)
+
+        if self._part:
+            record.sections.setdefault(self._part, {})[label] = value
+        else:
+            record.fields[label] = value
+
+
+def slice_detail_body(html_content):
+    """
+    跳过页面开头的模板（脚本、导航），从标题或第一个部分标题开始截取
+    """
+    starts = [i for i in (html_content.find('class="text-center"'), html_content.find('searchDetailPartTit')) if i >= 0]
+    if not starts:
+        return html_content
+    begin = html_content.rfind('<', 0, min(starts))
+    return html_content[begin:] if begin >= 0 else html_content
+
+
+def content_digest(html_content):
+    """
+    详细信息页内容的哈希值：只计算页面正文，去掉每次响应都不同的反爬虫令牌和脚本，
+    同一页面的两次获取只要内容相同，哈希值就相同
+    """
+    return content_hash(VOLATILE_RE.sub('', slice_detail_body(html_content)))
+
+
+def parse_detail_page(html_content, parts=None):
+    """
+    解析详细信息页，返回 TrialDetailRecord
+
+    参数:
+        parts: 只解析这些部分（例如 ('researchers',)），为None时解析所有部分
+    """
+    parser = DetailPageParser(parts)
+    fragment = None
+    if parser.parts is not None and len(parser.parts) == 1:
+        # 只需要一个部分时先截取该部分
+        part = next(iter(parser.parts))
+        for keyword, known in PART_KEYS:
+            if known == part:
+                fragment = slice_detail_part(html_content, keyword)
+                if fragment is not None:
+                    break
+    parser.feed(fragment or slice_detail_body(html_content))
+    parser.close()
+    return parser.record
+
+
+class LazyTrialDetail(Mapping):
+    """
+    延迟解析的详细信息：只保存压缩后的原始页面，某个部分第一次被访问时才解析，
+    解析结果会被缓存。
+
+    用法与 extract_trial_detail 返回的字典相同。按部分标题取值（例如
+    detail['研究者信息']，见 TrialDetailRecord.PART_TITLES）时只解析该部分；
+    遍历、取长度、取其他键或只解析该部分找不到这个键时解析整个页面。
+    只需要参加机构的调用方可以直接使用 institutions。
+    digest 是页面内容的哈希值（见 content_digest），页面没有变化时调用方可以不解析而使用缓存的结果。
+    """
+    def __init__(self, html_content):
+        self.digest = content_digest(html_content)
+        self._raw = zlib.compress(html_content.encode('utf-8'), 1)
+        # 部分 -> 只解析该部分得到的 TrialDetailRecord
+        self._parts = {}
+        self._record = None
+        self._detail = None
+
+    @property
+    def html(self):
+        """
+        原始页面内容
+        """
+        return zlib.decompress(self._raw).decode('utf-8')
+
+    @property
+    def record(self):
+        """
+        解析整个页面得到的 TrialDetailRecord
+        """
+        if self._record is None:
+            self._record = parse_detail_page(self.html)
+            # 整页结果包含所有部分，不再需要单独解析的部分
+            self._parts = {}
+        return self._record
+
+    def part(self, name):
+        """
+        只解析一个部分（例如 'researchers'），返回 TrialDetailRecord
+        """
+        if self._record is not None:
+            return self._record
+        record = self._parts.get(name)
+        if record is None:
+            record = self._parts[name] = parse_detail_page(self.html, (name,))
+        return record
+
+    @property
+    def main_researcher(self):
+        """
+        主要研究者（只解析研究者信息部分），没有时为None
+        """
+        researchers = self.part('researchers').main_researchers
+        return researchers[0] if researchers else None
+
+    @property
+    def institutions(self):
+        """
+        参加机构列表（只解析研究者信息部分）
+        """
+        return self.part('researchers').institutions
+
+    def to_dict(self):
+        """
+        转换为详细信息字典（解析整个页面）
+        """
+        if self._detail is None:
+            self._detail = self.record.to_dict()
+        return self._detail
+
+    def __getitem__(self, key):
+        if self._detail is None:
+            part = TrialDetailRecord.PART_TITLES.get(key)
+            if part is not None:
+                detail = self.part(part).to_dict()
+                if key in detail:
+                    return detail[key]
+        return self.to_dict()[key]
+
+    def __iter__(self):
+        return iter(self.to_dict())
+
+    def __len__(self):
+        return len(self.to_dict())
+
+    def __repr__(self):
+        return f"LazyTrialDetail(parsed={sorted(self._parts) if self._record is None else 'all'})"
@@ -1,15 +1,20 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import io
 import os
 import re
+import json
 import sys
-import requests
 import datetime
 import logging
 import argparse
-from bs4 import BeautifulSoup
-from chinadrugtrials_extract import ChinaDrugTrialsSearcher
+from chinadrugtrials_extract import ChinaDrugTrialsSearcher, get_trial_priority
+from chinadrugtrials_http import default_cookie_jar_file, load_config_cookies, RESPONSE_OK
+from chinadrugtrials_store import default_index_file, default_capabilities_file, default_render_cache_file, read_reg_nos, content_hash, RenderCache
+from chinadrugtrials_detail import DetailPageParser, LazyTrialDetail
+from chinadrugtrials_pack import DETAIL_ENDPOINT
+from chinadrugtrials_parser import slice_researcher_section
 
 # 配置日志
 logging.basicConfig(
@@ -18,21 +23,31 @@ logging.basicConfig(
     datefmt='%Y-%m-%d %H:%M:%S'
 )
 
+# 渲染器版本：format_detail_markdown 的输出格式或详细信息的解析结果有变化时加1，
+# 使渲染缓存中的所有试验重新渲染
+RENDERER_VERSION = 1
+# 渲染详细信息时用到的列表页字段
+RENDER_FIELDS = ('登记号', '试验通俗题目', '药物名称', '试验状态', '适应症', '详情URL')
+
 class ChinaDrugTrialsDetailExtractor(ChinaDrugTrialsSearcher):
     """
     增强版中国药物临床试验搜索器，提取详细信息
     """
-    def __init__(self):
-        super().__init__()  # 调用父类初始化方法
+    def __init__(self, transport=None, pool_size=1, deadline=None, report=None, save_raw=True):
+        super().__init__(transport, pool_size, deadline, report, save_raw)  # 调用父类初始化方法
+        # 流式解析详细信息页面（不缓存整个响应）
+        self.stream = False
+        # 渲染缓存（RenderCache），原始页面没有变化的试验不重新解析和渲染
+        self.renders = RenderCache()
         # 创建输出目录
         self.output_dir = os.path.join(os.getcwd(), "output")
-        if not os.path.exists(self.output_dir):
+        if save_raw and not os.path.exists(self.output_dir):
             os.makedirs(self.output_dir)
             logging.info(f"创建输出目录: {self.output_dir}")
         
-    def get_trial_detail(self, trial_id, ckm_index="1"):
+    def detail_request(self, trial_id, ckm_index="1"):
         """
-        获取临床试验详细信息
+        详细信息请求的地址和表单数据
         """
         detail_url = f"{self.base_url}/clinicaltrials.searchlistdetail.dhtml"
 
@@ -56,127 +71,107 @@ class ChinaDrugTrialsDetailExtractor(ChinaDrugTrialsSearcher):
             "agencies": "",
             "state": ""
         }
+        return detail_url, data
+
+    def get_trial_detail(self, trial_id, ckm_index="1"):
+        """
+        获取临床试验详细信息
+        """
+        detail_url, data = self.detail_request(trial_id, ckm_index)
 
         logging.info(f"获取临床试验详细信息: {trial_id}")
 
+        import requests
+
         try:
-            response = self.session.post(detail_url, headers=self.headers, data=data)
-            status_code = response.status_code
-            logging.info(f"请求返回状态码: {status_code}")
+            response = self.post_detail(detail_url, data)
+            logging.info(f"请求返回状态码: {response.status_code}，分类: {response.kind}")
 
-            if status_code not in [200, 202]:
-                logging.error(f"请求失败，状态码: {status_code}")
+            if response.kind != RESPONSE_OK:
+                logging.error(f"未获取到有效的详细信息页面（{response.kind}，状态码: {response.status_code}）")
                 return None
 
-            # 保存详细信息到output子目录
-            detail_file = os.path.join(self.output_dir, f"trial_detail_{trial_id}.html")
-            with open(detail_file, "w", encoding="utf-8") as f:
-                f.write(response.text)
-            logging.info(f"已保存详细信息到 {detail_file}")
+            # 保存详细信息（保存为文件时保存到output子目录）
+            self.save_page(DETAIL_ENDPOINT, {"id": trial_id}, response.html, os.path.join(self.output_dir, f"trial_detail_{trial_id}.html"))
 
-            return response.text
+            return response.html
         except requests.exceptions.RequestException as e:
             logging.error(f"请求异常: {e}")
             return None
 
+    def stream_trial_detail(self, trial_id):
+        """
+        流式获取并解析临床试验详细信息：边下载边解析，只解析研究者信息部分（主要研究者和
+        各参加机构），研究者信息部分结束后停止下载，不保存原始响应。
+        返回详细信息字典（标题和研究者信息），无法获取时返回None。
+
+        流式请求没有得到研究者信息（例如遇到验证页面）时，改用普通请求（会重新获取Cookie后重试）。
+        """
+        detail_url, data = self.detail_request(trial_id)
+        logging.info(f"流式获取临床试验详细信息: {trial_id}")
+
+        import requests
+
+        parser = DetailPageParser(parts=('researchers',))
+
+        def feed(text):
+            parser.feed(text)
+            return parser.done
+
+        try:
+            response = self.transport.stream(detail_url, data, feed)
+            parser.close()
+            if response.status_code == 200 and parser.found:
+                return parser.record.to_dict()
+            logging.warning(f"流式请求未获取到研究者信息（状态码: {response.status_code}），改用普通请求")
+        except requests.exceptions.RequestException as e:
+            logging.warning(f"流式请求异常: {e}，改用普通请求")
+
+        detail_html = self.get_trial_detail(trial_id)
+        return self.extract_trial_detail(detail_html) if detail_html else None
+
+    def get_parsed_detail(self, trial_id, use_local_file=False):
+        """
+        获取并解析临床试验详细信息；开启流式解析时边下载边解析
+        """
+        if use_local_file:
+            detail_html = self.load_detail_page(trial_id)
+            if detail_html:
+                return self.extract_trial_detail(detail_html)
+        if self.stream:
+            return self.flight.do(f"stream:{trial_id}", lambda: self.stream_trial_detail(trial_id))
+        return super().get_parsed_detail(trial_id)
+
     def extract_trial_detail(self, html_content):
         """
-        从HTML内容中提取临床试验详细信息，重点提取研究者信息
+        从HTML内容中提取临床试验详细信息（所有部分），研究者信息在 '研究者信息' 中
         """
         if not html_content:
             logging.error("HTML内容为空")
             return {}
 
-        soup = BeautifulSoup(html_content, 'html.parser')
-        detail = {}
-
-        # 查找研究者信息部分
-        researcher_section = soup.find(lambda tag: tag.name == 'div' and '研究者信息' in tag.text and 'searchDetailPartTit' in tag.get('class', []))
-        
-        if not researcher_section:
+        # 只查找研究者信息部分的标题，不解析页面（页面内容没有变化时不需要解析）
+        if slice_researcher_section(html_content) is None:
             logging.error("未找到研究者信息部分")
-            # 保存HTML用于调试
-            debug_file = os.path.join(self.output_dir, f"debug_html_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.html")
-            with open(debug_file, "w", encoding="utf-8") as f:
-                f.write(html_content)
-            logging.info(f"已保存调试HTML到 {debug_file}")
+            # 调试模式下保存HTML
+            if self.debug:
+                debug_file = os.path.join(self.output_dir, f"debug_html_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.html")
+                with open(debug_file, "w", encoding="utf-8") as f:
+                    f.write(html_content)
+                logging.info(f"已保存调试HTML到 {debug_file}")
             return {}
-        
-        researcher_info = {}
-        
-        # 1. 提取主要研究者信息
-        main_researcher_section = soup.find(lambda tag: tag.name == 'div' and '主要研究者信息' in tag.text and 'sDPTit2' in tag.get('class', []))
-        if main_researcher_section:
-            main_researcher_info = {}
-            
-            # 查找主要研究者表格
-            main_table = main_researcher_section.find_next('table', class_='searchDetailTable')
-            if main_table:
-                # 提取研究者信息
-                rows = main_table.find_all('tr')
-                if rows:
-                    # 第一行: 姓名、学位、职称
-                    first_row = rows[0]
-                    cells = first_row.find_all(['th', 'td'])
-                    if len(cells) >= 7:  # 跳过第一个th(序号)
-                        main_researcher_info['姓名'] = cells[2].text.strip()
-                        main_researcher_info['学位'] = cells[4].text.strip()
-                        main_researcher_info['职称'] = cells[6].text.strip()
-                    
-                    # 第二行: 电话、Email、邮政地址
-                    if len(rows) > 1:
-                        second_row = rows[1]
-                        cells = second_row.find_all(['th', 'td'])
-                        if len(cells) >= 7:
-                            main_researcher_info['电话'] = cells[1].text.strip()
-                            main_researcher_info['Email'] = cells[3].text.strip()
-                            main_researcher_info['邮政地址'] = cells[5].text.strip()
-                    
-                    # 第三行: 邮编、单位名称
-                    if len(rows) > 2:
-                        third_row = rows[2]
-                        cells = third_row.find_all(['th', 'td'])
-                        if len(cells) >= 5:
-                            main_researcher_info['邮编'] = cells[1].text.strip()
-                            main_researcher_info['单位名称'] = cells[3].text.strip()
-        
-            researcher_info['主要研究者信息'] = main_researcher_info
-        
-        # 2. 提取各参加机构信息
-        institutions_section = soup.find(lambda tag: tag.name == 'div' and '各参加机构信息' in tag.text and 'sDPTit2' in tag.get('class', []))
-        if institutions_section:
-            institutions = []
-            
-            # 查找机构表格
-            inst_table = institutions_section.find_next('table', class_='searchDetailTable')
-            if inst_table:
-                # 获取表头
-                header_row = inst_table.find('tr')
-                if header_row:
-                    headers = [th.text.strip() for th in header_row.find_all('th')]
-                    
-                    # 处理数据行
-                    data_rows = inst_table.find_all('tr')[1:]  # 跳过表头
-                    for row in data_rows:
-                        cells = row.find_all('td')
-                        if cells:
-                            # 创建一个字典，将表头与单元格内容对应
-                            inst = {}
-                            for i, cell in enumerate(cells):
-                                if i < len(headers):  # 确保不超出表头数量
-                                    inst[headers[i]] = cell.text.strip()
-                            
-                            institutions.append(inst)
-        
-            researcher_info['各参加机构信息'] = institutions
-        
-        # 将研究者信息添加到详细信息中
-        if researcher_info:
-            detail['研究者信息'] = researcher_info
-        else:
-            logging.error("未能提取到研究者信息")
-        
-        return detail
+        return super().extract_trial_detail(html_content)
+
+    def render_key(self, trial, detail):
+        """
+        试验详细信息的渲染键：页面内容哈希（不含反爬虫令牌和脚本）、渲染器版本和渲染用到的列表页字段的哈希，
+        无法确定原始页面时（例如流式解析的结果）返回None
+        """
+        digest = getattr(detail, 'digest', None)
+        if digest is None:
+            return None
+        fields = json.dumps([trial.get(key, '') for key in RENDER_FIELDS], ensure_ascii=False)
+        return content_hash(f"{RENDERER_VERSION}\n{digest}\n{fields}")
 
     def format_detail_markdown(self, trial, detail):
         """
@@ -239,20 +234,80 @@ class ChinaDrugTrialsDetailExtractor(ChinaDrugTrialsSearcher):
                 markdown += f"## {section}\n\n"
                 if isinstance(info, dict):
                     for key, value in info.items():
-                        markdown += f"- **{key}**: {value}\n"
+                        if isinstance(value, list):
+                            # 入选/排除标准等逐条列出
+                            markdown += f"- **{key}**:\n"
+                            for item in value:
+                                markdown += f"  - {item}\n"
+                        else:
+                            markdown += f"- **{key}**: {value}\n"
+                elif isinstance(info, list):
+                    # 伦理委员会信息等多条记录
+                    for index, item in enumerate(info, 1):
+                        if isinstance(item, dict):
+                            markdown += f"**{index}.** " + "；".join(f"{key}: {value}" for key, value in item.items()) + "\n\n"
+                        else:
+                            markdown += f"- {item}\n"
                 else:
                     markdown += f"{info}\n"
                 markdown += "\n"
             
         return markdown
 
-    def process_trials_with_details(self, trials, output_dir):
+    def _process_details(self, trials, output_dir, processed, use_local_file=False, prefer_recent=False, limit=None):
+        """
+        按优先级获取并保存每个试验的详细信息，成功处理的试验追加到 processed，
+        成功处理 limit 个试验后停止（获取失败的试验由优先级较低的试验补上）
+
+        原始页面和渲染用到的列表页字段都与上次相同（渲染键相同）时不解析页面，
+        只有内容变化的文件才会写入。
+        """
+        total = min(limit, len(trials)) if limit else len(trials)
+        for trial, detail in self.fetch_details(trials, use_local_file, prefer_recent=prefer_recent, parse=True):
+            logging.info(f"处理第 {len(processed)+1}/{total} 个试验: {trial['登记号']}")
+
+            if detail is None:
+                logging.error(f"无法获取试验 {trial['登记号']} 的详细信息")
+                continue
+
+            # 原始页面和列表页字段都没有变化时，已有的文件就是渲染结果，不需要解析
+            filename = f"{output_dir}/{trial['登记号']}_detail.md"
+            key = self.render_key(trial, detail)
+            if self.renders.fresh(trial['登记号'], key, filename):
+                logging.info(f"试验 {trial['登记号']} 的详细信息没有变化，跳过渲染")
+            else:
+                if not detail:
+                    logging.error(f"无法提取试验 {trial['登记号']} 的详细信息")
+                    continue
+
+                # 格式化为Markdown
+                markdown = self.format_detail_markdown(trial, detail)
+
+                # 保存到单独文件（内容相同时不写入）
+                if self.renders.write(filename, markdown):
+                    logging.info(f"已保存试验 {trial['登记号']} 的详细信息到 {filename}")
+                institutions = [inst.name for inst in detail.institutions if inst.name] if key else []
+                self.renders.put(trial['登记号'], key, institutions=institutions)
+            processed.append(trial)
+
+            # 停止迭代后不再发送新的请求（已发送的请求会完成）
+            if limit and len(processed) >= limit:
+                logging.info(f"已处理 {limit} 个试验，不再获取详细信息")
+                break
+
+    def process_trials_with_details(self, trials, output_dir, limit=None, use_local_file=False, prefer_recent=False):
         """
         处理多个临床试验，提取详细信息并保存到文件
+
+        详细信息按优先级获取（尚未招募 > 招募中 > 其他），运行被中断或
+        时间预算不足时，已处理的试验仍会写入汇总文件，跳过的试验列在运行报告中。
         
         Args:
             trials: 临床试验列表
             output_dir: 输出目录
+            limit: 最多处理的临床试验数，成功处理 limit 个后不再获取详细信息
+            use_local_file: 优先使用本地保存的 trial_detail_{试验ID}.html
+            prefer_recent: 同一试验状态内登记号较新的试验优先
         
         Returns:
             bool: 是否成功处理
@@ -262,73 +317,39 @@ class ChinaDrugTrialsDetailExtractor(ChinaDrugTrialsSearcher):
             os.makedirs(output_dir)
             logging.info(f"创建输出目录: {output_dir}")
         
-        # 创建汇总文件
         summary_file = f"{output_dir}/trials_summary.md"
-        with open(summary_file, 'w', encoding='utf-8') as f:
-            f.write("# 临床试验详细信息汇总\n\n")
-            f.write("## 目录\n\n")
-        
-        # 处理每个试验
-        for i, trial in enumerate(trials):
-            if not trial.get('试验ID'):
-                logging.warning(f"试验 {i+1} 没有ID，跳过")
-                continue
-                
-            logging.info(f"处理第 {i+1}/{len(trials)} 个试验: {trial['登记号']}")
-            
-            # 获取详细信息
-            detail_html = self.get_trial_detail(trial['试验ID'])
-            if not detail_html:
-                logging.error(f"无法获取试验 {trial['登记号']} 的详细信息")
-                continue
-                
-            # 提取详细信息
-            detail = self.extract_trial_detail(detail_html)
-            if not detail:
-                logging.error(f"无法提取试验 {trial['登记号']} 的详细信息")
-                continue
-                
-            # 格式化为Markdown
-            markdown = self.format_detail_markdown(trial, detail)
-            
-            # 保存到单独文件
-            filename = f"{output_dir}/{trial['登记号']}_detail.md"
-            with open(filename, 'w', encoding='utf-8') as f:
-                f.write(markdown)
-            logging.info(f"已保存试验 {trial['登记号']} 的详细信息到 {filename}")
-            
-            # 添加到汇总文件
-            with open(summary_file, 'a', encoding='utf-8') as f:
-                # 添加到目录
-                f.write(f"- [{trial['试验通俗题目']}](#{trial['登记号']})\n")
-            
-            # 休眠以避免过载服务器
-            import time
-            time.sleep(1)
-        
-        # 添加详细内容到汇总文件
-        with open(summary_file, 'a', encoding='utf-8') as f:
-            f.write("\n---\n\n")
-            f.write("# 详细信息\n\n")
-        
-        # 再次处理每个试验，添加详细内容到汇总文件
-        for i, trial in enumerate(trials):
-            if not trial.get('试验ID'):
-                continue
-                
-            # 读取单独文件内容
+
+        # 处理每个试验（会话池中有多个会话时并发获取详细信息页面）
+        processed = []
+        try:
+            self._process_details(trials, output_dir, processed, use_local_file, prefer_recent, limit)
+        except KeyboardInterrupt:
+            logging.warning(f"运行被中断，已处理 {len(processed)}/{len(trials)} 个试验，继续生成汇总文件")
+
+        # 用各试验的详细信息文件拼接汇总文件，内容没有变化时不写入
+        summary = io.StringIO()
+        summary.write("# 临床试验详细信息汇总\n\n")
+        summary.write("## 目录\n\n")
+        for trial in processed:
+            summary.write(f"- [{trial['试验通俗题目']}](#{trial['登记号']})\n")
+        summary.write("\n")
+        summary.write(self.report.format_markdown())
+        summary.write("\n---\n\n")
+        summary.write("# 详细信息\n\n")
+        for trial in processed:
             filename = f"{output_dir}/{trial['登记号']}_detail.md"
             if os.path.exists(filename):
                 with open(filename, 'r', encoding='utf-8') as source:
-                    content = source.read()
-                    
                     # 添加锚点
-                    with open(summary_file, 'a', encoding='utf-8') as target:
-                        target.write(f"<a id='{trial['登记号']}'></a>\n\n")
-                        target.write(content)
-                        target.write("\n---\n\n")
-        
-        logging.info(f"已生成汇总文件: {summary_file}")
+                    summary.write(f"<a id='{trial['登记号']}'></a>\n\n")
+                    summary.write(source.read())
+                    summary.write("\n---\n\n")
+
+        if self.renders.write(summary_file, summary.getvalue()):
+            logging.info(f"已生成汇总文件: {summary_file}")
+        else:
+            logging.info(f"汇总文件没有变化: {summary_file}")
+        self.renders.save()
         return True
 
     def create_comprehensive_summary(self, trials, output_dir, search_keywords, filter_keywords):
@@ -352,7 +373,7 @@ class ChinaDrugTrialsDetailExtractor(ChinaDrugTrialsSearcher):
         today = datetime.datetime.now().strftime('%Y%m%d')
         summary_file = f"{today}_{search_keywords}_comprehensive.md"
         
-        with open(summary_file, 'w', encoding='utf-8') as f:
+        with io.StringIO() as f:
             # 标题和基本信息
             f.write(f"# {search_keywords} 相关临床试验综合报告\n\n")
             f.write(f"**搜索日期**: {datetime.datetime.now().strftime('%Y-%m-%d')}\n")
@@ -360,6 +381,8 @@ class ChinaDrugTrialsDetailExtractor(ChinaDrugTrialsSearcher):
             if filter_keywords:
                 f.write(f"**过滤关键词**: {', '.join(filter_keywords)}\n")
             f.write(f"**试验总数**: {len(trials)}\n\n")
+            if self.report.partial:
+                f.write("**注意**: 本次运行因时间预算提前结束，结果不完整，详见文末运行报告。\n\n")
             
             # 目录
             f.write("## 目录\n\n")
@@ -399,6 +422,19 @@ class ChinaDrugTrialsDetailExtractor(ChinaDrugTrialsSearcher):
             # 收集所有机构
             all_institutions = {}
             for trial in trials:
+                # 优先使用渲染缓存中的参加机构
+                cached = self.renders.get(trial['登记号'])
+                if cached is not None:
+                    for name in cached.get('institutions', []):
+                        all_institutions[name] = all_institutions.get(name, 0) + 1
+                    continue
+                # 其次从保存的详细信息页面中读取参加机构（只解析研究者信息部分）
+                detail_html = self.load_detail_page(trial['试验ID']) if trial.get('试验ID') else None
+                if detail_html:
+                    for inst in LazyTrialDetail(detail_html).institutions:
+                        if inst.name:
+                            all_institutions[inst.name] = all_institutions.get(inst.name, 0) + 1
+                    continue
                 # 从详细信息文件中读取研究者信息
                 detail_file = f"{output_dir}/{trial['登记号']}_detail.md"
                 if os.path.exists(detail_file):
@@ -438,15 +474,6 @@ class ChinaDrugTrialsDetailExtractor(ChinaDrugTrialsSearcher):
             f.write("## 详细试验列表\n\n")
             
             # 按试验状态排序
-            def get_trial_priority(trial):
-                status = trial['试验状态']
-                if "尚未招募" in status:
-                    return 0
-                elif "招募中" in status:
-                    return 1
-                else:
-                    return 2
-            
             sorted_trials = sorted(trials, key=get_trial_priority)
             
             for trial in sorted_trials:
@@ -462,10 +489,43 @@ class ChinaDrugTrialsDetailExtractor(ChinaDrugTrialsSearcher):
                     f.write(f"- [查看详细信息]({detail_file})\n")
                 
                 f.write("\n")
-        
+
+            f.write(self.report.format_markdown())
+            content = f.getvalue()
+
+        # 内容没有变化时不写入
+        self.renders.write(summary_file, content)
+        self.renders.save()
         logging.info(f"已生成综合汇总文件: {summary_file}")
         return summary_file
 
+def process_reg_file(client, reg_file, detail_dir, args):
+    """
+    批量模式：读取登记号文件，通过登记号索引（只搜索索引中没有的登记号）找到试验ID，
+    并发获取详细信息并生成汇总文件
+    """
+    reg_nos = read_reg_nos(reg_file)
+    if not reg_nos:
+        print(f"文件 {reg_file} 中没有找到登记号")
+        return
+
+    print(f"从 {reg_file} 读取到 {len(reg_nos)} 个登记号")
+    resolved = client.resolve_reg_nos(reg_nos)
+    missing = [reg_no for reg_no in reg_nos if reg_no not in resolved]
+    if missing:
+        print(f"以下 {len(missing)} 个登记号未找到对应的试验: {', '.join(missing)}")
+
+    trials = [resolved[reg_no].to_dict() for reg_no in reg_nos if reg_no in resolved]
+    if not trials:
+        return
+
+    print(f"开始提取 {len(trials)} 个试验的详细信息并保存到 {detail_dir} 目录...")
+    client.searcher.process_trials_with_details(trials, detail_dir, limit=args.limit, use_local_file=args.local, prefer_recent=args.recent_first)
+    print(f"成功生成汇总文件: {os.path.join(detail_dir, 'trials_summary.md')}")
+
+    if client.report.partial:
+        print("时间预算不足，部分页面或详细信息被跳过，详见汇总文件中的运行报告")
+
 def main():
     """
     主函数
@@ -484,10 +544,48 @@ def main():
     parser.add_argument('--detail-dir', help='详细信息输出目录，默认为output/details')
     parser.add_argument('-l', '--local', action='store_true', help='使用本地文件作为响应内容，而不是从网站获取')
     parser.add_argument('--no-auto-pages', action='store_true', help='不自动获取所有页面，只获取第一页')
-    parser.add_argument('--debug', action='store_true', help='调试模式，保存更多中间文件')
+    parser.add_argument('--debug', action='store_true', help='调试模式，同时把原始响应和无法解析的页面保存为HTML文件')
+    parser.add_argument('--plan', action='store_true', help='只输出查询计划（各策略的预计页数和请求数），不执行搜索')
+    parser.add_argument('--pushdown', action='store_true', help='允许把过滤关键词近似下推为适应症搜索，以减少请求数')
+    parser.add_argument('--limit', type=int, help='最多获取的临床试验数（过滤后），达到后停止翻页和获取详细信息')
+    parser.add_argument('--sessions', type=int, default=1, help='会话池中的会话数（独立的Cookie身份），默认为1')
+    parser.add_argument('--recent-first', action='store_true', help='获取详细信息时，同一试验状态内登记号较新的试验优先')
+    parser.add_argument('--deadline', type=float, help='运行时间预算（秒），时间不足时停止发送新请求并输出部分结果')
+    parser.add_argument('--hedge', action='store_true', help='详细信息请求耗时超过p95时用另一个会话发送备用请求（需要 --sessions 2 以上）')
+    parser.add_argument('--stream', action='store_true', help='流式解析详细信息页面：边下载边解析，不保存原始响应，内存占用与页面大小无关')
+    parser.add_argument('--comprehensive', action='store_true', help='生成综合汇总报告（状态分布、研究机构分布等）')
+    parser.add_argument('--reg-file', help='批量模式：从文件读取登记号（每行一个或CSV），获取这些试验的详细信息')
 
     args = parser.parse_args()
 
+    # 初始化客户端（首次请求时才访问首页，Cookie保存到 output/cookie_jar.json，原始响应写入 output/pages.pack，
+    # 列表页中出现的试验记录到 output/trial_index.json，
+    # 渲染结果的哈希记录到 output/render_cache.json）
+    from chinadrugtrials_client import Client
+    from chinadrugtrials_pack import default_pack_file
+    client = Client(
+        sessions=args.sessions,
+        cookies=load_config_cookies(),
+        cookie_jar_file=default_cookie_jar_file(),
+        deadline=args.deadline,
+        use_local_file=args.local,
+        save_raw=True,
+        index_file=default_index_file(),
+        capabilities_file=default_capabilities_file(),
+        hedge=args.hedge,
+        stream=args.stream,
+        pack_file=default_pack_file(),
+        debug=args.debug,
+        render_cache_file=default_render_cache_file()
+    )
+    detail_extractor = client.searcher
+    detail_dir = args.detail_dir or os.path.join(detail_extractor.output_dir, "details")
+
+    # 批量模式：按登记号获取详细信息
+    if args.reg_file:
+        process_reg_file(client, args.reg_file, detail_dir, args)
+        return
+
     # 获取搜索关键词
     if args.keywords:
         search_keywords = args.keywords
@@ -510,10 +608,6 @@ def main():
         else:
             filter_keywords = filter_input.split()
 
-    # 初始化搜索器
-    searcher = ChinaDrugTrialsSearcher()
-    detail_extractor = ChinaDrugTrialsDetailExtractor()
-
     print(f"搜索关键词: {search_keywords}")
     print(f"过滤关键词: {', '.join(filter_keywords)}")
 
@@ -523,28 +617,34 @@ def main():
     else:
         state = args.state or "进行中"  # 默认为"进行中"
 
+    # 只输出查询计划
+    if args.plan:
+        print(client.plan(search_keywords, filter_keywords, args.indication or "", args.reg_no or "", state, args.drugs_name or "", args.ckm_index))
+        sys.exit(0)
+
     # 搜索临床试验
-    trials = searcher.search_all_pages(
+    records = client.search(
         search_keywords,
         filter_keywords,
-        args.pages,
         args.indication or "",
         args.reg_no or "",
         state,  # 使用处理后的state值
         args.drugs_name or "",
-        args.ckm_index,
-        args.local,  # 使用本地文件
-        not args.no_auto_pages  # 自动获取所有页面
+        max_pages=1 if args.no_auto_pages else args.pages,
+        limit=args.limit,
+        pushdown=args.pushdown,
+        ckm_index=args.ckm_index
     )
+    trials = [record.to_dict() for record in records]
 
-    if not trials:
+    if not trials and not client.report.partial:
         print(f"未找到与过滤关键词相关的临床试验: {', '.join(filter_keywords)}")
         sys.exit(0)
 
     # 格式化为Markdown并保存基本信息
     # 使用format_trials_markdown函数而不是searcher的方法
     from chinadrugtrials_extract import format_trials_markdown
-    markdown = format_trials_markdown(trials)
+    markdown = format_trials_markdown(trials, client.report)
     
     # 保存基本信息到文件
     today = datetime.datetime.now().strftime('%Y%m%d')
@@ -555,13 +655,11 @@ def main():
 
     # 确保输出文件保存在output目录下
     output_file = os.path.join(detail_extractor.output_dir, output_file)
-    with open(output_file, 'w', encoding='utf-8') as f:
-        f.write(markdown)
+    detail_extractor.renders.write(output_file, markdown)
 
     print(f"成功提取 {len(trials)} 个临床试验基本信息并保存到 {output_file}")
 
     # 处理详细信息
-    detail_dir = args.detail_dir or os.path.join(detail_extractor.output_dir, "details")
     # 确保详细信息目录存在
     if not os.path.exists(detail_dir):
         os.makedirs(detail_dir)
@@ -570,11 +668,11 @@ def main():
     print(f"开始提取详细信息并保存到 {detail_dir} 目录...")
     
     # 处理详细信息
-    detail_extractor.process_trials_with_details(trials, detail_dir)
+    detail_extractor.process_trials_with_details(trials, detail_dir, limit=args.limit, use_local_file=args.local, prefer_recent=args.recent_first)
     
     # 生成汇总文件
     summary_file = os.path.join(detail_extractor.output_dir, f"{today}_{search_keywords}_details.md")
-    with open(summary_file, 'w', encoding='utf-8') as f:
+    with io.StringIO() as f:
         f.write(f"# {search_keywords} 相关临床试验详细信息\n\n")
         f.write(f"搜索关键词: {search_keywords}\n")
         f.write(f"过滤关键词: {', '.join(filter_keywords)}\n\n")
@@ -589,8 +687,20 @@ def main():
                     # 使用相对路径
                     rel_path = os.path.relpath(detail_file, os.path.dirname(summary_file))
                     f.write(f"- [{trial['试验通俗题目']}]({rel_path})\n")
-    
+        f.write("\n")
+        f.write(detail_extractor.report.format_markdown())
+        detail_extractor.renders.write(summary_file, f.getvalue())
+    detail_extractor.renders.save()
+
     print(f"成功生成汇总文件: {summary_file}")
 
+    # 生成综合汇总报告
+    if args.comprehensive:
+        comprehensive_file = detail_extractor.create_comprehensive_summary(trials, detail_dir, search_keywords, filter_keywords)
+        print(f"成功生成综合汇总报告: {comprehensive_file}")
+
+    if detail_extractor.report.partial:
+        print("时间预算不足，部分页面或详细信息被跳过，详见汇总文件中的运行报告")
+
 if __name__ == "__main__":
     main()
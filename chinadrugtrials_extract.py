@@ -4,12 +4,16 @@
 import os
 import re
 import sys
-import requests
 import datetime
-from bs4 import BeautifulSoup
 import logging
 import argparse
+import heapq
 import time
+from chinadrugtrials_store import load_capabilities, save_capabilities
+from chinadrugtrials_parser import parse_list_rows, parse_page_info, slice_list_regions
+from chinadrugtrials_detail import LazyTrialDetail
+from chinadrugtrials_pack import LIST_ENDPOINT, DETAIL_ENDPOINT
+from chinadrugtrials_http import SessionPool, Deadline, SingleFlight, iter_concurrent, payload_key, default_cookie_jar_file, load_config_cookies, LIST_PAGE_MARKERS, DETAIL_PAGE_MARKERS, NO_DATA_MARKERS, RESPONSE_OK, RESPONSE_EMPTY
 
 # 配置日志
 logging.basicConfig(
@@ -18,44 +22,229 @@ logging.basicConfig(
     datefmt='%Y-%m-%d %H:%M:%S'
 )
 
+BASE_URL = "http://www.chinadrugtrials.org.cn"
+
+# 所有请求使用的请求头
+DEFAULT_HEADERS = {
+    "Host": "www.chinadrugtrials.org.cn",
+    "Cache-Control": "max-age=0",
+    "Origin": "http://www.chinadrugtrials.org.cn",
+    "Upgrade-Insecure-Requests": "1",
+    "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/135.0.0.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7",
+    "Referer": "http://www.chinadrugtrials.org.cn/clinicaltrials.searchlist.dhtml",
+    "Accept-Language": "zh-CN,zh;q=0.9",
+    "Connection": "keep-alive",
+    "Content-Type": "application/x-www-form-urlencoded",
+}
+
+# 探测每页记录数时尝试的表单字段和每页记录数（服务器可能把过大的值截断为自己的上限）
+PAGE_SIZE_FIELDS = ("pagesize", "pageSize", "rows")
+PAGE_SIZE_CANDIDATES = (500, 100)
+
+class RunReport:
+    """
+    一次运行的报告：记录因时间预算不足而跳过的页面和详细信息，以及请求对冲和并发控制统计
+    """
+    def __init__(self):
+        self.started_at = time.time()
+        # (搜索说明, 跳过的页码列表)
+        self.skipped_pages = []
+        # 跳过详细信息的试验
+        self.skipped_details = []
+        # 详细信息请求的对冲统计（HedgeStats.summary()），未开启对冲时为None
+        self.hedging = None
+        # 并发控制的当前并发数和调整历史（ConcurrencyController.summary()）
+        self.concurrency = None
+
+    def skip_pages(self, query, pages):
+        self.skipped_pages.append((query, list(pages)))
+        logging.warning(f"时间预算不足，跳过 {query} 的第 {', '.join(str(p) for p in pages)} 页")
+
+    def skip_details(self, trials):
+        self.skipped_details.extend(trials)
+        logging.warning(f"时间预算不足，跳过 {len(trials)} 个试验的详细信息")
+
+    @property
+    def partial(self):
+        """
+        是否有内容被跳过（报告只包含部分结果）
+        """
+        return bool(self.skipped_pages or self.skipped_details)
+
+    def format_markdown(self):
+        """
+        将运行报告格式化为Markdown，没有需要报告的内容时返回空字符串
+        """
+        # 只有一个会话时并发数固定为1，不需要报告
+        concurrency = self.concurrency if self.concurrency and self.concurrency["max_limit"] > 1 else None
+        if not self.partial and not self.hedging and not concurrency:
+            return ""
+
+        markdown = "## 运行报告\n\n"
+        if self.partial:
+            markdown += f"**注意**: 运行在时间预算内结束（用时 {time.time() - self.started_at:.0f} 秒），以下内容被跳过，本报告只包含部分结果。\n\n"
+        if self.hedging:
+            h = self.hedging
+            markdown += "### 请求对冲\n\n"
+            markdown += f"- 详细信息请求: {h['requests']}，发送备用请求: {h['hedged']}（对冲率 {h['hedge_rate']:.1%}），备用请求先返回: {h['backup_wins']}（胜出率 {h['win_rate']:.1%}）\n"
+            if h['p50'] is not None:
+                markdown += f"- 耗时: p50 {h['p50']:.2f} 秒，p95 {h['p95']:.2f} 秒，p99 {h['p99']:.2f} 秒\n"
+            markdown += "\n"
+        if concurrency:
+            markdown += "### 并发控制\n\n"
+            markdown += f"- 当前并发数: {concurrency['limit']}（上限 {concurrency['max_limit']}）\n"
+            markdown += "- 调整历史（最近20次）:\n"
+            for offset, limit, reason in concurrency['history'][-20:]:
+                markdown += f"    - {offset:.1f} 秒: {limit}（{reason}）\n"
+            markdown += "\n"
+        if self.skipped_pages:
+            markdown += "### 跳过的搜索页面\n\n"
+            for query, pages in self.skipped_pages:
+                markdown += f"- {query}: 第 {', '.join(str(p) for p in pages)} 页\n"
+            markdown += "\n"
+        if self.skipped_details:
+            markdown += "### 跳过的详细信息\n\n"
+            for trial in self.skipped_details:
+                markdown += f"- {trial.get('登记号', '')} {trial.get('试验通俗题目', '')}（{trial.get('试验状态', '')}）\n"
+            markdown += "\n"
+        return markdown
+
 class ChinaDrugTrialsSearcher:
     """
     搜索中国药物临床试验登记与信息公示平台
     """
-    def __init__(self):
+    def __init__(self, transport=None, pool_size=1, deadline=None, report=None, save_raw=True):
         """
         初始化搜索器
+
+        参数:
+            transport: 共享的会话池（SessionPool），为None时创建新的会话池。
+                会话在首次请求时才获取Cookie（优先复用 output/cookie_jar.json），
+                本地模式下不会产生网络请求
+            pool_size: 新建会话池时的会话数，每个会话是独立的Cookie身份，
+                各自保持每秒最多一个请求的节奏
+            deadline: 运行的截止时间（Deadline），为None时没有限制
+            report: 共享的运行报告（RunReport），为None时创建新的报告
+            save_raw: 是否保存原始响应（用于调试、--local 模式和离线重新解析），
+                设置了 pages 时写入包文件，否则保存为HTML文件
         """
-        self.base_url = "http://www.chinadrugtrials.org.cn"
+        self.base_url = BASE_URL
         self.search_url = f"{self.base_url}/clinicaltrials.searchlist.dhtml"
-        self.session = requests.Session()
-        self.headers = {
-            "Host": "www.chinadrugtrials.org.cn",
-            "Cache-Control": "max-age=0",
-            "Origin": "http://www.chinadrugtrials.org.cn",
-            "Upgrade-Insecure-Requests": "1",
-            "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/135.0.0.0 Safari/537.36",
-            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7",
-            "Referer": "http://www.chinadrugtrials.org.cn/clinicaltrials.searchlist.dhtml",
-            "Accept-Language": "zh-CN,zh;q=0.9",
-            "Connection": "keep-alive",
-            "Content-Type": "application/x-www-form-urlencoded",
-        }
-        
-        # 初始化会话，访问首页获取Cookie
-        logging.info("初始化会话，访问首页获取Cookie")
-        try:
-            response = self.session.get(self.base_url, headers=self.headers)
-            status_code = response.status_code
-            logging.info(f"首页访问状态码: {status_code}")
-            
-            # 接受 200 和 202 状态码
-            if status_code not in [200, 202]:
-                logging.error(f"访问首页失败，状态码: {status_code}")
-            else:
-                logging.info("成功访问首页，获取Cookie")
-        except requests.exceptions.RequestException as e:
-            logging.error(f"访问首页异常: {e}")
+        # 每页记录数（网站默认每页显示20条）及设置它的表单字段（None表示不发送）
+        self.page_size = 20
+        self.page_size_field = None
+        # 能力探测结果文件，设置后首次搜索时探测服务器接受的每页记录数
+        self.capabilities_file = None
+        self.page_size_probed = False
+        self.headers = dict(DEFAULT_HEADERS)
+        self.transport = transport or SessionPool(
+            self.base_url, self.headers,
+            size=pool_size,
+            cookie_jar_file=default_cookie_jar_file(),
+            seed_cookies=load_config_cookies()
+        )
+        self.deadline = deadline or Deadline(None)
+        self.report = report or RunReport()
+        # 共享同一会话池的搜索器共用一个合并器，相同的并发查询共享解析结果
+        self.flight = getattr(self.transport, "flight", None) or SingleFlight()
+        self.save_raw = save_raw
+        # 是否对慢的详细信息请求发送备用请求（需要会话池中有多个会话）
+        self.hedge = False
+        # 登记号索引（TrialIndex），设置后解析列表页时记录出现的试验
+        self.index = None
+        # 原始页面包文件（PackStore），设置后原始响应写入包文件
+        self.pages = None
+        # 调试模式：设置了包文件时也把原始响应保存为HTML文件
+        self.debug = False
+
+    @property
+    def session(self):
+        """
+        底层的 requests.Session（与共享同一 transport 的搜索器共用）
+        """
+        return self.transport.session
+
+    @property
+    def workers(self):
+        """
+        并发请求数（等于会话池中的会话数）
+        """
+        return getattr(self.transport, "size", 1)
+
+    def has_budget(self):
+        """
+        剩余时间是否足够再发送一次请求（按会话池观测到的请求耗时估计）
+        """
+        if self.deadline.expires_at is None:
+            return True
+        estimate = self.transport.estimate_round_trip() if hasattr(self.transport, "estimate_round_trip") else 0
+        return self.deadline.can_fit(estimate)
+
+    def load_local_file(self, filename):
+        """
+        从当前目录或output目录加载本地保存的响应内容，不存在时返回None
+        """
+        for directory in (os.getcwd(), os.path.join(os.getcwd(), "output")):
+            local_file = os.path.join(directory, filename)
+            if os.path.exists(local_file):
+                with open(local_file, 'r', encoding='utf-8') as f:
+                    html_content = f.read()
+                logging.info(f"使用本地文件 {local_file} 作为响应内容")
+                return html_content
+        return None
+
+    def save_page(self, endpoint, payload, html_content, *filenames):
+        """
+        保存原始响应：设置了包文件时写入包文件，调试模式、没有包文件或包文件只读
+        （正被其他进程写入）时保存到 filenames
+        """
+        if not self.save_raw:
+            return
+        writable = self.pages is not None and not self.pages.readonly
+        if writable:
+            self.pages.put(endpoint, payload, html_content.encode('utf-8'))
+        if self.debug or not writable:
+            for filename in filenames:
+                directory = os.path.dirname(filename)
+                if directory and not os.path.exists(directory):
+                    os.makedirs(directory)
+                    logging.info(f"创建输出目录: {directory}")
+                with open(filename, "w", encoding="utf-8") as f:
+                    f.write(html_content)
+                logging.info(f"已保存原始响应内容到 {filename}")
+
+    def load_page(self, endpoint, payload, filename):
+        """
+        加载本地保存的原始响应：先查包文件（最新版本），再查本地文件，都没有时返回None
+        """
+        if self.pages is not None:
+            data = self.pages.get(endpoint, payload)
+            if data is not None:
+                logging.info(f"使用包文件 {self.pages.pack_file} 中的 {endpoint} {payload} 作为响应内容")
+                return str(data, 'utf-8')
+        return self.load_local_file(filename)
+
+    def load_detail_page(self, trial_id):
+        """
+        加载本地保存的详细信息页面，没有时返回None
+        """
+        return self.load_page(DETAIL_ENDPOINT, {"id": trial_id}, f"trial_detail_{trial_id}.html")
+
+    def list_payload(self, keywords, page, indication="", reg_no="", state="进行中", drugs_name="", page_size_field=None, page_size=None):
+        """
+        列表页在包文件中的键（查询条件、页码和每页记录数，不含其他表单字段）
+
+        每页记录数默认使用当前设置；只有设置了每页记录数字段时才写入键，
+        按网站默认每页记录数保存的页面沿用原来的键。不同每页记录数的页面
+        分页不同，不能互相代替。
+        """
+        payload = {"keywords": keywords, "indication": indication, "reg_no": reg_no,
+                   "state": state, "drugs_name": drugs_name, "currentpage": str(page)}
+        page_size_field = page_size_field or self.page_size_field
+        if page_size_field:
+            payload[page_size_field] = str(page_size or self.page_size)
+        return payload
 
     def get_trial_detail(self, trial_id, ckm_index=""):
         """
@@ -70,57 +259,138 @@ class ChinaDrugTrialsSearcher:
 
         logging.info(f"获取临床试验详细信息: {trial_id}")
 
+        import requests
+
         try:
-            response = self.session.post(detail_url, headers=self.headers, data=data)
-            status_code = response.status_code
-            logging.info(f"请求返回状态码: {status_code}")
+            response = self.post_detail(detail_url, data)
+            logging.info(f"请求返回状态码: {response.status_code}，分类: {response.kind}")
 
-            if status_code not in [200, 202]:
-                logging.error(f"请求失败，状态码: {status_code}")
+            if response.kind != RESPONSE_OK:
+                logging.error(f"未获取到有效的详细信息页面（{response.kind}，状态码: {response.status_code}）")
                 return None
 
-            # 保存详细信息到文件
-            with open(f"trial_detail_{trial_id}.html", "w", encoding="utf-8") as f:
-                f.write(response.text)
-            logging.info(f"已保存详细信息到 trial_detail_{trial_id}.html")
+            # 保存详细信息
+            self.save_page(DETAIL_ENDPOINT, {"id": trial_id}, response.html, f"trial_detail_{trial_id}.html")
 
-            return response.text
+            return response.html
         except requests.exceptions.RequestException as e:
             logging.error(f"请求异常: {e}")
             return None
 
-    def extract_trial_detail(self, html_content):
+    def post_detail(self, detail_url, data):
         """
-        从HTML内容中提取临床试验详细信息
+        发送详细信息请求；开启对冲时，耗时超过p95的请求会用另一个会话发送备用请求
         """
-        if not html_content:
-            return {}
+        if self.hedge and hasattr(self.transport, "post_hedged"):
+            return self.transport.post_hedged(detail_url, data, DETAIL_PAGE_MARKERS)
+        return self.transport.post(detail_url, data, DETAIL_PAGE_MARKERS)
 
-        soup = BeautifulSoup(html_content, 'html.parser')
+    def fetch_details(self, trials, use_local_file=False, prioritize=True, prefer_recent=False, parse=False):
+        """
+        获取多个临床试验的详细信息页面，按获取顺序生成 (trial, detail_html)；
+        parse 为True时生成 (trial, 详细信息字典)，在工作线程中解析，无法获取时为None
 
-        # 提取详细信息
-        detail = {}
+        获取顺序由优先队列决定：尚未招募 > 招募中 > 其他，可选再按登记号从新到旧，
+        这样运行被中断或被限流时，患者可以参加的试验已经获取完毕。
+        会话池中有多个会话时并发获取；没有试验ID的试验会被跳过。
+        调用方停止迭代或时间预算不足时不再发送新的请求，已发送的请求会完成，
+        未获取的试验记录在运行报告中。
 
-        # 提取标题
-        title_elem = soup.find('h3', class_='text-center')
-        if title_elem:
-            detail['标题'] = title_elem.text.strip()
+        参数:
+            trials: 临床试验列表
+            use_local_file: 优先使用本地保存的 trial_detail_{试验ID}.html
+            prioritize: 是否按优先级获取，为False时按表格顺序获取
+            prefer_recent: 同一状态内登记号较新的试验优先
+            parse: 是否生成解析后的详细信息（见 get_parsed_detail）
+        """
+        def fetch(trial):
+            if parse:
+                return self.get_parsed_detail(trial['试验ID'], use_local_file)
+            detail_html = None
+            if use_local_file:
+                detail_html = self.load_detail_page(trial['试验ID'])
+            if not detail_html:
+                detail_html = self.get_trial_detail(trial['试验ID'])
+            return detail_html
+
+        with_ids = [trial for trial in trials if trial.get('试验ID')]
+        if len(with_ids) < len(trials):
+            logging.warning(f"{len(trials) - len(with_ids)} 个试验没有ID，跳过")
+
+        # 优先队列，序号保证同优先级的试验保持表格顺序
+        queue = []
+        for seq, trial in enumerate(with_ids):
+            priority = get_detail_priority(trial, prefer_recent) if prioritize else (0, 0)
+            heapq.heappush(queue, (priority, seq, trial))
+
+        def drain():
+            while queue:
+                if not self.has_budget():
+                    self.report.skip_details([item[2] for item in sorted(queue)])
+                    queue.clear()
+                    return
+                yield heapq.heappop(queue)[2]
+
+        # 开启对冲时留出一个会话发送备用请求
+        workers = max(1, self.workers - 1) if self.hedge else self.workers
+        try:
+            for trial, detail_html in iter_concurrent(fetch, drain(), workers):
+                yield trial, detail_html
+        finally:
+            if self.pages is not None:
+                self.pages.flush()
+            self.update_report()
+
+    def update_report(self):
+        """
+        把会话池的对冲和并发控制统计写入运行报告
+        """
+        if self.hedge and hasattr(self.transport, "hedging"):
+            self.report.hedging = self.transport.hedging.summary()
+        if hasattr(self.transport, "controller"):
+            self.report.concurrency = self.transport.controller.summary()
 
-        # 提取详细信息表格
-        tables = soup.find_all('table', class_='table')
-        for table in tables:
-            rows = table.find_all('tr')
-            for row in rows:
-                cells = row.find_all('td')
-                if len(cells) >= 2:
-                    key = cells[0].text.strip()
-                    value = cells[1].text.strip()
-                    if key and value:
-                        detail[key] = value
+    def fetch_trial_detail(self, trial_id):
+        """
+        获取并解析临床试验详细信息，返回 (HTML内容, 详细信息字典)，无法获取时均为None
+
+        相同试验ID的并发调用共享一次请求和解析结果。
+        """
+        def fetch():
+            detail_html = self.get_trial_detail(trial_id)
+            if not detail_html:
+                return None, None
+            return detail_html, self.extract_trial_detail(detail_html)
 
-        return detail
+        key = f"detail:{type(self).__name__}:{trial_id}"
+        return self.flight.do(key, fetch)
 
-    def search(self, keywords, page, indication="", reg_no="", state="进行中", drugs_name="", ckm_index=""):
+    def get_parsed_detail(self, trial_id, use_local_file=False):
+        """
+        获取并解析临床试验详细信息，返回详细信息字典，无法获取时返回None
+
+        参数:
+            use_local_file: 优先使用本地保存的 trial_detail_{试验ID}.html
+        """
+        if use_local_file:
+            detail_html = self.load_detail_page(trial_id)
+            if detail_html:
+                return self.extract_trial_detail(detail_html)
+        detail_html, detail = self.fetch_trial_detail(trial_id)
+        return detail if detail_html else None
+
+    def extract_trial_detail(self, html_content):
+        """
+        从HTML内容中提取临床试验详细信息（所有部分，研究者信息见 TrialDetailRecord.to_dict）
+
+        返回 LazyTrialDetail：用法与字典相同，各部分在第一次访问时才解析
+        """
+        if not html_content:
+            return {}
+
+        return LazyTrialDetail(html_content)
+
+    def search(self, keywords, page, indication="", reg_no="", state="进行中", drugs_name="", ckm_index="", page_size_field=None, page_size=None):
         """
         搜索临床试验
         
@@ -132,6 +402,7 @@ class ChinaDrugTrialsSearcher:
             state: 试验状态（二级搜索参数），默认为"进行中"
             drugs_name: 药物名称（二级搜索参数）
             ckm_index: ckm_index参数
+            page_size_field, page_size: 每页记录数的表单字段和取值，默认使用探测到的设置
         """
         data = {
             "id": "",
@@ -153,69 +424,57 @@ class ChinaDrugTrialsSearcher:
             "agencies": "",
             "state": state
         }
+        page_size_field = page_size_field or self.page_size_field
+        if page_size_field:
+            data[page_size_field] = str(page_size or self.page_size)
 
         logging.info(f"发送请求到 {self.search_url}")
         logging.info(f"搜索参数: 关键词={keywords}, 页码={page}, 适应症={indication}, 登记号={reg_no}, 状态={state}, 药物名称={drugs_name}, ckm_index={ckm_index}")
 
+        import requests
+
         try:
-            # 使用会话对象发送请求
-            response = self.session.post(self.search_url, headers=self.headers, data=data)
-            status_code = response.status_code
-            logging.info(f"请求返回状态码: {status_code}")
-
-            # 接受 200 和 202 状态码
-            if status_code not in [200, 202]:
-                logging.error(f"请求失败，状态码: {status_code}")
+            # 使用会话对象发送请求（响应已按原始字节分类，验证页面和错误页面已重试过）
+            response = self.transport.post(self.search_url, data, LIST_PAGE_MARKERS, NO_DATA_MARKERS)
+            logging.info(f"请求返回状态码: {response.status_code}，{len(response.content)} 字节，分类: {response.kind}")
+
+            if response.kind == RESPONSE_EMPTY:
+                logging.info("搜索无结果（暂无数据）")
+            elif response.kind != RESPONSE_OK:
+                logging.error(f"未获取到有效的列表页（{response.kind}）")
                 return None
 
-            # 如果是 202 状态码，记录一下但继续处理
-            if status_code == 202:
-                logging.warning("收到 202 Accepted 状态码，继续处理响应内容")
-
-            content_length = len(response.text)
-            logging.info(f"返回内容长度: {content_length} 字符")
-
-            # 检查响应内容是否包含关键字
-            content_preview = response.text[:200] + "..." if len(response.text) > 200 else response.text
-            logging.info(f"响应内容预览: {content_preview}")
-
-            # 检查是否包含常见的HTML标签
-            has_html = "<html" in response.text.lower() and "<body" in response.text.lower()
-            logging.info(f"响应内容是否包含HTML标签: {has_html}")
-
-            # 检查是否包含可能的临床试验信息
-            has_trial_info = "试验" in response.text or "临床" in response.text
-            logging.info(f"响应内容是否包含临床试验相关信息: {has_trial_info}")
-
-            # 检查是否包含可能的表格元素
-            has_table = "<table" in response.text.lower() and "<tr" in response.text.lower()
-            logging.info(f"响应内容是否包含表格元素: {has_table}")
-
-            # 创建输出目录（如果不存在）
+            # 保存原始响应（保存为文件时额外保存一个带时间戳的临时文件用于对比；
+            # 包文件中同一查询的每次响应都按获取时间保存）
             output_dir = os.path.join(os.getcwd(), "output")
-            if not os.path.exists(output_dir):
-                os.makedirs(output_dir)
-                logging.info(f"创建输出目录: {output_dir}")
-
-            # 保存原始响应内容到文件，用于调试
-            debug_file = os.path.join(output_dir, f"response_page_{page}.html")
-            with open(debug_file, "w", encoding="utf-8") as f:
-                f.write(response.text)
-            logging.info(f"已保存原始响应内容到 {debug_file}")
-
-            
-            # 额外保存一个带时间戳的临时文件用于对比
-            import time
-            temp_file = os.path.join(output_dir, f"temp_response_page_{page}_{int(time.time())}.html")
-            with open(temp_file, "w", encoding="utf-8") as f:
-                f.write(response.text)
-            logging.info(f"已保存临时响应文件到 {temp_file}")
-
-            return response.text
+            self.save_page(LIST_ENDPOINT, self.list_payload(keywords, page, indication, reg_no, state, drugs_name, page_size_field, page_size), response.html,
+                           os.path.join(output_dir, f"response_page_{page}.html"),
+                           os.path.join(output_dir, f"temp_response_page_{page}_{int(time.time())}.html"))
+
+            return response.html
         except requests.exceptions.RequestException as e:
             logging.error(f"请求异常: {e}")
             return None
 
+    def fetch_trials_page(self, keywords, page, indication="", reg_no="", state="进行中", drugs_name="", ckm_index=""):
+        """
+        获取并解析一页搜索结果，返回 (HTML内容, 未过滤的临床试验列表)，无法获取时为 (None, [])
+
+        相同参数的并发调用（例如查询服务的多个客户端）共享一次请求和解析结果。
+        """
+        def fetch():
+            html_content = self.search(keywords, page, indication, reg_no, state, drugs_name, ckm_index)
+            if not html_content:
+                return None, []
+            return html_content, self.extract_trials_from_table(html_content)
+
+        key = "page:" + payload_key(self.search_url, {
+            "keywords": keywords, "page": page, "indication": indication, "reg_no": reg_no,
+            "state": state, "drugs_name": drugs_name, "ckm_index": ckm_index,
+            "page_size": f"{self.page_size_field}={self.page_size}",
+        })
+        return self.flight.do(key, fetch)
+
     def extract_trials_from_table(self, html_content, filter_keywords=None):
         """
         从HTML表格中提取临床试验信息
@@ -224,8 +483,51 @@ class ChinaDrugTrialsSearcher:
             logging.error("HTML内容为空，无法提取临床试验信息")
             return []
 
+        # 没有结果表格的页面（暂无数据、验证页面）不必构建DOM树
+        if 'searchTable' not in html_content:
+            if '暂无数据' in html_content:
+                logging.info("页面无结果（暂无数据）")
+            else:
+                logging.error("未找到临床试验表格")
+            return []
+
+        # 先用正则表达式快速提取，结果未通过校验时再构建DOM树
+        rows = parse_list_rows(html_content)
+        if rows is None:
+            logging.info("快速解析未通过校验，使用DOM解析")
+            rows = self._extract_rows_dom(html_content)
+
+        trials = []
+        for seq, reg_no, status, drug_name, indication, title, trial_id in rows:
+            trials.append({
+                '序号': seq,
+                '登记号': reg_no,
+                '试验状态': status,
+                '药物名称': drug_name,
+                '适应症': indication,
+                '试验通俗题目': title,
+                '详情URL': f"{self.base_url}/clinicaltrials.searchlistdetail.dhtml?id={trial_id}" if trial_id else "",
+                '试验ID': trial_id
+            })
+
+        if self.index is not None:
+            self.index.add(trials)
+
+        # 过滤关键词
+        trials = self.filter_trials(trials, filter_keywords)
+
+        logging.info(f"从表格中提取到 {len(trials)} 个临床试验")
+        return trials
+
+    def _extract_rows_dom(self, html_content):
+        """
+        用BeautifulSoup提取列表页的数据行，返回格式与 parse_list_rows 相同
+        """
         logging.info("开始解析HTML内容")
-        soup = BeautifulSoup(html_content, 'html.parser')
+        from bs4 import BeautifulSoup
+        # 只解析结果表格，找不到表格的结束标记时解析整个页面
+        table_html = slice_list_regions(html_content, ("searchTable",)).get("searchTable", html_content)
+        soup = BeautifulSoup(table_html, 'html.parser')
 
         # 查找表格
         table = soup.find('table', class_='searchTable')
@@ -248,43 +550,127 @@ class ChinaDrugTrialsSearcher:
         logging.info(f"表头: {headers}")
 
         # 提取数据行
-        trials = []
+        result = []
         for row in rows[1:]:  # 跳过标题行
             cells = row.find_all('td')
             if len(cells) < 6:  # 确保至少有6列
                 continue
 
-            # 提取ID，用于构建详情URL
+            # 提取ID
             trial_id = ""
-            detail_url = ""
-            if cells[1].find('a'):
-                a_tag = cells[1].find('a')
-                if 'id' in a_tag.attrs:
-                    trial_id = a_tag['id']
-                    detail_url = f"{self.base_url}/clinicaltrials.searchlistdetail.dhtml?id={trial_id}"
-
-            # 提取单元格内容
-            trial = {
-                '序号': cells[0].text.strip(),
-                '登记号': cells[1].find('a').text.strip() if cells[1].find('a') else '',
-                '试验状态': cells[2].find('a').text.strip() if cells[2].find('a') else '',
-                '药物名称': cells[3].find('a').text.strip() if cells[3].find('a') else '',
-                '适应症': cells[4].find('a').text.strip() if cells[4].find('a') else '',
-                '试验通俗题目': cells[5].find('a').text.strip() if cells[5].find('a') else '',
-                '详情URL': detail_url,
-                '试验ID': trial_id
-            }
+            a_tag = cells[1].find('a')
+            if a_tag and 'id' in a_tag.attrs:
+                trial_id = a_tag['id']
 
-            # 过滤关键词
-            if filter_keywords:
-                trial_text = ' '.join(trial.values()).lower()
-                if not any(keyword.lower() in trial_text for keyword in filter_keywords):
-                    continue
+            # 提取单元格内容（第1列之外取链接文本）
+            texts = [cell.find('a').text.strip() if cell.find('a') else '' for cell in cells[1:6]]
+            result.append((cells[0].text.strip(), *texts, trial_id))
 
-            trials.append(trial)
+        return result
 
-        logging.info(f"从表格中提取到 {len(trials)} 个临床试验")
-        return trials
+    def filter_trials(self, trials, filter_keywords):
+        """
+        按过滤关键词筛选临床试验（任一关键词出现在任一字段中即保留）
+        """
+        if not filter_keywords:
+            return trials
+
+        filtered = []
+        for trial in trials:
+            trial_text = ' '.join(trial.values()).lower()
+            if any(keyword.lower() in trial_text for keyword in filter_keywords):
+                filtered.append(trial)
+        return filtered
+
+    def load_capabilities(self, capabilities_file):
+        """
+        读取能力探测结果（每页记录数的表单字段和取值）；文件不存在时在首次搜索时探测
+        """
+        self.capabilities_file = capabilities_file
+        capabilities = load_capabilities(capabilities_file)
+        if capabilities and capabilities.get("page_size"):
+            self.page_size = capabilities["page_size"]
+            self.page_size_field = capabilities.get("page_size_field")
+            self.page_size_probed = True
+            logging.info(f"使用已探测的每页记录数: {self.page_size}（字段 {self.page_size_field or '无'}）")
+
+    def probe_page_size(self, keywords, indication="", reg_no="", state="进行中", drugs_name="", ckm_index=""):
+        """
+        用当前查询的第一页探测搜索表单是否接受更大的每页记录数
+
+        对每个候选字段请求更大的每页记录数，满足以下条件时认为服务器接受：
+            - 表格行数多于默认的每页记录数
+            - 分页信息中的总页数等于 总记录数 / 表格行数（向上取整）
+        服务器把过大的值截断时以实际返回的行数作为上限。探测结果保存到能力文件，
+        之后的搜索直接使用。总记录数不超过默认每页记录数时无法判断，下次搜索再探测。
+        每次探测请求前检查时间预算，预算不足时停止探测，本次使用默认每页记录数，
+        下次搜索再探测。
+
+        返回:
+            可以作为第一页使用的HTML（与最终采用的每页记录数一致），无法获取时返回None
+        """
+        default_size = self.page_size
+        # 按默认每页记录数返回的第一页（服务器忽略了字段），不接受任何字段时作为第一页
+        default_page = None
+
+        def fetch_default_page():
+            if not self.has_budget():
+                return None
+            return self.search(keywords, 1, indication, reg_no, state, drugs_name, ckm_index)
+
+        for field in PAGE_SIZE_FIELDS:
+            for size in PAGE_SIZE_CANDIDATES:
+                if not self.has_budget():
+                    logging.warning(f"时间预算不足，停止探测每页记录数，本次使用默认的 {default_size} 条")
+                    return default_page
+                html_content = self.search(keywords, 1, indication, reg_no, state, drugs_name, ckm_index, field, size)
+                if not html_content:
+                    return default_page
+
+                _, total_pages, total_records = self.get_page_info(html_content)
+                if total_records is None or total_pages is None:
+                    # 无法判断这个页面的每页记录数，按默认设置重新获取第一页
+                    return default_page or fetch_default_page()
+                if total_records <= default_size:
+                    logging.info("记录数不超过默认每页记录数，暂不探测每页记录数")
+                    return html_content
+
+                rows = len(self.extract_trials_from_table(html_content))
+                if rows > default_size and total_pages == (total_records + rows - 1) // rows:
+                    self.page_size = rows
+                    self.page_size_field = field
+                    self._save_page_size()
+                    logging.info(f"服务器接受字段 {field}，每页记录数: {rows}（请求 {size}）")
+                    # 探测请求按请求的每页记录数保存，按采用的每页记录数再保存一次供 --local 使用
+                    self.save_page(LIST_ENDPOINT, self.list_payload(keywords, 1, indication, reg_no, state, drugs_name), html_content)
+                    return html_content
+                if default_page is None and rows == default_size and total_pages == (total_records + default_size - 1) // default_size:
+                    default_page = html_content
+                logging.info(f"服务器未接受 {field}={size}（返回 {rows} 行，共 {total_pages} 页 {total_records} 条记录）")
+
+        logging.info(f"服务器不接受每页记录数参数，使用默认的 {default_size} 条")
+        self._save_page_size()
+        if default_page:
+            self.save_page(LIST_ENDPOINT, self.list_payload(keywords, 1, indication, reg_no, state, drugs_name), default_page)
+            return default_page
+        # 探测时返回的页面都不是默认大小（例如服务器截断为其他大小但分页信息不一致）时按默认设置重新获取
+        return fetch_default_page()
+
+    def _save_page_size(self):
+        self.page_size_probed = True
+        if self.capabilities_file:
+            save_capabilities(self.capabilities_file, {
+                "page_size_field": self.page_size_field,
+                "page_size": self.page_size,
+                "probed_at": datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            })
+
+    def get_page_info(self, html_content):
+        """
+        从分页信息（"当前第 <i>1</i> 页，共 <i>3</i> 页，共 <i>54</i> 条记录"）中提取
+        (当前页, 总页数, 总记录数)，无法确定的项为None
+        """
+        return parse_page_info(html_content)
 
     def get_total_pages(self, html_content):
         """
@@ -293,7 +679,16 @@ class ChinaDrugTrialsSearcher:
         if not html_content:
             return 1
 
-        soup = BeautifulSoup(html_content, 'html.parser')
+        # 优先使用分页信息中的"共 N 页"（分页控件只显示部分页码）
+        _, total_pages, _ = self.get_page_info(html_content)
+        if total_pages:
+            logging.info(f"找到分页信息，总页数: {total_pages}")
+            return total_pages
+
+        from bs4 import BeautifulSoup
+        # 只解析分页控件和结果表格
+        regions = slice_list_regions(html_content, ("pagination", "searchTable"))
+        soup = BeautifulSoup("".join(regions.values()) if regions else html_content, 'html.parser')
 
         # 查找分页信息
         pagination = soup.select_one('.pagination-info')
@@ -323,15 +718,33 @@ class ChinaDrugTrialsSearcher:
         if table:
             rows = table.find_all('tr')
             if len(rows) > 1:  # 有数据行
-                # 假设每页显示20条记录
-                estimated_pages = (len(rows) - 1 + 19) // 20
+                # 按每页记录数估算
+                estimated_pages = (len(rows) - 1 + self.page_size - 1) // self.page_size
                 logging.info(f"根据表格行数估算页数: {estimated_pages}")
                 return max(1, estimated_pages)
 
         logging.warning("无法确定总页数，默认为1页")
         return 1
 
-    def search_all_pages(self, keywords, filter_keywords=None, max_pages=None, indication="", reg_no="", state="进行中", drugs_name="", ckm_index="1", use_local_file=False, auto_all_pages=True):
+    def get_total_records(self, html_content):
+        """
+        从HTML内容中提取总记录数（"共 N 条记录"），无法确定时返回None
+        """
+        if not html_content:
+            return None
+
+        # 格式为"当前第 <i>1</i> 页，共 <i>3</i> 页，共 <i>54</i> 条记录"
+        _, _, total_records = parse_page_info(html_content)
+        if total_records is not None:
+            logging.info(f"找到记录数信息，总记录数: {total_records}")
+            return total_records
+
+        if "暂无数据" in html_content:
+            return 0
+
+        return None
+
+    def search_all_pages(self, keywords, filter_keywords=None, max_pages=None, indication="", reg_no="", state="进行中", drugs_name="", ckm_index="1", use_local_file=False, auto_all_pages=True, first_page_html=None, limit=None):
         """
         搜索所有页面的临床试验
 
@@ -346,31 +759,51 @@ class ChinaDrugTrialsSearcher:
             ckm_index: ckm_index参数
             use_local_file: 是否使用本地文件
             auto_all_pages: 是否自动获取所有页面
+            first_page_html: 已获取的第一页内容（例如查询规划阶段的探测结果），避免重复请求
+            limit: 最多返回的临床试验数（过滤后），达到后立即停止翻页
+
+        时间预算不足时不再请求新的页面，跳过的页面记录在运行报告中。
         """
         all_trials = []
         page = 1
+        query = f"关键词={keywords}" + "".join(
+            f"，{name}={value}" for name, value in (("适应症", indication), ("登记号", reg_no), ("药物名称", drugs_name)) if value
+        )
 
         # 获取第一页内容
-        html_content = None
-        if use_local_file:
-            # 尝试从本地文件加载
-            local_file = f"response_page_{page}.html"
-            if os.path.exists(local_file):
-                with open(local_file, 'r', encoding='utf-8') as f:
-                    html_content = f.read()
-                logging.info(f"使用本地文件 {local_file} 作为响应内容")
+        html_content = first_page_html
+        if not html_content and use_local_file:
+            # 尝试从包文件或本地文件加载
+            html_content = self.load_page(LIST_ENDPOINT, self.list_payload(keywords, page, indication, reg_no, state, drugs_name), f"response_page_{page}.html")
 
-        # 如果本地文件不存在或不使用本地文件，则从网站获取
-        if not html_content:
-            html_content = self.search(keywords, page, indication, reg_no, state, drugs_name, ckm_index)
+        if html_content:
+            page_trials = self.extract_trials_from_table(html_content)
+        else:
+            # 如果本地文件不存在或不使用本地文件，则从网站获取
+            if not self.has_budget():
+                self.report.skip_pages(query, [page])
+                return []
+            if self.capabilities_file and not self.page_size_probed:
+                # 首次搜索时探测每页记录数，探测结果直接作为第一页
+                html_content = self.probe_page_size(keywords, indication, reg_no, state, drugs_name, ckm_index)
+                if not html_content and not self.has_budget():
+                    self.report.skip_pages(query, [page])
+                    return []
+                page_trials = self.extract_trials_from_table(html_content) if html_content else []
+            else:
+                html_content, page_trials = self.fetch_trials_page(keywords, page, indication, reg_no, state, drugs_name, ckm_index)
 
         if not html_content:
             logging.error("无法获取第一页内容")
             return []
 
         # 提取第一页的临床试验
-        trials = self.extract_trials_from_table(html_content, filter_keywords)
-        all_trials.extend(trials)
+        all_trials.extend(self.filter_trials(page_trials, filter_keywords))
+
+        # 已收集到足够的临床试验，不再翻页
+        if limit and len(all_trials) >= limit:
+            logging.info(f"已收集到 {limit} 个临床试验，停止翻页")
+            return all_trials[:limit]
 
         # 获取总页数
         total_pages = self.get_total_pages(html_content)
@@ -387,29 +820,32 @@ class ChinaDrugTrialsSearcher:
 
         logging.info(f"找到 {total_pages} 页结果，将获取所有页面")
 
-        # 搜索剩余页面
-        for page in range(2, total_pages + 1):
+        # 搜索剩余页面（会话池中有多个会话时并发获取，按页码顺序处理）
+        def fetch_page(page):
             logging.info(f"正在搜索第 {page}/{total_pages} 页...")
 
-            # 尝试从本地文件加载
-            html_content = None
+            # 尝试从包文件或本地文件加载
             if use_local_file:
-                local_file = f"response_page_{page}.html"
-                if os.path.exists(local_file):
-                    with open(local_file, 'r', encoding='utf-8') as f:
-                        html_content = f.read()
-                    logging.info(f"使用本地文件 {local_file} 作为响应内容")
+                html_content = self.load_page(LIST_ENDPOINT, self.list_payload(keywords, page, indication, reg_no, state, drugs_name), f"response_page_{page}.html")
+                if html_content:
+                    return html_content, self.extract_trials_from_table(html_content)
 
-            # 如果本地文件不存在或不使用本地文件，则从网站获取
-            if not html_content:
-                html_content = self.search(keywords, page, indication, reg_no, state, drugs_name, ckm_index)
+            # 如果本地文件不存在或不使用本地文件，则从网站获取（请求节奏由会话池控制）
+            return self.fetch_trials_page(keywords, page, indication, reg_no, state, drugs_name, ckm_index)
+
+        def pages():
+            for page in range(2, total_pages + 1):
+                if not self.has_budget():
+                    self.report.skip_pages(query, range(page, total_pages + 1))
+                    return
+                yield page
 
+        for page, (html_content, page_trials) in iter_concurrent(fetch_page, pages(), self.workers):
             if not html_content:
                 logging.error(f"无法获取第 {page} 页内容")
                 break
 
-            # 提取当前页的临床试验
-            page_trials = self.extract_trials_from_table(html_content, filter_keywords)
+            # 当前页的临床试验先不过滤，以便区分"最后一页"和"本页没有匹配项"
             logging.info(f"第 {page} 页提取到 {len(page_trials)} 个临床试验")
 
             # 如果当前页没有提取到临床试验，可能是到达了最后一页
@@ -417,34 +853,60 @@ class ChinaDrugTrialsSearcher:
                 logging.warning(f"第 {page} 页没有提取到临床试验，可能是到达了最后一页")
                 break
 
-            all_trials.extend(page_trials)
+            all_trials.extend(self.filter_trials(page_trials, filter_keywords))
+
+            # 已收集到足够的临床试验，不再翻页
+            if limit and len(all_trials) >= limit:
+                logging.info(f"已收集到 {limit} 个临床试验，停止翻页")
+                all_trials = all_trials[:limit]
+                break
 
-            # 休眠以避免过载服务器
-            import time
-            time.sleep(1)
+        if self.index is not None:
+            self.index.save()
+        if self.pages is not None:
+            self.pages.flush()
+        self.update_report()
 
         logging.info(f"总共提取到 {len(all_trials)} 个临床试验")
         return all_trials
 
-def format_trials_markdown(trials):
+def get_trial_priority(trial):
+    """
+    试验状态优先级：尚未招募 > 招募中 > 其他（数值越小越优先）
+    """
+    status = trial.get('试验状态', '')
+    if "尚未招募" in status:
+        return 0
+    elif "招募中" in status:
+        return 1
+    else:
+        return 2
+
+def get_detail_priority(trial, prefer_recent=False):
+    """
+    详细信息获取顺序的排序键：先按试验状态优先级，可选再按登记号从新到旧
+    """
+    if not prefer_recent:
+        return (get_trial_priority(trial), 0)
+    match = re.search(r'(\d+)', trial.get('登记号', ''))
+    return (get_trial_priority(trial), -int(match.group(1)) if match else 0)
+
+def format_trials_markdown(trials, report=None):
     """
     将临床试验格式化为Markdown
+
+    参数:
+        report: 运行报告（RunReport），运行提前结束时附加跳过的内容
     """
+    report_markdown = report.format_markdown() if report else ""
     if not trials:
-        return "# 未找到相关临床试验\n"
+        return "# 未找到相关临床试验\n" + (f"\n{report_markdown}" if report_markdown else "")
 
     markdown = "# KRAS相关临床试验\n\n"
+    if report and report.partial:
+        markdown += "**注意**: 本次运行因时间预算提前结束，结果不完整，详见文末运行报告。\n\n"
 
     # 按试验状态排序
-    def get_trial_priority(trial):
-        status = trial['试验状态']
-        if "尚未招募" in status:
-            return 0
-        elif "招募中" in status:
-            return 1
-        else:
-            return 2
-
     sorted_trials = sorted(trials, key=get_trial_priority)
 
     for trial in sorted_trials:
@@ -465,6 +927,7 @@ def format_trials_markdown(trials):
 
         markdown += "\n---\n\n"
 
+    markdown += report_markdown
     return markdown
 
 def main():
@@ -482,9 +945,16 @@ def main():
     parser.add_argument('-p', '--pages', type=int, help='最大页数，如果不指定则获取所有页面')
     parser.add_argument('-o', '--output', help='输出文件名，默认为日期_关键词.md')
     parser.add_argument('-l', '--local', action='store_true', help='使用本地文件作为响应内容，而不是从网站获取')
-    parser.add_argument('--debug', action='store_true', help='调试模式，保存更多中间文件')
+    parser.add_argument('--debug', action='store_true', help='调试模式，同时把原始响应保存为HTML文件')
     parser.add_argument('--detail', action='store_true', help='获取每个临床试验的详细信息')
     parser.add_argument('--no-auto-pages', action='store_true', help='不自动获取所有页面，只获取第一页')
+    parser.add_argument('--plan', action='store_true', help='只输出查询计划（各策略的预计页数和请求数），不执行搜索')
+    parser.add_argument('--pushdown', action='store_true', help='允许把过滤关键词近似下推为适应症搜索，以减少请求数')
+    parser.add_argument('--limit', type=int, help='最多获取的临床试验数（过滤后），达到后停止翻页和获取详细信息')
+    parser.add_argument('--sessions', type=int, default=1, help='会话池中的会话数（独立的Cookie身份），默认为1')
+    parser.add_argument('--recent-first', action='store_true', help='获取详细信息时，同一试验状态内登记号较新的试验优先')
+    parser.add_argument('--deadline', type=float, help='运行时间预算（秒），时间不足时停止发送新请求并输出部分结果')
+    parser.add_argument('--hedge', action='store_true', help='详细信息请求耗时超过p95时用另一个会话发送备用请求（需要 --sessions 2 以上）')
 
     args = parser.parse_args()
 
@@ -510,63 +980,73 @@ def main():
         else:
             filter_keywords = filter_input.split()
 
-    # 初始化搜索器
-    searcher = ChinaDrugTrialsSearcher()
+    # 初始化客户端（Cookie保存到 output/cookie_jar.json，原始响应写入 output/pages.pack，
+    # 列表页中出现的试验记录到 output/trial_index.json）
+    from chinadrugtrials_client import Client
+    from chinadrugtrials_store import default_index_file, default_capabilities_file
+    from chinadrugtrials_pack import default_pack_file
+    client = Client(
+        sessions=args.sessions,
+        cookies=load_config_cookies(),
+        cookie_jar_file=default_cookie_jar_file(),
+        deadline=args.deadline,
+        use_local_file=args.local,
+        save_raw=True,
+        index_file=default_index_file(),
+        capabilities_file=default_capabilities_file(),
+        hedge=args.hedge,
+        pack_file=default_pack_file(),
+        debug=args.debug
+    )
 
     print(f"搜索关键词: {search_keywords}")
     print(f"过滤关键词: {', '.join(filter_keywords)}")
 
+    # 处理state参数
+    if args.all_states:
+        state = ""  # 空字符串表示搜索所有状态
+    else:
+        state = args.state or "进行中"  # 默认为"进行中"
+
+    # 只输出查询计划
+    if args.plan:
+        print(client.plan(search_keywords, filter_keywords, args.indication or "", args.reg_no or "", state, args.drugs_name or ""))
+        sys.exit(0)
+
     # 搜索临床试验
-    trials = searcher.search_all_pages(
+    records = client.search(
         search_keywords,
         filter_keywords,
-        args.pages,
         args.indication or "",
         args.reg_no or "",
-        args.state or "",
-        "1",  # ckm_index
-        args.local,  # 使用本地文件
-        not args.no_auto_pages  # 自动获取所有页面
+        state,
+        args.drugs_name or "",
+        max_pages=1 if args.no_auto_pages else args.pages,
+        limit=args.limit,
+        pushdown=args.pushdown
     )
+    trials = [record.to_dict() for record in records]
 
-    if not trials:
+    if not trials and not client.report.partial:
         print(f"未找到与过滤关键词相关的临床试验: {', '.join(filter_keywords)}")
         sys.exit(0)
 
     # 如果需要获取详细信息
     if args.detail:
         print("正在获取详细信息...")
-        for i, trial in enumerate(trials):
-            if trial['试验ID']:
-                print(f"获取第 {i+1}/{len(trials)} 个试验的详细信息: {trial['登记号']}")
-
-                # 尝试从本地文件加载
-                detail_html = None
-                local_file = f"trial_detail_{trial['试验ID']}.html"
-                if args.local and os.path.exists(local_file):
-                    with open(local_file, 'r', encoding='utf-8') as f:
-                        detail_html = f.read()
-                    print(f"使用本地文件 {local_file} 作为详细信息")
-
-                # 如果本地文件不存在或不使用本地文件，则从网站获取
-                if not detail_html:
-                    detail_html = searcher.get_trial_detail(trial['试验ID'])
-
-                if detail_html:
-                    # 提取详细信息
-                    detail = searcher.extract_trial_detail(detail_html)
-
-                    # 将详细信息添加到试验信息中
-                    for key, value in detail.items():
-                        if key not in trial:
-                            trial[key] = value
-
-                # 休眠以避免过载服务器
-                import time
-                time.sleep(1)
+        by_id = {trial['试验ID']: trial for trial in trials}
+        for i, (record, detail) in enumerate(client.bulk_details(records, prefer_recent=args.recent_first)):
+            print(f"已获取第 {i+1} 个试验的详细信息: {record.reg_no}")
+
+            if detail:
+                # 将详细信息添加到试验信息中
+                trial = by_id[record.trial_id]
+                for key, value in detail.raw.items():
+                    if key not in trial:
+                        trial[key] = value
 
     # 格式化为Markdown
-    markdown = format_trials_markdown(trials)
+    markdown = format_trials_markdown(trials, client.report)
 
     # 保存到文件
     today = datetime.datetime.now().strftime('%Y%m%d')
@@ -579,6 +1059,8 @@ def main():
         f.write(markdown)
 
     print(f"成功提取 {len(trials)} 个临床试验并保存到 {output_file}")
+    if client.report.partial:
+        print("时间预算不足，部分页面或详细信息被跳过，详见文件末尾的运行报告")
 
 if __name__ == "__main__":
     main()
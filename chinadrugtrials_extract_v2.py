@@ -10,6 +10,8 @@ from bs4 import BeautifulSoup
 import logging
 import argparse
 import time
+from chinadrugtrials_detail import parse_detail_page
+from chinadrugtrials_http import WarmSession, default_cookie_jar_file, load_config_cookies, LIST_PAGE_MARKERS, DETAIL_PAGE_MARKERS, NO_DATA_MARKERS, RESPONSE_OK, RESPONSE_EMPTY
 # 配置日志
 logging.basicConfig(
     level=logging.INFO,
@@ -27,7 +29,6 @@ class ChinaDrugTrialsSearcher:
         """
         self.base_url = "http://www.chinadrugtrials.org.cn"
         self.search_url = f"{self.base_url}/clinicaltrials.searchlist.dhtml" # 修正为正确的搜索结果URL
-        self.session = requests.Session()
         self.headers = {
             "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7",
             "Accept-Language": "zh-CN,zh;q=0.9",
@@ -40,31 +41,13 @@ class ChinaDrugTrialsSearcher:
             "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/136.0.0.0 Safari/537.36",
         }
         
-        # 设置Cookie
-        self.cookies = {
-            "FSSBBIl1UgzbN7N80S": "4NXiRDf8zFgRh0Dwjpupk1CBWco1dQwyo4E.2kcgsHtkpxmIpxj0jM4rOOfnHSCt",
-            "token": "we7piDj4EhlmQadtUeVdVpn8W6-QTSrHGXHLfaaHcGcmff3oV98wUulXjuG",
-            "FSSBBIl1UgzbN7N80T": "3rhmUE9qYsygSBEBCVmu6_UP.459xWkrwlURuzFQkDtW1E62v14PNegineEq9BOFpoueZXLejZbWfN_gmWMJS4JNFkkEFSGqH1Q7dd4NvO.ye3z9o62_iJ6fZYYewWQ.maPX53Ev52tX9O6RYOPLlUrml0Pd9iErKh8wiBQei1xlNusQyYECWkOXLJ9qBs8gVYy_VtYi7utNUw8rHSIPmqZr.e4akqnIZhcE1K3bBB_WIINd5LfxqxCaeXlpw4Tts5IcPnT.CoW1ZYwiIzMNyLlnUz0UAz889bc9gQvP6p.KIHansaq8Yn.HG9aYGQFj_4x0"
-        }
-        
-        # 将Cookie添加到会话中
-        for key, value in self.cookies.items():
-            self.session.cookies.set(key, value)
-        
-        # 初始化会话，访问首页获取Cookie
-        logging.info("初始化会话，访问首页获取Cookie")
-        try:
-            response = self.session.get(self.base_url, headers=self.headers)
-            status_code = response.status_code
-            logging.info(f"首页访问状态码: {status_code}")
-            
-            # 接受 200 和 202 状态码
-            if status_code not in [200, 202]:
-                logging.error(f"访问首页失败，状态码: {status_code}")
-            else:
-                logging.info("成功访问首页，获取Cookie")
-        except requests.exceptions.RequestException as e:
-            logging.error(f"访问首页异常: {e}")
+        # Cookie保存在 output/cookie_jar.json 中，有效期内直接复用；
+        # 过期或遇到验证页面时自动重新访问首页获取Cookie并重试
+        self.transport = WarmSession(
+            self.base_url, self.headers,
+            cookie_jar_file=default_cookie_jar_file(),
+            seed_cookies=load_config_cookies()
+        )
 
     def get_trial_detail(self, trial_id, ckm_index=""):
         """
@@ -81,21 +64,19 @@ class ChinaDrugTrialsSearcher:
 
 
         try:
-            response = self.session.post(detail_url, headers=self.headers, data=data)
-            status_code = response.status_code
-            logging.info(f"请求返回状态码: {status_code}")
-            logging.info(f"实际请求URL: {response.url}")
+            response = self.transport.post(detail_url, data, DETAIL_PAGE_MARKERS)
+            logging.info(f"请求返回状态码: {response.status_code}，分类: {response.kind}")
 
-            if status_code not in [200, 202]:
-                logging.error(f"请求失败，状态码: {status_code}")
+            if response.kind != RESPONSE_OK:
+                logging.error(f"未获取到有效的详细信息页面（{response.kind}，状态码: {response.status_code}）")
                 return None
 
             # 保存详细信息到文件
             with open(f"trial_detail_{trial_id}.html", "w", encoding="utf-8") as f:
-                f.write(response.text)
+                f.write(response.html)
             logging.info(f"已保存详细信息到 trial_detail_{trial_id}.html")
 
-            return response.text
+            return response.html
         except requests.exceptions.RequestException as e:
             logging.error(f"请求异常: {e}")
             return None
@@ -107,29 +88,8 @@ class ChinaDrugTrialsSearcher:
         if not html_content:
             return {}
 
-        soup = BeautifulSoup(html_content, 'html.parser')
-
-        # 提取详细信息
-        detail = {}
-
-        # 提取标题
-        title_elem = soup.find('h3', class_='text-center')
-        if title_elem:
-            detail['标题'] = title_elem.text.strip()
-
-        # 提取详细信息表格
-        tables = soup.find_all('table', class_='table')
-        for table in tables:
-            rows = table.find_all('tr')
-            for row in rows:
-                cells = row.find_all('td')
-                if len(cells) >= 2:
-                    key = cells[0].text.strip()
-                    value = cells[1].text.strip()
-                    if key and value:
-                        detail[key] = value
-
-        return detail
+        # 一次遍历解析所有部分（见 chinadrugtrials_detail.DetailPageParser）
+        return parse_detail_page(html_content).to_dict()
 
     def search(self, keywords, page=1, indication="", reg_no="", state="", drugs_name="", ckm_index=""):
         """
@@ -170,38 +130,14 @@ class ChinaDrugTrialsSearcher:
 
         try:
             # 使用会话对象发送POST请求，根据用户提供的curl命令
-            response = self.session.post(self.search_url, headers=self.headers, data=data)
-            status_code = response.status_code
-            logging.info(f"请求返回状态码: {status_code}")
-            logging.info(f"实际请求URL: {response.url}")
-
-            # 接受 200 和 202 状态码
-            if status_code not in [200, 202]:
-                logging.error(f"请求失败，状态码: {status_code}")
-                return None
-
-            # 如果是 202 状态码，记录一下但继续处理
-            if status_code == 202:
-                logging.warning("收到 202 Accepted 状态码，继续处理响应内容")
-
-            content_length = len(response.text)
-            logging.info(f"返回内容长度: {content_length} 字符")
-
-            # 检查响应内容是否包含关键字
-            content_preview = response.text[:200] + "..." if len(response.text) > 200 else response.text
-            logging.info(f"响应内容预览: {content_preview}")
-
-            # 检查是否包含常见的HTML标签
-            has_html = "<html" in response.text.lower() and "<body" in response.text.lower()
-            logging.info(f"响应内容是否包含HTML标签: {has_html}")
+            response = self.transport.post(self.search_url, data, LIST_PAGE_MARKERS, NO_DATA_MARKERS)
+            logging.info(f"请求返回状态码: {response.status_code}，{len(response.content)} 字节，分类: {response.kind}")
 
-            # 检查是否包含可能的临床试验信息
-            has_trial_info = "试验" in response.text or "临床" in response.text
-            logging.info(f"响应内容是否包含临床试验相关信息: {has_trial_info}")
-
-            # 检查是否包含可能的表格元素
-            has_table = "<table" in response.text.lower() and "<tr" in response.text.lower()
-            logging.info(f"响应内容是否包含表格元素: {has_table}")
+            if response.kind == RESPONSE_EMPTY:
+                logging.info("搜索无结果（暂无数据）")
+            elif response.kind != RESPONSE_OK:
+                logging.error(f"未获取到有效的列表页（{response.kind}）")
+                return None
 
             # 创建输出目录（如果不存在）
             output_dir = os.path.join(os.getcwd(), "output")
@@ -209,34 +145,20 @@ class ChinaDrugTrialsSearcher:
                 os.makedirs(output_dir)
                 logging.info(f"创建输出目录: {output_dir}")
 
-            # 添加调试信息检查response内容
-            logging.info(f"Response内容长度: {len(response.text)}")
-            logging.info(f"Response状态码: {response.status_code}")
-            logging.info(f"Response URL: {response.url}")
-            logging.info(f"Response headers: {dict(response.headers)}")
-            
-            # 检查response中是否包含关键的搜索结果标识
-            has_search_results = "暂无数据" in response.text or "CTR" in response.text
-            logging.info(f"Response是否包含搜索结果标识: {has_search_results}")
-            
-            # 检查是否包含分页信息
-            has_pagination = "当前第" in response.text and "页" in response.text
-            logging.info(f"Response是否包含分页信息: {has_pagination}")
-            
             # 保存原始响应内容到文件，用于调试
             debug_file = os.path.join(output_dir, f"response_page_{page}.html")
             with open(debug_file, "w", encoding="utf-8") as f:
-                f.write(response.text)
+                f.write(response.html)
             logging.info(f"已保存原始响应内容到 {debug_file}")
             
             # 额外保存一个带时间戳的临时文件用于对比
             import time
             temp_file = os.path.join(output_dir, f"temp_response_page_{page}_{int(time.time())}.html")
             with open(temp_file, "w", encoding="utf-8") as f:
-                f.write(response.text)
+                f.write(response.html)
             logging.info(f"已保存临时响应文件到 {temp_file}")
 
-            return response.text
+            return response.html
         except requests.exceptions.RequestException as e:
             logging.error(f"请求异常: {e}")
             return None
@@ -257,9 +179,6 @@ class ChinaDrugTrialsSearcher:
         logging.info(f"直接查找searchTable结果: {table is not None}")
         
         if not table:
-            # 尝试查找所有table元素进行调试
-            all_tables = soup.find_all('table')
-            logging.info(f"页面中所有table元素: {[t.get('class') for t in all_tables]}")
             logging.error("未找到临床试验表格")
             return []
 
@@ -0,0 +1,960 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import re
+import json
+import codecs
+import time
+import queue
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+# Cookie罐的最长复用时间（秒），超过后重新访问首页
+COOKIE_JAR_MAX_AGE = 30 * 60
+
+# 单个请求的超时时间（秒）
+REQUEST_TIMEOUT = 30
+
+# 有效页面中一定包含的标记，缺失时说明遇到了验证页面或Cookie已过期
+LIST_PAGE_MARKERS = ("searchTable", "暂无数据")
+DETAIL_PAGE_MARKERS = ("searchDetail",)
+# 列表页没有结果时的标记（详细信息页中空的子表格也会显示"暂无数据"，不能用于详细信息页）
+NO_DATA_MARKERS = ("暂无数据",)
+
+
+def default_cookie_jar_file():
+    """
+    默认的Cookie罐文件路径
+    """
+    return os.path.join(os.getcwd(), "output", "cookie_jar.json")
+
+
+def load_config_cookies(config_file="config.json"):
+    """
+    读取配置文件中的Cookie字符串（格式为"name1=value1; name2=value2"），返回字典
+    """
+    if not os.path.exists(config_file):
+        return {}
+
+    try:
+        with open(config_file, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    except (OSError, ValueError) as e:
+        logging.error(f"读取配置文件 {config_file} 失败: {e}")
+        return {}
+
+    cookies = {}
+    for item in (config.get("cookies") or "").split(";"):
+        if "=" in item:
+            name, value = item.split("=", 1)
+            cookies[name.strip()] = value.strip()
+    return cookies
+
+
+def iter_concurrent(func, items, workers=1):
+    """
+    并发执行 func(item)，按输入顺序生成 (item, 结果)
+
+    同时执行的任务数不超过 workers；调用方停止迭代后不再提交新任务，
+    已在执行的任务会完成后再返回。
+    """
+    items = iter(items)
+    if workers <= 1:
+        for item in items:
+            yield item, func(item)
+        return
+
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for item in items:
+            pending.append((item, executor.submit(func, item)))
+            if len(pending) >= workers:
+                item, future = pending.popleft()
+                yield item, future.result()
+        while pending:
+            item, future = pending.popleft()
+            yield item, future.result()
+
+
+def _is_timeout(error):
+    """
+    请求是否因超时失败（连接超时或读取超时）
+    """
+    import requests
+    return isinstance(error, requests.exceptions.Timeout)
+
+
+def payload_key(url, data):
+    """
+    请求的规范化键：URL加上按字段名排序、去除首尾空白的表单参数（经过URL编码，
+    参数值中的 & 和 = 不会与分隔符混淆）
+    """
+    items = sorted((str(k), str(v).strip()) for k, v in (data or {}).items())
+    return url + "?" + urlencode(items)
+
+
+class SingleFlight:
+    """
+    合并相同键的并发调用：第一个调用者执行函数，其余调用者等待并共享其结果（或异常）
+    """
+    class _Call:
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+            self.error = None
+            self.waiters = 0
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        # 被合并（未实际执行）的调用次数
+        self.shared = 0
+
+    def do(self, key, func):
+        """
+        执行 func()，同一时刻相同 key 的调用只执行一次
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.shared += 1
+                leader = False
+            else:
+                call = self._calls[key] = SingleFlight._Call()
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            if call.waiters:
+                logging.info(f"合并了 {call.waiters} 个相同的并发请求")
+            call.done.set()
+
+
+def percentile(values, pct):
+    """
+    计算百分位数（最近秩法），values 为空时返回None
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[rank]
+
+
+class HedgeStats:
+    """
+    对冲请求统计：对冲率（发送备用请求的比例）、备用请求胜出率和端到端耗时分布
+    """
+    def __init__(self, window=500):
+        self.requests = 0
+        self.hedged = 0
+        self.backup_wins = 0
+        # 最近请求的端到端耗时（秒）
+        self.latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def allow(self, max_rate):
+        """
+        发送一个备用请求后，对冲率是否仍不超过 max_rate
+        """
+        with self._lock:
+            return self.hedged + 1 <= self.requests * max_rate
+
+    def record(self, hedged, backup_won, elapsed):
+        with self._lock:
+            self.requests += 1
+            if hedged:
+                self.hedged += 1
+            if backup_won:
+                self.backup_wins += 1
+            self.latencies.append(elapsed)
+
+    def summary(self):
+        with self._lock:
+            latencies = list(self.latencies)
+            return {
+                "requests": self.requests,
+                "hedged": self.hedged,
+                "backup_wins": self.backup_wins,
+                "hedge_rate": self.hedged / self.requests if self.requests else 0.0,
+                "win_rate": self.backup_wins / self.hedged if self.hedged else 0.0,
+                "p50": percentile(latencies, 50),
+                "p95": percentile(latencies, 95),
+                "p99": percentile(latencies, 99),
+            }
+
+
+class ConcurrencyController:
+    """
+    AIMD并发控制：请求健康时逐步增加同时进行的请求数，
+    收到202、验证页面、超时或耗时明显上升时成倍减少
+    """
+    def __init__(self, max_limit, min_limit=1, initial=1, backoff=0.5, latency_tolerance=2.0, window=50):
+        """
+        参数:
+            max_limit: 并发上限（会话池中的会话数）
+            min_limit: 并发下限
+            initial: 初始并发数
+            backoff: 减少时乘以的系数
+            latency_tolerance: 平均耗时超过最近最小耗时的倍数时视为耗时上升
+            window: 计算最近最小耗时的样本数
+        """
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.limit = float(max(min_limit, min(initial, max_limit)))
+        self.backoff = backoff
+        self.latency_tolerance = latency_tolerance
+        self.recent = deque(maxlen=window)
+        self.latency = None
+        self.started_at = time.time()
+        self.last_decrease = 0.0
+        # (相对开始时间的秒数, 并发数, 原因)
+        self.history = [(0.0, int(self.limit), "初始")]
+        self._lock = threading.Lock()
+
+    @property
+    def current(self):
+        """
+        当前允许同时进行的请求数
+        """
+        return int(self.limit)
+
+    def record(self, outcome, elapsed=None):
+        """
+        记录一次请求结果: ok / throttled（202或验证页面） / timeout / error
+        """
+        with self._lock:
+            before = int(self.limit)
+            reason = None
+            if elapsed is not None and outcome == "ok":
+                self.recent.append(elapsed)
+                self.latency = elapsed if self.latency is None else 0.8 * self.latency + 0.2 * elapsed
+
+            if outcome in ("throttled", "timeout"):
+                reason = "收到202或验证页面" if outcome == "throttled" else "请求超时"
+            elif outcome == "ok" and len(self.recent) >= 10 and self.latency > self.latency_tolerance * min(self.recent):
+                reason = f"耗时上升（平均 {self.latency:.2f} 秒）"
+
+            now = time.time()
+            if reason:
+                # 同一批请求的连续失败只减少一次
+                if now - self.last_decrease >= (self.latency or 1.0):
+                    self.limit = max(self.min_limit, self.limit * self.backoff)
+                    self.last_decrease = now
+                    if reason.startswith("耗时上升"):
+                        # 以减少后的耗时重新计算基准
+                        self.recent.clear()
+                        self.latency = None
+            elif outcome == "ok":
+                # 每个往返周期约增加1
+                self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+                reason = "请求正常"
+
+            if int(self.limit) != before:
+                self.history.append((round(now - self.started_at, 1), int(self.limit), reason))
+                logging.info(f"并发数调整为 {int(self.limit)}（{reason}）")
+
+    def summary(self):
+        with self._lock:
+            return {"limit": int(self.limit), "max_limit": self.max_limit, "history": list(self.history)}
+
+
+class Deadline:
+    """
+    运行的截止时间：剩余时间不足以完成下一次请求往返时，停止发送新请求
+    """
+    def __init__(self, seconds, reserve=1.0):
+        """
+        参数:
+            seconds: 从现在起的时间预算（秒），为None时没有限制
+            reserve: 预留给生成报告的时间（秒）
+        """
+        self.seconds = seconds
+        self.expires_at = time.time() + seconds if seconds is not None else None
+        self.reserve = reserve
+
+    def remaining(self):
+        """
+        剩余时间（秒），没有限制时为None
+        """
+        if self.expires_at is None:
+            return None
+        return self.expires_at - time.time()
+
+    def can_fit(self, estimate):
+        """
+        剩余时间（扣除预留时间）是否足够完成一次预计耗时为 estimate 秒的请求
+        """
+        if self.expires_at is None:
+            return True
+        return self.remaining() - self.reserve >= estimate
+
+
+# 列表页没有结果时的提示（分别按UTF-8和GBK编码检查）
+# 响应分类，classify_response 的返回值
+RESPONSE_OK = "ok"
+RESPONSE_EMPTY = "empty"
+RESPONSE_CHALLENGE = "challenge"
+RESPONSE_ERROR = "error"
+RESPONSE_TRUNCATED = "truncated"
+
+_encoded_markers = {}
+
+
+def _encode_markers(markers):
+    """
+    将页面标记编码为字节串（UTF-8和GBK编码不同时两者都保留），结果缓存
+    """
+    encoded = _encoded_markers.get(markers)
+    if encoded is None:
+        encoded = set()
+        for marker in markers:
+            for encoding in ("utf-8", "gbk"):
+                encoded.add(marker.encode(encoding))
+        encoded = _encoded_markers[markers] = tuple(encoded)
+    return encoded
+
+
+def classify_response(status_code, body, markers=None, empty_markers=None):
+    """
+    在解码和解析之前按原始字节对响应分类，只做几次子串查找
+
+    empty_markers 是没有结果时页面中出现的标记，只有列表页需要传入
+    （详细信息页中空的子表格也会显示"暂无数据"）。
+
+    返回:
+        ok: 有效页面，可以解析
+        empty: 列表页没有结果（包含 empty_markers），停止翻页
+        challenge: 验证页面或Cookie已过期，重新初始化会话后重试
+        error: 错误状态码、空响应或其他页面，直接重试
+        truncated: 页面不完整（缺少结尾的</html>），直接重试
+    """
+    if status_code in (401, 403, 412):
+        return RESPONSE_CHALLENGE
+    if status_code not in (200, 202) or not body:
+        return RESPONSE_ERROR
+    if empty_markers and any(marker in body for marker in _encode_markers(tuple(empty_markers))):
+        return RESPONSE_EMPTY
+    if markers and not any(marker in body for marker in _encode_markers(tuple(markers))):
+        # 验证页面只有一段脚本，没有页面内容
+        if status_code == 202 or b"<script" in body[:4096].lower():
+            return RESPONSE_CHALLENGE
+        return RESPONSE_ERROR
+    if b"</html>" not in body[-512:].lower():
+        return RESPONSE_TRUNCATED
+    return RESPONSE_OK
+
+
+# Content-Type 响应头和 <meta> 标签中声明的编码
+_HEADER_CHARSET_RE = re.compile(r'charset=["\']?([\w.:-]+)', re.IGNORECASE)
+_META_CHARSET_RE = re.compile(rb'<meta[^>]+charset=["\']?([\w.:-]+)', re.IGNORECASE)
+
+# 每个请求地址最近一次确定的编码，响应头和页面都没有声明编码时使用
+_endpoint_encodings = {}
+
+
+def _normalize_encoding(name):
+    """
+    规范化编码名称：GB2312/GBK 按其超集 GB18030 解码
+    """
+    name = name.lower()
+    if name in ("gb2312", "gbk", "x-gbk"):
+        return "gb18030"
+    return name
+
+
+def resolve_encoding(response, endpoint, head=None):
+    """
+    确定响应的编码：Content-Type 响应头 > 页面开头的 <meta> 标签 > 该地址之前确定的编码 > UTF-8
+
+    不使用 requests 的统计编码检测（需要扫描整个响应，且对中文页面可能猜错）。
+    流式读取时 head 为已读取的开头部分。
+    """
+    match = _HEADER_CHARSET_RE.search(response.headers.get("Content-Type", ""))
+    if match:
+        return _normalize_encoding(match.group(1))
+    match = _META_CHARSET_RE.search((response.content if head is None else head)[:4096])
+    if match:
+        return _normalize_encoding(match.group(1).decode("ascii"))
+    return _endpoint_encodings.get(endpoint, "utf-8")
+
+
+def decode_body(response, endpoint):
+    """
+    按确定的编码把响应解码一次，返回文本；解码失败时依次尝试 UTF-8 和 GB18030，
+    都失败时替换无法解码的字节。确定的编码会记录下来，供该地址之后的响应使用。
+    """
+    body = response.content
+    text = None
+    for encoding in dict.fromkeys((resolve_encoding(response, endpoint), "utf-8", "gb18030")):
+        try:
+            text = body.decode(encoding)
+            break
+        except (LookupError, UnicodeDecodeError):
+            continue
+    if text is None:
+        encoding = "utf-8"
+        text = body.decode(encoding, errors="replace")
+        logging.warning(f"响应无法按已知编码解码，已替换无法解码的字节（{endpoint}）")
+
+    _endpoint_encodings[endpoint] = encoding
+    # 兼容仍然使用 response.text 的代码，避免再做统计编码检测
+    response.encoding = encoding
+    return text
+
+
+class WarmSession:
+    """
+    延迟初始化的HTTP会话
+
+    首次发送请求时才导入 requests、创建会话并获取Cookie，
+    多个搜索器可以共享同一个会话对象。Cookie会保存到磁盘，
+    下次运行时在有效期内直接复用，跳过访问首页。
+    """
+    def __init__(self, base_url, headers, cookie_jar_file=None, seed_cookies=None, max_age=COOKIE_JAR_MAX_AGE):
+        """
+        参数:
+            base_url: 网站首页地址
+            headers: 请求头
+            cookie_jar_file: Cookie罐文件路径，为None时不保存到磁盘
+            seed_cookies: 初始Cookie（例如配置文件中的Cookie）
+            max_age: Cookie罐的最长复用时间（秒）
+        """
+        self.base_url = base_url
+        self.headers = headers
+        self.cookie_jar_file = cookie_jar_file
+        self.seed_cookies = seed_cookies or {}
+        self.max_age = max_age
+        self._session = None
+        self._warmed = False
+        self._saved_cookies = None
+        # 因Cookie过期而重新初始化的次数
+        self.rewarm_count = 0
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        """
+        底层的 requests.Session，首次访问时创建
+        """
+        if self._session is None:
+            import requests
+            self._session = requests.Session()
+            self._apply_seed_cookies()
+        return self._session
+
+    def _apply_seed_cookies(self):
+        """
+        设置初始Cookie（配置文件中的Cookie）
+        """
+        for name, value in self.seed_cookies.items():
+            self._session.cookies.set(name, value)
+
+    def close(self):
+        """
+        关闭底层会话（释放连接），之后的请求会重新创建会话
+        """
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+            self._warmed = False
+
+    def load_cookies(self):
+        """
+        从Cookie罐加载仍然有效的Cookie，成功时返回True
+        """
+        if not self.cookie_jar_file or not os.path.exists(self.cookie_jar_file):
+            return False
+
+        try:
+            with open(self.cookie_jar_file, 'r', encoding='utf-8') as f:
+                jar = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"读取Cookie罐失败: {e}")
+            return False
+
+        now = time.time()
+        age = now - jar.get("saved_at", 0)
+        if age > self.max_age:
+            logging.info(f"Cookie罐已保存 {int(age)} 秒，超过有效期，重新获取Cookie")
+            return False
+
+        loaded = 0
+        for cookie in jar.get("cookies", []):
+            # 跳过已过期的Cookie
+            if cookie.get("expires") and cookie["expires"] < now:
+                continue
+            self.session.cookies.set(
+                cookie["name"], cookie["value"],
+                domain=cookie.get("domain") or "", path=cookie.get("path") or "/"
+            )
+            loaded += 1
+
+        if not loaded:
+            return False
+
+        logging.info(f"从Cookie罐 {self.cookie_jar_file} 加载了 {loaded} 个Cookie")
+        self._saved_cookies = self._snapshot()
+        return True
+
+    def save_cookies(self):
+        """
+        将当前Cookie保存到Cookie罐（Cookie没有变化时不写入）
+        """
+        if not self.cookie_jar_file or self._session is None:
+            return
+
+        snapshot = self._snapshot()
+        if snapshot == self._saved_cookies:
+            return
+
+        jar = {
+            "saved_at": time.time(),
+            "cookies": [
+                {"name": c.name, "value": c.value, "domain": c.domain, "path": c.path, "expires": c.expires}
+                for c in self._session.cookies
+            ],
+        }
+        directory = os.path.dirname(self.cookie_jar_file)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        with open(self.cookie_jar_file, 'w', encoding='utf-8') as f:
+            json.dump(jar, f, ensure_ascii=False, indent=2)
+        self._saved_cookies = snapshot
+        logging.info(f"已保存Cookie到 {self.cookie_jar_file}")
+
+    def clear_cookies(self):
+        """
+        清空会话Cookie和Cookie罐
+        """
+        if self._session is not None:
+            self._session.cookies.clear()
+        self._saved_cookies = None
+        if self.cookie_jar_file and os.path.exists(self.cookie_jar_file):
+            os.remove(self.cookie_jar_file)
+
+    def _snapshot(self):
+        return sorted((c.name, c.value, c.domain, c.path) for c in self.session.cookies)
+
+    def warm_up(self):
+        """
+        访问首页获取Cookie
+        """
+        import requests
+
+        logging.info("初始化会话，访问首页获取Cookie")
+        try:
+            response = self.session.get(self.base_url, headers=self.headers, timeout=REQUEST_TIMEOUT)
+            status_code = response.status_code
+            logging.info(f"首页访问状态码: {status_code}")
+
+            # 接受 200 和 202 状态码
+            if status_code not in [200, 202]:
+                logging.error(f"访问首页失败，状态码: {status_code}")
+            else:
+                logging.info("成功访问首页，获取Cookie")
+                self.save_cookies()
+        except requests.exceptions.RequestException as e:
+            logging.error(f"访问首页异常: {e}")
+
+    def ensure_warm(self):
+        """
+        确保会话已有可用的Cookie（优先使用Cookie罐，否则访问首页，只执行一次）
+        """
+        with self._lock:
+            if not self._warmed:
+                self._warmed = True
+                if not self.load_cookies():
+                    self.warm_up()
+
+    def rewarm(self):
+        """
+        Cookie过期或遇到验证页面时，清空Cookie后重新访问首页（初始Cookie会重新设置）
+        """
+        with self._lock:
+            self.rewarm_count += 1
+            self.clear_cookies()
+            if self._session is not None:
+                self._apply_seed_cookies()
+            self._warmed = True
+            self.warm_up()
+
+    def post(self, url, data, markers=None, empty_markers=None):
+        """
+        发送POST请求，首次请求前先完成会话初始化
+
+        参数:
+            url: 请求地址
+            data: 表单数据
+            markers: 有效页面中应包含的标记，用于对响应分类（见 classify_response）：
+                验证页面重新初始化会话后重试一次，错误或不完整的页面直接重试一次
+            empty_markers: 没有结果时页面中出现的标记（只用于列表页）
+
+        返回的响应带有分类结果 response.kind 和解码后的文本 response.html
+        """
+        self.ensure_warm()
+        response = self._post_classified(url, data, markers, empty_markers)
+
+        if response.kind == RESPONSE_CHALLENGE:
+            logging.warning(f"响应是验证页面或Cookie已过期（状态码: {response.status_code}），重新初始化会话后重试")
+            self.rewarm()
+            response = self._post_classified(url, data, markers, empty_markers)
+        elif response.kind in (RESPONSE_ERROR, RESPONSE_TRUNCATED):
+            logging.warning(f"响应无效（{response.kind}，状态码: {response.status_code}，{len(response.content)} 字节），重试一次")
+            response = self._post_classified(url, data, markers, empty_markers)
+
+        if response.kind not in (RESPONSE_OK, RESPONSE_EMPTY):
+            logging.error(f"重试后仍未获取到有效页面（{response.kind}，状态码: {response.status_code}）")
+            return response
+
+        self.save_cookies()
+        return response
+
+    def stream(self, url, data, feed, chunk_size=16384):
+        """
+        发送POST请求并流式读取响应：每块内容增量解码后交给 feed(text)，
+        feed 返回True时停止读取（剩余内容不再下载）。响应内容不会整体缓存在内存中。
+
+        不检查页面标记，也不在遇到验证页面时重试，调用方根据解析结果判断页面是否有效。
+
+        返回:
+            响应对象（已关闭）
+        """
+        self.ensure_warm()
+        response = self.session.post(url, headers=self.headers, data=data, timeout=REQUEST_TIMEOUT, stream=True)
+        try:
+            decoder = None
+            for chunk in response.iter_content(chunk_size):
+                if decoder is None:
+                    encoding = resolve_encoding(response, url, head=chunk)
+                    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+                    _endpoint_encodings[url] = encoding
+                if feed(decoder.decode(chunk)):
+                    break
+            else:
+                if decoder is not None:
+                    feed(decoder.decode(b"", final=True))
+        finally:
+            response.close()
+        if response.status_code == 200:
+            self.save_cookies()
+        return response
+
+    def _post_classified(self, url, data, markers, empty_markers=None):
+        """
+        发送一次POST请求，把响应分类结果保存在 response.kind，
+        有效页面的解码文本保存在 response.html（其他页面为None）
+        """
+        response = self.session.post(url, headers=self.headers, data=data, timeout=REQUEST_TIMEOUT)
+        response.kind = classify_response(response.status_code, response.content, markers, empty_markers)
+        # 只解码可以使用的页面，且只解码一次
+        response.html = decode_body(response, url) if response.kind in (RESPONSE_OK, RESPONSE_EMPTY) else None
+        return response
+
+
+class PooledSession(WarmSession):
+    """
+    会话池中的单个会话（独立的Cookie身份），带有自己的请求节奏、健康分数和冷却时间
+    """
+    def __init__(self, index, base_url, headers, cookie_jar_file=None, seed_cookies=None, min_interval=1.0, cooldown=30.0):
+        """
+        参数:
+            index: 会话序号
+            min_interval: 同一会话两次请求之间的最小间隔（秒）
+            cooldown: 收到202或验证页面后的基础冷却时间（秒），连续失败时成倍增加
+        """
+        super().__init__(base_url, headers, cookie_jar_file, seed_cookies)
+        self.index = index
+        self.min_interval = min_interval
+        self.cooldown = cooldown
+        # 健康分数，范围 0~1，成功时缓慢上升，被限流时减半
+        self.health = 1.0
+        self.next_allowed = 0.0
+        self.cooldown_until = 0.0
+        self.consecutive_failures = 0
+        self.in_use = False
+        self.requests = 0
+        self.throttled = 0
+
+    def record(self, outcome):
+        """
+        记录一次请求结果: ok / throttled（202或验证页面） / error（网络异常或其他错误状态码）
+        """
+        now = time.time()
+        self.requests += 1
+        self.next_allowed = now + self.min_interval
+
+        if outcome == "ok":
+            self.consecutive_failures = 0
+            self.health = min(1.0, self.health + 0.1)
+            return
+
+        self.consecutive_failures += 1
+        if outcome == "throttled":
+            self.throttled += 1
+            self.health *= 0.5
+            delay = min(self.cooldown * self.consecutive_failures, 10 * self.cooldown)
+            self.cooldown_until = now + delay
+            logging.warning(f"会话 {self.index} 被限流，冷却 {delay:.0f} 秒（健康分数 {self.health:.2f}）")
+        else:
+            self.health = max(0.0, self.health - 0.2)
+
+
+class SessionPool:
+    """
+    会话池：持有多个独立初始化的会话，每个请求从池中借用一个健康且未在冷却中的会话
+
+    每个会话单独控制请求节奏，整体吞吐量随会话数增加，而单个Cookie身份的请求频率保持不变。
+    """
+    def __init__(self, base_url, headers, size=1, cookie_jar_file=None, seed_cookies=None, min_interval=1.0, cooldown=30.0):
+        """
+        参数:
+            base_url: 网站首页地址
+            headers: 请求头
+            size: 会话数
+            cookie_jar_file: 第一个会话的Cookie罐文件，其余会话使用带序号的文件
+            seed_cookies: 初始Cookie，只用于第一个会话
+            min_interval: 同一会话两次请求之间的最小间隔（秒）
+            cooldown: 会话被限流后的基础冷却时间（秒）
+        """
+        self.base_url = base_url
+        self.headers = headers
+        self.size = max(1, size)
+        self.sessions = []
+        for index in range(self.size):
+            jar_file = cookie_jar_file
+            if jar_file and index > 0:
+                root, ext = os.path.splitext(jar_file)
+                jar_file = f"{root}_{index}{ext}"
+            self.sessions.append(PooledSession(
+                index, base_url, headers, jar_file,
+                seed_cookies if index == 0 else None,
+                min_interval, cooldown
+            ))
+        self._cond = threading.Condition()
+        # 请求耗时的指数移动平均（秒）
+        self.latency = None
+        # 合并相同的并发请求（共享同一会话池的搜索器也用它合并解析结果）
+        self.flight = SingleFlight()
+        # 每个URL最近的请求耗时（秒），用于确定对冲阈值
+        self.url_latencies = {}
+        self.hedging = HedgeStats()
+        # 同时进行的请求数由AIMD控制，上限为会话数
+        self.controller = ConcurrencyController(self.size)
+
+    @property
+    def session(self):
+        """
+        第一个会话的 requests.Session（兼容只使用单个会话的代码）
+        """
+        return self.sessions[0].session
+
+    def estimate_round_trip(self, default=2.0):
+        """
+        估计下一次请求的耗时：平均请求耗时加上最早可用会话的等待时间
+        """
+        now = time.time()
+        wait = max(0.0, min(max(s.next_allowed, s.cooldown_until) for s in self.sessions) - now)
+        return (self.latency if self.latency is not None else default) + wait
+
+    def acquire(self):
+        """
+        借用一个会话：优先选择健康分数最高的空闲会话，必要时等待冷却或请求间隔结束
+        """
+        with self._cond:
+            while True:
+                now = time.time()
+                idle = [s for s in self.sessions if not s.in_use]
+                ready = [s for s in idle if s.cooldown_until <= now]
+                if len(idle) <= self.size - self.controller.current:
+                    # 同时进行的请求数已达到并发控制的限制，等待有请求完成
+                    ready = []
+                    idle = []
+                if ready:
+                    chosen = max(ready, key=lambda s: (s.health, -s.next_allowed))
+                    chosen.in_use = True
+                    break
+                if idle:
+                    timeout = min(s.cooldown_until for s in idle) - now
+                else:
+                    timeout = None
+                self._cond.wait(timeout)
+
+        wait = chosen.next_allowed - time.time()
+        if wait > 0:
+            time.sleep(wait)
+        return chosen
+
+    def try_acquire(self, exclude=None):
+        """
+        不等待地借用一个会话：只选择空闲、不在冷却中且已到请求间隔的会话，没有时返回None
+        """
+        with self._cond:
+            now = time.time()
+            ready = [
+                s for s in self.sessions
+                if s is not exclude and not s.in_use and s.cooldown_until <= now and s.next_allowed <= now
+            ]
+            in_flight = sum(1 for s in self.sessions if s.in_use)
+            if not ready or in_flight >= self.controller.current:
+                return None
+            chosen = max(ready, key=lambda s: s.health)
+            chosen.in_use = True
+            return chosen
+
+    def release(self, session, outcome):
+        """
+        归还会话并记录请求结果
+        """
+        with self._cond:
+            session.record(outcome)
+            session.in_use = False
+            self._cond.notify_all()
+
+    def post(self, url, data, markers=None, empty_markers=None):
+        """
+        从池中借用一个会话发送POST请求，相同URL和表单参数的并发请求只发送一次并共享响应
+        """
+        return self.flight.do(payload_key(url, data), lambda: self._post(url, data, markers, empty_markers))
+
+    def _post(self, url, data, markers=None, empty_markers=None):
+        return self._send(self.acquire(), url, data, markers, empty_markers)
+
+    def _send(self, session, url, data, markers=None, empty_markers=None):
+        """
+        使用已借用的会话发送请求，记录耗时后归还会话
+        """
+        outcome = "error"
+        rewarm_count = session.rewarm_count
+        started = time.time()
+        try:
+            response = session.post(url, data, markers, empty_markers)
+            elapsed = time.time() - started
+            with self._cond:
+                self.latency = elapsed if self.latency is None else 0.7 * self.latency + 0.3 * elapsed
+                self.url_latencies.setdefault(url, deque(maxlen=200)).append(elapsed)
+            if response.status_code == 202 or response.kind == RESPONSE_CHALLENGE or session.rewarm_count != rewarm_count:
+                outcome = "throttled"
+            elif response.kind in (RESPONSE_OK, RESPONSE_EMPTY):
+                outcome = "ok"
+            self.controller.record(outcome, elapsed)
+            return response
+        except Exception as e:
+            self.controller.record("timeout" if _is_timeout(e) else "error")
+            raise
+        finally:
+            self.release(session, outcome)
+
+    def stream(self, url, data, feed):
+        """
+        从池中借用一个会话流式发送POST请求（见 WarmSession.stream），不合并相同的并发请求
+        """
+        session = self.acquire()
+        outcome = "error"
+        started = time.time()
+        try:
+            response = session.stream(url, data, feed)
+            elapsed = time.time() - started
+            if response.status_code in (202, 401, 403, 412):
+                outcome = "throttled"
+            elif response.status_code == 200:
+                outcome = "ok"
+                with self._cond:
+                    self.latency = elapsed if self.latency is None else 0.7 * self.latency + 0.3 * elapsed
+            self.controller.record(outcome, elapsed)
+            return response
+        except Exception as e:
+            self.controller.record("timeout" if _is_timeout(e) else "error")
+            raise
+        finally:
+            self.release(session, outcome)
+
+    def post_hedged(self, url, data, markers=None, max_hedge_rate=0.1, min_samples=20):
+        """
+        发送带对冲的POST请求：请求耗时超过该URL最近的p95时，用另一个会话发送一个备用请求，
+        使用先返回的有效响应
+
+        备用请求只使用空闲且已到请求间隔的会话（不突破每个会话的请求节奏），
+        对冲率不超过 max_hedge_rate。落后的请求无法中途取消，它的结果会被丢弃，
+        会话在它完成后归还。样本数少于 min_samples 时不对冲。
+        """
+        return self.flight.do(payload_key(url, data), lambda: self._post_hedged(url, data, markers, max_hedge_rate, min_samples))
+
+    def _post_hedged(self, url, data, markers, max_hedge_rate, min_samples):
+        with self._cond:
+            samples = list(self.url_latencies.get(url, ()))
+        threshold = percentile(samples, 95) if len(samples) >= min_samples else None
+
+        results = queue.Queue()
+
+        def attempt(session, backup):
+            try:
+                results.put((backup, self._send(session, url, data, markers), None))
+            except Exception as e:
+                results.put((backup, None, e))
+
+        started = time.time()
+        primary = self.acquire()
+        threading.Thread(target=attempt, args=(primary, False), daemon=True).start()
+        attempts = 1
+        try:
+            first = results.get(timeout=threshold)
+        except queue.Empty:
+            first = None
+            backup = self.try_acquire(exclude=primary) if self.hedging.allow(max_hedge_rate) else None
+            if backup is not None:
+                logging.info(f"请求耗时超过 p95（{threshold:.2f} 秒），使用会话 {backup.index} 发送备用请求")
+                threading.Thread(target=attempt, args=(backup, True), daemon=True).start()
+                attempts = 2
+
+        # 使用第一个有效响应；两个请求都失败时返回（或抛出）最后一个结果
+        winner = first
+        received = 1 if first is not None else 0
+        while winner is None or (not self._usable(winner, markers) and received < attempts):
+            winner = results.get()
+            received += 1
+
+        self.hedging.record(attempts == 2, attempts == 2 and winner[0] and self._usable(winner, markers), time.time() - started)
+
+        _, response, error = winner
+        if error is not None:
+            raise error
+        return response
+
+    def _usable(self, result, markers):
+        _, response, error = result
+        return error is None and response.kind in (RESPONSE_OK, RESPONSE_EMPTY)
+
+    def close(self):
+        """
+        关闭池中所有会话
+        """
+        for session in self.sessions:
+            session.close()
+
+    def stats(self):
+        """
+        各会话的请求统计
+        """
+        return [
+            {"session": s.index, "requests": s.requests, "throttled": s.throttled, "health": round(s.health, 2)}
+            for s in self.sessions
+        ]
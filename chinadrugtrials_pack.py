@@ -0,0 +1,601 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+原始页面的单文件存储
+
+原始响应不再逐个保存为HTML文件，而是追加写入一个包文件（默认为 output/pages.pack），
+并用一个定长、有序的索引文件（pages.pack.idx）按 (接口, 请求参数哈希, 获取时间)
+查找。两个文件都通过 mmap 读取，get() 返回包文件中页面内容的 memoryview，不复制数据。
+
+包文件中每条记录是"记录头 + 元数据 + 页面内容"，记录头与索引项格式相同，
+元数据是 [接口, 请求参数] 的JSON。索引只在 flush() 时重写（先写临时文件再替换），
+索引之后追加的记录在打开时从包文件末尾扫描恢复，运行被中断不会丢失已写入的页面。
+同一个包文件同时只能有一个进程写入（写入方持有包文件的排他锁，另一个进程以写入
+方式打开时抛出 PackLockedError，open_pack() 则退回只读方式），读取不受限制。
+
+页面用zlib压缩后写入。列表页和详细信息页都重复网站的同一套模板（页头、脚本、
+searchDetailTable 表格框架），每个接口的页面达到一定数量后，从最近的页面中
+训练一个预设字典（取大多数页面中都出现的行），之后的页面用这个字典压缩。字典
+本身也保存为包文件中的记录，每次训练生成新的版本，旧版本保留用于解压旧的记录；
+compact 命令用当前的字典重新压缩整个包文件：
+
+    python chinadrugtrials_pack.py stats
+    python chinadrugtrials_pack.py train
+    python chinadrugtrials_pack.py compact
+    python chinadrugtrials_pack.py import output/*.html
+"""
+
+import os
+import sys
+import glob
+import mmap
+import json
+import zlib
+import bisect
+import struct
+import time
+import hashlib
+import logging
+import argparse
+import threading
+from collections import namedtuple, Counter
+
+try:
+    import fcntl
+except ImportError:
+    # Windows 上没有 fcntl，不加锁
+    fcntl = None
+
+PACK_MAGIC = b'CDTPACK1'
+INDEX_MAGIC = b'CDTIDX01'
+# 索引文件头：魔数 + 索引覆盖的包文件长度
+INDEX_HEADER = struct.Struct('>8sQ')
+# 索引项（大端，按字节排序即按键排序）：接口哈希、请求参数哈希、获取时间（毫秒）、
+# 页面内容在包文件中的偏移和长度、元数据长度、标志
+ENTRY = struct.Struct('>8s16sQQIHH')
+# 查找时比较的键：接口哈希 + 请求参数哈希
+KEY_SIZE = 24
+
+# 接口名称
+LIST_ENDPOINT = "searchlist"
+DETAIL_ENDPOINT = "searchlistdetail"
+# 压缩字典也保存为记录，请求参数为 {"endpoint": 接口, "version": 版本}
+DICT_ENDPOINT = "__dictionary__"
+
+# 标志：页面内容用zlib压缩；压缩字典的版本保存在高12位（0表示不使用字典）
+FLAG_ZLIB = 0x1
+DICT_VERSION_SHIFT = 4
+MAX_DICT_VERSION = 0xFFFF >> DICT_VERSION_SHIFT
+COMPRESS_LEVEL = 6
+# zlib 只使用预设字典的最后32KB
+DICT_SIZE = 32768
+# 训练字典使用的最近页面数；接口的页面达到 TRAIN_MIN_PAGES 时自动训练第一个字典
+TRAIN_SAMPLES = 64
+TRAIN_MIN_PAGES = 32
+
+PackEntry = namedtuple('PackEntry', 'endpoint payload fetched offset length flags')
+
+
+def default_pack_file():
+    """
+    默认的原始页面包文件路径
+    """
+    return os.path.join(os.getcwd(), "output", "pages.pack")
+
+
+def endpoint_key(endpoint):
+    return hashlib.blake2b(endpoint.encode('utf-8'), digest_size=8).digest()
+
+
+def payload_hash(payload):
+    """
+    请求参数的哈希（参数为字典时与键的顺序无关）
+    """
+    text = json.dumps(payload, ensure_ascii=False, sort_keys=True)
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+
+
+def compress_page(data, zdict=None, level=COMPRESS_LEVEL):
+    compressor = zlib.compressobj(level, zdict=zdict) if zdict else zlib.compressobj(level)
+    return compressor.compress(data) + compressor.flush()
+
+
+def decompress_page(data, zdict=None):
+    decompressor = zlib.decompressobj(zdict=zdict) if zdict else zlib.decompressobj()
+    return decompressor.decompress(data) + decompressor.flush()
+
+
+def train_dictionary(samples, size=DICT_SIZE):
+    """
+    从样本页面训练zlib预设字典：保留在至少一半样本中出现的行，按在页面中的顺序拼接
+
+    超过 size 时去掉"出现次数 x 长度"最小的行。zlib 优先匹配距离近的内容，
+    所以保持页面中的顺序，让相邻的模板行可以连成更长的匹配。
+    """
+    counts = Counter()
+    first_seen = {}
+    for i, sample in enumerate(samples):
+        lines = bytes(sample).splitlines(keepends=True)
+        for position, line in enumerate(lines):
+            first_seen.setdefault(line, (i, position))
+        counts.update(set(lines))
+
+    threshold = max(2, (len(samples) + 1) // 2)
+    common = [line for line, count in counts.items() if count >= threshold and line.strip()]
+    total = sum(len(line) for line in common)
+    if total > size:
+        selected = []
+        total = 0
+        for line in sorted(common, key=lambda line: counts[line] * len(line), reverse=True):
+            if total + len(line) <= size:
+                selected.append(line)
+                total += len(line)
+        common = selected
+    common.sort(key=lambda line: first_seen[line])
+    return b''.join(common)
+
+
+class PackLockedError(RuntimeError):
+    """
+    包文件正被另一个进程写入
+    """
+
+
+def _lock_exclusive(f, pack_file):
+    """
+    获取包文件的排他锁（不等待），已被其他进程持有时抛出 PackLockedError；
+    锁在文件关闭时释放
+    """
+    if fcntl is None:
+        return
+    try:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        raise PackLockedError(f"包文件 {pack_file} 正被另一个进程写入")
+
+
+def open_pack(pack_file, **kwargs):
+    """
+    以写入方式打开包文件；已有其他进程写入时退回只读方式（可以读取页面，新的页面不写入包文件）
+    """
+    try:
+        return PackStore(pack_file, **kwargs)
+    except PackLockedError as e:
+        logging.warning(f"{e}，以只读方式打开")
+        return PackStore(pack_file, readonly=True, **kwargs)
+
+
+class PackStore:
+    """
+    只追加的原始页面存储：一个包文件 + 一个内存映射的有序索引
+    """
+    def __init__(self, pack_file, index_file=None, readonly=False, compress=True):
+        """
+        参数:
+            pack_file: 包文件路径，不存在时创建
+            index_file: 索引文件路径，默认为 pack_file + ".idx"
+            readonly: 只读打开（不写入页面，也不重写索引）
+            compress: 写入的页面是否压缩（页面足够多时自动训练压缩字典）
+
+        以写入方式打开时持有包文件的排他锁直到 close()，包文件已被其他进程以写入方式
+        打开时抛出 PackLockedError。
+        """
+        self.pack_file = pack_file
+        self.index_file = index_file or f"{pack_file}.idx"
+        self.readonly = readonly
+        self.compress = compress
+        # 压缩字典：版本 -> 字典；接口 -> 当前使用的版本
+        self._dictionaries = {}
+        self._current = {}
+        # 本次打开后写入过页面的接口（flush 时检查是否需要训练字典）
+        self._added = set()
+        self._lock = threading.Lock()
+        self._writer = None
+        self._pack_map = None
+        self._index_map = None
+        self._count = 0
+        # 索引之后追加的记录（索引项字节串，保持有序）
+        self._pending = []
+
+        if not readonly:
+            directory = os.path.dirname(pack_file)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory, exist_ok=True)
+            # 先取得锁再检查文件头、恢复和截断末尾的记录，
+            # 否则会把另一个写入方正在写的记录当作不完整的记录截断
+            writer = os.fdopen(os.open(pack_file, os.O_RDWR | os.O_CREAT, 0o644), 'r+b')
+            try:
+                _lock_exclusive(writer, pack_file)
+            except PackLockedError:
+                writer.close()
+                raise
+            self._writer = writer
+            if os.path.getsize(pack_file) == 0:
+                self._writer.write(PACK_MAGIC)
+                self._writer.flush()
+        with open(pack_file, 'rb') as f:
+            if f.read(len(PACK_MAGIC)) != PACK_MAGIC:
+                self.close()
+                raise ValueError(f"{pack_file} 不是原始页面包文件")
+
+        covered = self._load_index()
+        end = self._recover(covered)
+        if not readonly:
+            if end < os.path.getsize(pack_file):
+                # 末尾是中断时未写完的记录
+                logging.warning(f"包文件 {pack_file} 末尾有 {os.path.getsize(pack_file) - end} 字节不完整的记录，已截断")
+                self._writer.truncate(end)
+            self._writer.seek(0, os.SEEK_END)
+        self._load_dictionaries()
+
+    def _load_index(self):
+        """
+        映射索引文件，返回索引覆盖的包文件长度（索引不存在或无效时为包文件头的长度）
+        """
+        if not os.path.exists(self.index_file) or os.path.getsize(self.index_file) <= INDEX_HEADER.size:
+            return len(PACK_MAGIC)
+        with open(self.index_file, 'rb') as f:
+            index_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, covered = INDEX_HEADER.unpack_from(index_map)
+        if magic != INDEX_MAGIC or (len(index_map) - INDEX_HEADER.size) % ENTRY.size or covered > os.path.getsize(self.pack_file):
+            logging.warning(f"索引文件 {self.index_file} 无效，从包文件重建")
+            index_map.close()
+            return len(PACK_MAGIC)
+        self._index_map = index_map
+        self._count = (len(index_map) - INDEX_HEADER.size) // ENTRY.size
+        return covered
+
+    def _recover(self, position):
+        """
+        扫描索引之后追加的记录，返回最后一条完整记录的结束位置
+        """
+        size = os.path.getsize(self.pack_file)
+        with open(self.pack_file, 'rb') as f:
+            while position + ENTRY.size <= size:
+                f.seek(position)
+                header = f.read(ENTRY.size)
+                _, _, _, offset, length, meta_length, _ = ENTRY.unpack(header)
+                if offset != position + ENTRY.size + meta_length or offset + length > size:
+                    break
+                self._pending.append(header)
+                position = offset + length
+        self._pending.sort()
+        if self._pending:
+            logging.info(f"从包文件 {self.pack_file} 恢复了 {len(self._pending)} 条未写入索引的记录")
+        return position
+
+    def _load_dictionaries(self):
+        for entry in self.entries(DICT_ENDPOINT, latest=False):
+            version = entry.payload['version']
+            self._dictionaries[version] = bytes(self.view(entry.offset, entry.length, entry.flags))
+            if version > self._current.get(entry.payload['endpoint'], 0):
+                self._current[entry.payload['endpoint']] = version
+
+    def dictionaries(self):
+        """
+        每个接口当前使用的压缩字典 {接口: (版本, 长度)}
+        """
+        return {endpoint: (version, len(self._dictionaries[version])) for endpoint, version in self._current.items()}
+
+    def put(self, endpoint, payload, data, fetched=None):
+        """
+        追加一个页面（按设置压缩），返回获取时间（毫秒）
+
+        参数:
+            endpoint: 接口名称（LIST_ENDPOINT、DETAIL_ENDPOINT）
+            payload: 请求参数（字典或字符串）
+            data: 页面内容（bytes）
+            fetched: 获取时间（毫秒），默认为当前时间
+        """
+        flags = 0
+        if self.compress:
+            version = self._current.get(endpoint, 0)
+            data = compress_page(data, self._dictionaries.get(version))
+            flags = FLAG_ZLIB | version << DICT_VERSION_SHIFT
+        self._added.add(endpoint)
+        return self._append(endpoint, payload, data, fetched, flags)
+
+    def _append(self, endpoint, payload, data, fetched=None, flags=0):
+        if self.readonly:
+            raise ValueError("包文件以只读方式打开")
+        fetched = int(time.time() * 1000) if fetched is None else fetched
+        meta = json.dumps([endpoint, payload], ensure_ascii=False).encode('utf-8')
+        with self._lock:
+            position = self._writer.seek(0, os.SEEK_END)
+            header = ENTRY.pack(endpoint_key(endpoint), payload_hash(payload), fetched,
+                                position + ENTRY.size + len(meta), len(data), len(meta), flags)
+            self._writer.write(header)
+            self._writer.write(meta)
+            self._writer.write(data)
+            self._writer.flush()
+            # 同一个键的多个版本按获取时间排序
+            bisect.insort(self._pending, header)
+        return fetched
+
+    def _index_entry(self, i):
+        start = INDEX_HEADER.size + i * ENTRY.size
+        return self._index_map[start:start + ENTRY.size]
+
+    def _matches(self, key):
+        """
+        键相同的所有索引项（按获取时间从旧到新）
+        """
+        matches = []
+        if self._index_map is not None:
+            # 在索引中二分查找第一个不小于键的位置
+            lo, hi = 0, self._count
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if self._index_entry(mid)[:KEY_SIZE] < key:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            while lo < self._count:
+                entry = self._index_entry(lo)
+                if entry[:KEY_SIZE] != key:
+                    break
+                matches.append(entry)
+                lo += 1
+        i = bisect.bisect_left(self._pending, key)
+        while i < len(self._pending) and self._pending[i][:KEY_SIZE] == key:
+            matches.append(self._pending[i])
+            i += 1
+        matches.sort()
+        return matches
+
+    def versions(self, endpoint, payload):
+        """
+        保存过的各个版本的获取时间（毫秒），从旧到新
+        """
+        key = endpoint_key(endpoint) + payload_hash(payload)
+        with self._lock:
+            return [ENTRY.unpack(entry)[2] for entry in self._matches(key)]
+
+    def get(self, endpoint, payload, at=None):
+        """
+        返回页面内容的 memoryview，没有时返回None
+
+        未压缩的页面直接返回包文件映射的切片（不复制数据），压缩的页面返回解压后的内容。
+
+        参数:
+            at: 只返回这个时间（毫秒）之前获取的版本，默认为最新版本
+        """
+        key = endpoint_key(endpoint) + payload_hash(payload)
+        with self._lock:
+            for entry in reversed(self._matches(key)):
+                _, _, fetched, offset, length, _, flags = ENTRY.unpack(entry)
+                if at is None or fetched <= at:
+                    return self._decode(self._view(offset, length), flags)
+        return None
+
+    def view(self, offset, length, flags=0):
+        """
+        包文件中指定位置的页面内容（memoryview），位置和标志见 PackEntry
+        """
+        with self._lock:
+            return self._decode(self._view(offset, length), flags)
+
+    def _decode(self, data, flags):
+        if not flags & FLAG_ZLIB:
+            return data
+        version = flags >> DICT_VERSION_SHIFT
+        return memoryview(decompress_page(data, self._dictionaries.get(version) if version else None))
+
+    def _view(self, offset, length):
+        if self._pack_map is None or offset + length > len(self._pack_map):
+            # 包文件变长后重新映射；旧的映射在其上的 memoryview 释放后回收
+            with open(self.pack_file, 'rb') as f:
+                self._pack_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return memoryview(self._pack_map)[offset:offset + length]
+
+    def _headers(self, endpoint=None):
+        """
+        所有记录头（按键排序），可以只取一个接口的记录
+        """
+        with self._lock:
+            headers = [self._index_entry(i) for i in range(self._count)] + self._pending
+        if endpoint:
+            wanted = endpoint_key(endpoint)
+            headers = [entry for entry in headers if entry[:8] == wanted]
+        headers.sort()
+        return headers
+
+    def entries(self, endpoint=None, latest=True):
+        """
+        生成存储中的页面（PackEntry），按键排序
+
+        参数:
+            endpoint: 只生成这个接口的页面，为None时生成所有页面（不含压缩字典）
+            latest: 同一请求只生成最新的版本
+        """
+        headers = self._headers(endpoint)
+        if not endpoint:
+            dictionary = endpoint_key(DICT_ENDPOINT)
+            headers = [entry for entry in headers if entry[:8] != dictionary]
+        if latest:
+            headers = [entry for i, entry in enumerate(headers)
+                       if i + 1 == len(headers) or headers[i + 1][:KEY_SIZE] != entry[:KEY_SIZE]]
+        with open(self.pack_file, 'rb') as f:
+            for entry in headers:
+                _, _, fetched, offset, length, meta_length, flags = ENTRY.unpack(entry)
+                f.seek(offset - meta_length)
+                name, payload = json.loads(f.read(meta_length).decode('utf-8'))
+                yield PackEntry(name, payload, fetched, offset, length, flags)
+
+    def train(self, endpoint, samples=TRAIN_SAMPLES, size=DICT_SIZE):
+        """
+        用接口最近的 samples 个页面训练新版本的压缩字典，之后写入的页面使用新字典，
+        返回字典版本（页面太少或没有公共内容时返回None）
+        """
+        recent = sorted(self._headers(endpoint), key=lambda entry: ENTRY.unpack(entry)[2])[-samples:]
+        if len(recent) < 2:
+            return None
+        pages = []
+        for entry in recent:
+            _, _, _, offset, length, _, flags = ENTRY.unpack(entry)
+            pages.append(bytes(self.view(offset, length, flags)))
+        dictionary = train_dictionary(pages, size)
+        if len(dictionary) < 1024:
+            logging.info(f"{endpoint} 的页面没有足够的公共内容，不训练压缩字典")
+            return None
+        version = max(self._dictionaries, default=0) + 1
+        if version > MAX_DICT_VERSION:
+            raise ValueError("压缩字典的版本数已达上限，请先执行 compact")
+        self._append(DICT_ENDPOINT, {"endpoint": endpoint, "version": version}, dictionary)
+        self._dictionaries[version] = dictionary
+        self._current[endpoint] = version
+        logging.info(f"已用 {len(pages)} 个页面训练 {endpoint} 的压缩字典（版本 {version}，{len(dictionary)} 字节）")
+        return version
+
+    def flush(self):
+        """
+        把追加的记录合并进索引文件（先写临时文件再替换）
+
+        本次写入过页面的接口还没有压缩字典且页面达到 TRAIN_MIN_PAGES 时，先训练字典。
+        """
+        if self.readonly:
+            return
+        if self.compress:
+            for endpoint in sorted(self._added):
+                if endpoint not in self._current and len(self._headers(endpoint)) >= TRAIN_MIN_PAGES:
+                    self.train(endpoint)
+            self._added = set()
+        with self._lock:
+            if not self._pending:
+                return
+            entries = [self._index_entry(i) for i in range(self._count)] + self._pending
+            entries.sort()
+            covered = self._writer.seek(0, os.SEEK_END)
+            temp_file = f"{self.index_file}.tmp"
+            with open(temp_file, 'wb') as f:
+                f.write(INDEX_HEADER.pack(INDEX_MAGIC, covered))
+                f.write(b''.join(entries))
+            os.replace(temp_file, self.index_file)
+            if self._index_map is not None:
+                self._index_map.close()
+            with open(self.index_file, 'rb') as f:
+                self._index_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._count = len(entries)
+            self._pending = []
+
+    def __len__(self):
+        return self._count + len(self._pending)
+
+    def close(self):
+        self.flush()
+        if self._writer:
+            self._writer.close()
+            self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def compact_pack(pack_file, index_file=None):
+    """
+    用每个接口当前的压缩字典重新压缩包文件中的所有记录（保留所有版本和获取时间），
+    写入临时文件后替换原文件。返回 (原大小, 新大小)。
+
+    执行期间持有包文件的排他锁，包文件正被其他进程写入时抛出 PackLockedError。
+    """
+    with open(pack_file, 'rb') as lock:
+        _lock_exclusive(lock, pack_file)
+        return _compact(pack_file, index_file or f"{pack_file}.idx")
+
+
+def _compact(pack_file, index_file):
+    temp_file = f"{pack_file}.compact"
+    for filename in (temp_file, f"{temp_file}.idx"):
+        if os.path.exists(filename):
+            os.remove(filename)
+
+    source = PackStore(pack_file, index_file, readonly=True)
+    target = PackStore(temp_file)
+    for endpoint, version in source._current.items():
+        target._append(DICT_ENDPOINT, {"endpoint": endpoint, "version": version}, source._dictionaries[version])
+        target._dictionaries[version] = source._dictionaries[version]
+        target._current[endpoint] = version
+    for entry in source.entries(latest=False):
+        target.put(entry.endpoint, entry.payload, bytes(source.view(entry.offset, entry.length, entry.flags)), entry.fetched)
+    # 不在重写时自动训练字典
+    target._added = set()
+    target.close()
+
+    old_size = os.path.getsize(pack_file)
+    os.replace(temp_file, pack_file)
+    os.replace(f"{temp_file}.idx", index_file)
+    return old_size, os.path.getsize(pack_file)
+
+
+def import_files(pages, filenames):
+    """
+    把以前保存的HTML文件导入包文件（按文件名判断接口，获取时间为文件修改时间），返回导入的文件数
+    """
+    imported = 0
+    for filename in filenames:
+        name = os.path.basename(filename)
+        if name.startswith("trial_detail_"):
+            endpoint, payload = DETAIL_ENDPOINT, {"id": name[len("trial_detail_"):-len(".html")]}
+        elif "response_page_" in name:
+            # 文件中没有查询条件，用文件名作为请求参数
+            endpoint, payload = LIST_ENDPOINT, {"file": name}
+        else:
+            logging.warning(f"无法判断 {filename} 的页面类型，跳过")
+            continue
+        with open(filename, 'rb') as f:
+            pages.put(endpoint, payload, f.read(), int(os.path.getmtime(filename) * 1000))
+        imported += 1
+    return imported
+
+
+def main():
+    """
+    主函数
+    """
+    parser = argparse.ArgumentParser(description='管理原始页面包文件')
+    parser.add_argument('--pack', help='包文件路径，默认为output/pages.pack')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('stats', help='显示页面数、文件大小和压缩字典')
+    train_parser = subparsers.add_parser('train', help='为每个接口训练新版本的压缩字典')
+    train_parser.add_argument('--samples', type=int, default=TRAIN_SAMPLES, help=f'使用的最近页面数，默认为{TRAIN_SAMPLES}')
+    subparsers.add_parser('compact', help='用当前的压缩字典重新压缩整个包文件')
+    import_parser = subparsers.add_parser('import', help='导入以前保存的HTML文件')
+    import_parser.add_argument('files', nargs='+', help='HTML文件（支持通配符）')
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+    pack_file = args.pack or default_pack_file()
+
+    try:
+        if args.command == 'compact':
+            old_size, new_size = compact_pack(pack_file)
+            print(f"已重新压缩 {pack_file}: {old_size / 1024:.0f} KB -> {new_size / 1024:.0f} KB")
+            return
+        # 只查看统计信息时不需要写入
+        pages = PackStore(pack_file, readonly=args.command == 'stats')
+    except PackLockedError as e:
+        print(f"{e}，请在其他进程结束后再执行 {args.command}")
+        sys.exit(1)
+
+    with pages:
+        if args.command == 'import':
+            filenames = [filename for pattern in args.files for filename in sorted(glob.glob(pattern))]
+            print(f"已导入 {import_files(pages, filenames)} 个文件")
+        elif args.command == 'train':
+            for endpoint in (LIST_ENDPOINT, DETAIL_ENDPOINT):
+                version = pages.train(endpoint, args.samples)
+                if version:
+                    print(f"{endpoint}: 压缩字典版本 {version}")
+        elif args.command == 'stats':
+            counts = Counter(entry.endpoint for entry in pages.entries(latest=False))
+            print(f"{pack_file}: {os.path.getsize(pack_file) / 1024:.0f} KB")
+            for endpoint, count in sorted(counts.items()):
+                version, size = pages.dictionaries().get(endpoint, (0, 0))
+                dictionary = f"压缩字典版本 {version}（{size} 字节）" if version else "没有压缩字典"
+                print(f"  {endpoint}: {count} 个页面，{dictionary}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+页面的快速解析
+
+响应中大部分内容是网站模板（页头、导航、脚本、页脚），解析前先按已知的开始和
+结束标记截取需要的区域（结果表格、分页信息、详细信息页的某个部分），只解析这些片段。
+
+列表页的结构是固定的：searchTable 表格中每个数据行有6个 <td>，
+第2列的 <a id=...> 是试验ID，用正则表达式直接提取，不构建DOM树。
+解析结果会经过校验（行数与分页信息一致、ID和登记号不为空），
+校验失败时返回None，由调用方使用BeautifulSoup解析。
+"""
+
+import re
+import html
+
+# 分页信息，例如"当前第 <i>1</i> 页，共 <i>3</i> 页，共 <i>54</i> 条记录"
+PAGE_INFO_RE = re.compile(
+    r'当前第\s*(?:<i>)?\s*(\d+)\s*(?:</i>)?\s*页\s*[，,]\s*'
+    r'共\s*(?:<i>)?\s*(\d+)\s*(?:</i>)?\s*页\s*[，,]\s*'
+    r'共\s*(?:<i>)?\s*(\d+)\s*(?:</i>)?\s*条记录'
+)
+# 只有部分分页信息时分别查找
+CURRENT_PAGE_RE = re.compile(r'当前第\s*(?:<i>)?\s*(\d+)')
+TOTAL_PAGES_RE = re.compile(r'共\s*(?:<i>)?\s*(\d+)\s*(?:</i>)?\s*页')
+TOTAL_RECORDS_RE = re.compile(r'共\s*(?:<i>)?\s*(\d+)\s*(?:</i>)?\s*条记录')
+
+# 列表页中需要解析的区域：名称 -> (开始标记, 结束标记)
+LIST_REGIONS = {
+    "searchTable": ('class="searchTable"', '</table>'),
+    "pageInfo": ('pageInfo', '</div>'),
+    "pagination": ('class="pagination"', '</ul>'),
+}
+# 详细信息页的部分标题，每个部分到下一个部分标题为止
+DETAIL_PART_TITLE_RE = r'<div[^>]*searchDetailPartTit[^>]*>[^<]*'
+DETAIL_PART_TITLE = 'searchDetailPartTit'
+
+ROW_RE = re.compile(r'<tr\b([^>]*)>(.*?)</tr>', re.S | re.I)
+CELL_RE = re.compile(r'<td\b[^>]*>(.*?)</td>', re.S | re.I)
+ANCHOR_RE = re.compile(r'<a\b([^>]*)>(.*?)</a>', re.S | re.I)
+ID_RE = re.compile(r'\bid="([^"]*)"')
+TAG_RE = re.compile(r'<[^>]+>')
+ROW_START_RE = re.compile(r'<tr\b', re.I)
+
+
+def slice_region(html_content, start_marker, end_marker):
+    """
+    截取从包含 start_marker 的标签开始、到其后第一个 end_marker 为止的片段，找不到时返回None
+    """
+    start = html_content.find(start_marker)
+    if start < 0:
+        return None
+    begin = html_content.rfind('<', 0, start)
+    end = html_content.find(end_marker, start)
+    if begin < 0 or end < 0:
+        return None
+    return html_content[begin:end + len(end_marker)]
+
+
+def slice_list_regions(html_content, names=("searchTable", "pageInfo", "pagination")):
+    """
+    截取列表页中的指定区域，返回 {名称: 片段}，找不到的区域不在结果中
+    """
+    regions = {}
+    for name in names:
+        fragment = slice_region(html_content, *LIST_REGIONS[name])
+        if fragment is not None:
+            regions[name] = fragment
+    return regions
+
+
+def slice_detail_part(html_content, keyword):
+    """
+    截取详细信息页中标题包含 keyword 的部分（到下一个部分标题为止），找不到时返回None
+    """
+    match = re.search(DETAIL_PART_TITLE_RE + re.escape(keyword), html_content)
+    if not match:
+        return None
+    end = html_content.find(DETAIL_PART_TITLE, match.end())
+    if end < 0:
+        return html_content[match.start():]
+    return html_content[match.start():html_content.rfind('<', 0, end)]
+
+
+def slice_researcher_section(html_content):
+    """
+    截取详细信息页中的研究者信息部分（主要研究者和各参加机构的表格），找不到时返回None
+    """
+    return slice_detail_part(html_content, '研究者信息')
+
+
+def parse_page_info(html_content):
+    """
+    从分页信息中提取 (当前页, 总页数, 总记录数)，无法确定的项为None
+    """
+    if not html_content:
+        return None, None, None
+    html_content = slice_region(html_content, *LIST_REGIONS["pageInfo"]) or html_content
+    match = PAGE_INFO_RE.search(html_content)
+    if match:
+        return tuple(int(value) for value in match.groups())
+    values = []
+    for pattern in (CURRENT_PAGE_RE, TOTAL_PAGES_RE, TOTAL_RECORDS_RE):
+        match = pattern.search(html_content)
+        values.append(int(match.group(1)) if match else None)
+    return tuple(values)
+
+
+def _text(fragment):
+    """
+    单元格文本：去掉标签、还原实体，与BeautifulSoup的 .text.strip() 一致
+    """
+    return html.unescape(TAG_RE.sub('', fragment)).strip()
+
+
+def parse_list_rows(html_content):
+    """
+    用正则表达式提取列表页的数据行，返回
+    [(序号, 登记号, 试验状态, 药物名称, 适应症, 试验通俗题目, 试验ID), ...]
+
+    页面结构与预期不符或结果未通过校验时返回None。
+    """
+    table = slice_region(html_content, *LIST_REGIONS["searchTable"])
+    if table is None:
+        return None
+
+    rows = []
+    tr_count = 0
+    for match in ROW_RE.finditer(table):
+        tr_count += 1
+        cells = CELL_RE.findall(match.group(2))
+        if not cells:
+            # 标题行（只有 <th>）
+            continue
+        if len(cells) < 6:
+            return None
+
+        anchors = []
+        for cell in cells[1:6]:
+            anchor = ANCHOR_RE.search(cell)
+            anchors.append(anchor)
+        if anchors[0] is None:
+            return None
+        trial_id = ID_RE.search(anchors[0].group(1))
+        row = (_text(cells[0]),) + tuple(_text(a.group(2)) if a else '' for a in anchors) + (trial_id.group(1) if trial_id else '',)
+        if not row[1] or not row[6]:
+            return None
+        rows.append(row)
+
+    # 每个 <tr> 都应被匹配到（没有嵌套或未闭合的行）
+    if tr_count != len(ROW_START_RE.findall(table)):
+        return None
+
+    if not _consistent(rows, parse_page_info(html_content)):
+        return None
+    return rows
+
+
+def _consistent(rows, page_info):
+    """
+    行数是否与分页信息一致：非最后一页是满页，只有一页时行数等于总记录数
+    """
+    current, total_pages, total_records = page_info
+    if current is None or total_pages is None or total_records is None:
+        # 没有分页信息时（例如暂无数据）只接受空结果
+        return not rows
+    count = len(rows)
+    if total_records == 0:
+        return count == 0
+    if count == 0 or count > total_records:
+        return False
+    if total_pages == 1:
+        return count == total_records
+    if current < total_pages:
+        return (total_pages - 1) * count < total_records <= total_pages * count
+    return True
+
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import re
+import logging
+from chinadrugtrials_pack import LIST_ENDPOINT
+
+# 登记号格式，例如 CTR20251739
+REG_NO_PATTERN = re.compile(r'^CTR\d{8}$', re.IGNORECASE)
+
+
+def merge_trials(trial_lists):
+    """
+    合并多个搜索结果并去重（按试验ID，没有ID时按登记号）
+    """
+    merged = []
+    seen = set()
+    for trials in trial_lists:
+        for trial in trials:
+            key = trial.get('试验ID') or trial.get('登记号')
+            if key in seen:
+                continue
+            seen.add(key)
+            merged.append(trial)
+    return merged
+
+
+class SearchStrategy:
+    """
+    搜索策略：由一个或多个服务端搜索组成，结果合并去重后再进行客户端过滤
+    """
+    def __init__(self, name, searches, exact, description=""):
+        """
+        参数:
+            name: 策略名称
+            searches: 服务端搜索参数列表，每项为传给 search_all_pages 的参数字典
+            exact: 结果是否与"宽泛搜索 + 客户端过滤"完全一致
+            description: 策略说明
+        """
+        self.name = name
+        self.searches = searches
+        self.exact = exact
+        self.description = description
+        # 第一页探测结果: 搜索序号 -> (HTML内容, 总记录数)
+        self.probes = {}
+
+    def estimated_pages(self, page_size):
+        """
+        根据第一页的"共 N 条记录"估算每个搜索的页数，未探测或无法确定时为None
+        """
+        pages = []
+        for index in range(len(self.searches)):
+            probe = self.probes.get(index)
+            if probe is None or probe[1] is None:
+                pages.append(None)
+            else:
+                # 没有记录时仍需请求第一页
+                pages.append(max(1, (probe[1] + page_size - 1) // page_size))
+        return pages
+
+    def estimated_requests(self, page_size):
+        """
+        估算执行该策略所需的请求总数（包含第一页探测请求），无法确定时为None
+        """
+        pages = self.estimated_pages(page_size)
+        if any(p is None for p in pages):
+            return None
+        return sum(pages)
+
+
+class QueryPlanner:
+    """
+    查询规划器：在安全的情况下把客户端过滤关键词下推为服务端搜索参数
+    """
+    def __init__(self, searcher):
+        self.searcher = searcher
+
+    def build_strategies(self, keywords, filter_keywords, indication="", reg_no="", state="进行中", drugs_name="", ckm_index="1"):
+        """
+        构建候选策略
+
+        客户端过滤对试验的所有字段做"任一关键词包含"匹配，因此:
+            - 登记号形式的关键词下推到 reg_no 参数，结果与客户端过滤一致
+            - 其他关键词下推到 indication 参数，只能匹配适应症字段，属于近似下推
+        下推后的结果仍会再做一次客户端过滤。
+        """
+        base = {
+            "keywords": keywords,
+            "indication": indication,
+            "reg_no": reg_no,
+            "state": state,
+            "drugs_name": drugs_name,
+            "ckm_index": ckm_index,
+        }
+        strategies = [SearchStrategy("client", [base], True, "宽泛搜索所有页面后在客户端过滤")]
+
+        if not filter_keywords:
+            return strategies
+
+        searches = []
+        fields = []
+        exact = True
+        for keyword in filter_keywords:
+            params = dict(base)
+            if REG_NO_PATTERN.match(keyword) and not reg_no:
+                params["reg_no"] = keyword.upper()
+                fields.append(f"reg_no={params['reg_no']}")
+            elif not indication:
+                params["indication"] = keyword
+                fields.append(f"indication={keyword}")
+                exact = False
+            else:
+                # 该字段已被用户指定，无法下推
+                logging.info(f"过滤关键词 {keyword} 无法下推为服务端参数")
+                return strategies
+            searches.append(params)
+
+        description = f"按过滤关键词拆分为 {len(searches)} 个服务端搜索（{', '.join(fields)}），合并去重"
+        if not exact:
+            description += "；仅能匹配适应症字段"
+        strategies.append(SearchStrategy("pushdown", searches, exact, description))
+        return strategies
+
+    def probe(self, strategy, use_local_file=False):
+        """
+        获取策略中每个搜索的第一页，记录总记录数，结果在执行时复用
+
+        use_local_file 为True时先使用包文件或本地保存的第一页（与 search_all_pages 相同），
+        找不到时才从网站获取。
+        """
+        for index, params in enumerate(strategy.searches):
+            if index in strategy.probes:
+                continue
+            html_content = None
+            if use_local_file:
+                html_content = self.searcher.load_page(LIST_ENDPOINT, self.searcher.list_payload(
+                    params["keywords"], 1, params["indication"], params["reg_no"], params["state"], params["drugs_name"]
+                ), "response_page_1.html")
+            if not html_content:
+                if not self.searcher.has_budget():
+                    logging.warning(f"时间预算不足，停止探测策略 {strategy.name}")
+                    return
+                html_content = self.searcher.search(
+                    params["keywords"], 1, params["indication"], params["reg_no"],
+                    params["state"], params["drugs_name"], params["ckm_index"]
+                )
+            total_records = self.searcher.get_total_records(html_content)
+            strategy.probes[index] = (html_content, total_records)
+            logging.info(f"策略 {strategy.name} 第 {index + 1} 个搜索共 {total_records} 条记录")
+
+    def choose(self, strategies, allow_approximate=False, use_local_file=False):
+        """
+        选择请求数最少的可用策略
+
+        参数:
+            strategies: 候选策略列表（第一个为客户端过滤策略）
+            allow_approximate: 是否允许近似下推
+            use_local_file: 使用本地文件时只能使用客户端过滤策略
+        """
+        if use_local_file:
+            return strategies[0]
+
+        candidates = [s for s in strategies if s.exact or allow_approximate]
+        if len(candidates) == 1:
+            return candidates[0]
+
+        # 登记号下推总是比宽泛搜索更窄，无需探测
+        pushdown = candidates[-1]
+        if pushdown.exact and not allow_approximate:
+            return pushdown
+
+        for strategy in candidates:
+            self.probe(strategy)
+
+        page_size = self.searcher.page_size
+        best = None
+        for strategy in candidates:
+            requests_needed = strategy.estimated_requests(page_size)
+            if requests_needed is None:
+                continue
+            if best is None or requests_needed < best.estimated_requests(page_size):
+                best = strategy
+
+        return best or strategies[0]
+
+    def format_plan(self, strategies):
+        """
+        将各策略的估算结果格式化为文本
+        """
+        page_size = self.searcher.page_size
+        lines = ["查询计划:"]
+        for strategy in strategies:
+            requests_needed = strategy.estimated_requests(page_size)
+            lines.append(f"- 策略 {strategy.name}（{'精确' if strategy.exact else '近似'}）: {strategy.description}")
+            for index, params in enumerate(strategy.searches):
+                probe = strategy.probes.get(index)
+                total_records = probe[1] if probe else None
+                pages = strategy.estimated_pages(page_size)[index]
+                lines.append(
+                    f"    搜索 {index + 1}: 关键词={params['keywords']}, 适应症={params['indication']}, "
+                    f"登记号={params['reg_no']}, 状态={params['state']}, 药物名称={params['drugs_name']} -> "
+                    f"记录数={'未知' if total_records is None else total_records}, "
+                    f"预计页数={'未知' if pages is None else pages}"
+                )
+            lines.append(f"    预计请求数: {'未知' if requests_needed is None else requests_needed}")
+        return "\n".join(lines)
+
+    def execute(self, strategy, filter_keywords=None, max_pages=None, use_local_file=False, auto_all_pages=True, limit=None):
+        """
+        执行策略：依次运行每个搜索，合并去重后返回结果
+
+        参数:
+            limit: 最多返回的临床试验数，合并结果达到后不再执行剩余搜索
+        """
+        results = []
+        merged = []
+        for index, params in enumerate(strategy.searches):
+            if limit and len(merged) >= limit:
+                logging.info(f"已收集到 {limit} 个临床试验，跳过剩余搜索")
+                break
+
+            probe = strategy.probes.get(index)
+            trials = self.searcher.search_all_pages(
+                params["keywords"],
+                filter_keywords,
+                max_pages,
+                params["indication"],
+                params["reg_no"],
+                params["state"],
+                params["drugs_name"],
+                params["ckm_index"],
+                use_local_file,
+                auto_all_pages,
+                first_page_html=probe[0] if probe else None,
+                limit=limit - len(merged) if limit else None,
+            )
+            results.append(trials)
+            merged = merge_trials(results)
+
+        if limit:
+            merged = merged[:limit]
+        if len(strategy.searches) > 1:
+            logging.info(f"策略 {strategy.name} 合并去重后共 {len(merged)} 个临床试验")
+        return merged
+
+    def search(self, keywords, filter_keywords=None, max_pages=None, indication="", reg_no="", state="进行中", drugs_name="", ckm_index="1", use_local_file=False, auto_all_pages=True, allow_approximate=False, limit=None):
+        """
+        规划并执行搜索，参数与 search_all_pages 一致
+
+        参数:
+            allow_approximate: 是否允许把过滤关键词近似下推为适应症搜索
+            limit: 最多返回的临床试验数
+        """
+        strategies = self.build_strategies(keywords, filter_keywords, indication, reg_no, state, drugs_name, ckm_index)
+        strategy = self.choose(strategies, allow_approximate, use_local_file)
+        logging.info(f"使用搜索策略: {strategy.name}（{strategy.description}）")
+        return self.execute(strategy, filter_keywords, max_pages, use_local_file, auto_all_pages, limit)
+
+    def dry_run(self, keywords, filter_keywords=None, indication="", reg_no="", state="进行中", drugs_name="", ckm_index="1", use_local_file=False):
+        """
+        只获取每个策略的第一页，返回查询计划文本
+
+        参数:
+            use_local_file: 优先使用包文件或本地保存的第一页
+        """
+        strategies = self.build_strategies(keywords, filter_keywords, indication, reg_no, state, drugs_name, ckm_index)
+        for strategy in strategies:
+            self.probe(strategy, use_local_file)
+        return self.format_plan(strategies)
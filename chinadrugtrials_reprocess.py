@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+离线重新解析本地保存的原始页面（不访问网站）
+
+解析器改进后，用包文件（output/pages.pack）中每个请求的最新页面，以及本地保存的
+列表页（response_page_*.html、temp_response_page_*.html）和详细信息页
+（trial_detail_*.html）重新生成结构化输出和报告：
+
+    python chinadrugtrials_reprocess.py
+    python chinadrugtrials_reprocess.py --workers 8 --chunk-size 100
+    python chinadrugtrials_reprocess.py --restart
+
+页面按块分给多个进程解析。每完成一块，进度写入状态文件（默认为
+output/reprocess_state.json），运行被中断后再次执行会跳过已处理的文件
+（过滤关键词与上次不同时重新开始）；全部处理完后生成报告，下一次执行重新开始。
+同一试验有多个详细信息页（例如 --debug 时HTML文件和包文件中各有一份）时只解析最新获取的页面。
+"""
+
+import os
+import sys
+import glob
+import json
+import logging
+import datetime
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from chinadrugtrials_extract import format_trials_markdown
+from chinadrugtrials_detail_extractor_v1 import ChinaDrugTrialsDetailExtractor
+from chinadrugtrials_pack import PackStore, LIST_ENDPOINT, DETAIL_ENDPOINT, default_pack_file
+from chinadrugtrials_store import write_atomic
+
+# 本地保存的原始页面
+LIST_PATTERNS = ("response_page_*.html", "temp_response_page_*.html")
+DETAIL_PATTERNS = ("trial_detail_*.html",)
+
+# 包文件中的页面用 "pack:偏移:长度:标志:获取时间（毫秒）:试验ID" 表示
+PACK_PREFIX = "pack:"
+
+# 工作进程中的解析器和包文件（由 _init_worker 创建）
+_extractor = None
+_pages = None
+_trials_by_id = {}
+
+
+def find_pages(patterns, directories):
+    """
+    在各目录中查找匹配的页面文件
+    """
+    files = set()
+    for directory in directories:
+        for pattern in patterns:
+            files.update(os.path.abspath(f) for f in glob.glob(os.path.join(directory, pattern)))
+    return sorted(files)
+
+
+def find_packed(pages, endpoint):
+    """
+    包文件中某个接口的页面（每个请求的最新版本）
+    """
+    if pages is None:
+        return []
+    return [f"{PACK_PREFIX}{entry.offset}:{entry.length}:{entry.flags}:{entry.fetched}:{entry.payload.get('id', '') if isinstance(entry.payload, dict) else ''}"
+            for entry in pages.entries(endpoint)]
+
+
+def page_time(filename):
+    """
+    页面的获取时间（秒）：包文件中的页面为记录的获取时间，HTML文件为修改时间
+    """
+    if filename.startswith(PACK_PREFIX):
+        return int(filename[len(PACK_PREFIX):].split(':')[3]) / 1000
+    return os.path.getmtime(filename)
+
+
+def by_time(filenames):
+    """
+    按获取时间排序（较新的页面在后，覆盖较旧的结果）；时间相同时保持原顺序
+    """
+    return sorted(filenames, key=page_time)
+
+
+def latest_per_trial(filenames):
+    """
+    同一试验ID有多个详细信息页时只保留最新获取的一个（时间相同时保留靠后的，即包文件中的页面）
+    """
+    latest = {}
+    for filename in by_time(filenames):
+        latest[_trial_id(filename)] = filename
+    return list(latest.values())
+
+
+def file_signature(filename):
+    """
+    文件的 [大小, 修改时间]，文件变化后需要重新处理（包文件中的页面不会变化）
+    """
+    if filename.startswith(PACK_PREFIX):
+        return [int(value) for value in filename[len(PACK_PREFIX):].split(':')[:2]]
+    stat = os.stat(filename)
+    return [stat.st_size, int(stat.st_mtime)]
+
+
+def chunked(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class ReprocessState:
+    """
+    重新解析的进度：已处理的文件 -> {signature, 结果}，每完成一块写回状态文件
+
+    列表页的结果与过滤关键词有关，过滤关键词记录在状态文件中，与上次不同时重新开始。
+    """
+    def __init__(self, state_file, restart=False, filter_keywords=None):
+        self.state_file = state_file
+        self.filter = sorted(filter_keywords or [])
+        self.files = {}
+        if not restart and os.path.exists(state_file):
+            try:
+                with open(state_file, 'r', encoding='utf-8') as f:
+                    state = json.load(f)
+                if not state.get('completed'):
+                    if state.get('filter', []) != self.filter:
+                        logging.info(f"过滤关键词与上次未完成的重新解析不同（{', '.join(state.get('filter', [])) or '无'}），重新开始")
+                    else:
+                        self.files = state.get('files', {})
+                        logging.info(f"继续上次的重新解析（已处理 {len(self.files)} 个文件）")
+            except (OSError, ValueError) as e:
+                logging.warning(f"读取状态文件 {state_file} 失败: {e}，重新开始")
+
+    def pending(self, filenames):
+        """
+        尚未处理或处理后有变化的文件
+        """
+        return [f for f in filenames
+                if f not in self.files or self.files[f]['signature'] != file_signature(f)]
+
+    def update(self, results):
+        for filename, result in results:
+            self.files[filename] = {'signature': file_signature(filename), 'result': result}
+        self.save()
+
+    def result(self, filename):
+        entry = self.files.get(filename)
+        return entry['result'] if entry else None
+
+    def save(self, completed=False):
+        """
+        写回状态文件（先写临时文件再替换，避免中断时损坏）
+        """
+        directory = os.path.dirname(self.state_file)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        temp_file = f"{self.state_file}.tmp"
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump({'completed': completed, 'filter': self.filter, 'files': self.files}, f, ensure_ascii=False)
+        os.replace(temp_file, self.state_file)
+
+
+def _init_worker(trials_by_id, detail_dir, pack_file):
+    """
+    工作进程初始化：创建不访问网站的解析器，以只读方式打开包文件，工作进程不输出解析日志
+    """
+    global _extractor, _pages, _trials_by_id
+    logging.disable(logging.INFO)
+    _extractor = ChinaDrugTrialsDetailExtractor(save_raw=False)
+    _extractor.output_dir = detail_dir
+    _pages = PackStore(pack_file, readonly=True) if pack_file else None
+    _trials_by_id = trials_by_id
+
+
+def _read(filename):
+    if filename.startswith(PACK_PREFIX):
+        offset, length, flags, _ = filename[len(PACK_PREFIX):].split(':', 3)
+        return str(_pages.view(int(offset), int(length), int(flags)), 'utf-8')
+    with open(filename, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def _trial_id(filename):
+    if filename.startswith(PACK_PREFIX):
+        return filename.split(':', 5)[5]
+    return os.path.basename(filename)[len("trial_detail_"):-len(".html")]
+
+
+def _extract_lists(filenames, filter_keywords):
+    """
+    解析一块列表页，返回 [(文件名, 试验列表), ...]
+    """
+    return [(filename, _extractor.extract_trials_from_table(_read(filename), filter_keywords))
+            for filename in filenames]
+
+
+def _trial_from_detail(trial_id, detail):
+    """
+    没有对应的列表页时，用详细信息页中的字段构造试验基本信息
+    """
+    record = detail.record
+    return {'登记号': record.reg_no, '试验状态': record.trial_status, '药物名称': record.drug_name,
+            '适应症': record.indication, '试验通俗题目': record.public_title or record.title, '试验ID': trial_id}
+
+
+def _extract_details(filenames, detail_dir):
+    """
+    解析一块详细信息页并写入 {登记号}_detail.md，返回 [(文件名, 试验基本信息或None), ...]
+    """
+    results = []
+    for filename in filenames:
+        trial_id = _trial_id(filename)
+        detail = _extractor.extract_trial_detail(_read(filename))
+        if not detail:
+            results.append((filename, None))
+            continue
+        trial = _trials_by_id.get(trial_id) or _trial_from_detail(trial_id, detail)
+        if not trial.get('登记号'):
+            results.append((filename, None))
+            continue
+        markdown = _extractor.format_detail_markdown(trial, detail)
+        write_atomic(os.path.join(detail_dir, f"{trial['登记号']}_detail.md"), markdown)
+        results.append((filename, trial))
+    return results
+
+
+def run_chunks(executor, func, filenames, chunk_size, state, *args):
+    """
+    把文件按块分给工作进程，每完成一块更新状态文件
+    """
+    futures = [executor.submit(func, chunk, *args) for chunk in chunked(filenames, chunk_size)]
+    done = 0
+    for future in as_completed(futures):
+        results = future.result()
+        state.update(results)
+        done += len(results)
+        logging.info(f"已处理 {done}/{len(filenames)} 个文件")
+
+
+def write_details_summary(trials, detail_dir):
+    """
+    把各试验的详细信息文件合并为 trials_summary.md（格式与在线获取时相同）
+    """
+    summary_file = os.path.join(detail_dir, "trials_summary.md")
+    with open(summary_file, 'w', encoding='utf-8') as f:
+        f.write("# 临床试验详细信息汇总\n\n")
+        f.write("## 目录\n\n")
+        for trial in trials:
+            f.write(f"- [{trial['试验通俗题目']}](#{trial['登记号']})\n")
+        f.write("\n---\n\n")
+        f.write("# 详细信息\n\n")
+        for trial in trials:
+            with open(os.path.join(detail_dir, f"{trial['登记号']}_detail.md"), 'r', encoding='utf-8') as source:
+                f.write(f"<a id='{trial['登记号']}'></a>\n\n")
+                f.write(source.read())
+                f.write("\n---\n\n")
+    return summary_file
+
+
+def reprocess(directories, output_dir, detail_dir, state_file, workers=None, chunk_size=50,
+              filter_keywords=None, label="reprocess", comprehensive=False, restart=False, pack_file=None):
+    """
+    重新解析本地保存的页面并生成输出，返回 (试验列表, 有详细信息的试验列表)
+
+    pack_file 为None或不存在时只解析HTML文件。
+    """
+    for directory in (output_dir, detail_dir):
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+    if pack_file and not os.path.exists(pack_file):
+        pack_file = None
+    pages = PackStore(pack_file, readonly=True) if pack_file else None
+
+    state = ReprocessState(state_file, restart, filter_keywords)
+    # 同一试验以较新的结果为准：列表页按获取时间合并，详细信息页在分块之前只保留每个试验最新的页面
+    # （各块并行完成，不能依赖完成顺序）
+    list_files = by_time(find_pages(LIST_PATTERNS, directories) + find_packed(pages, LIST_ENDPOINT))
+    detail_files = latest_per_trial(find_pages(DETAIL_PATTERNS, directories) + find_packed(pages, DETAIL_ENDPOINT))
+    logging.info(f"找到 {len(list_files)} 个列表页、{len(detail_files)} 个详细信息页")
+
+    # 先解析列表页，详细信息页需要列表页中的试验基本信息
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=({}, detail_dir, pack_file)) as executor:
+        run_chunks(executor, _extract_lists, state.pending(list_files), chunk_size, state, filter_keywords)
+
+    trials_by_reg_no = {}
+    for filename in list_files:
+        for trial in state.result(filename) or []:
+            trials_by_reg_no[trial['登记号']] = trial
+    trials = list(trials_by_reg_no.values())
+    trials_by_id = {trial['试验ID']: trial for trial in trials if trial.get('试验ID')}
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(trials_by_id, detail_dir, pack_file)) as executor:
+        run_chunks(executor, _extract_details, state.pending(detail_files), chunk_size, state, detail_dir)
+
+    detailed = {}
+    for filename in detail_files:
+        trial = state.result(filename)
+        if trial:
+            detailed[trial['登记号']] = trial
+    # 有过滤关键词时只输出列表页中保留的试验
+    if filter_keywords:
+        detailed = {reg_no: trial for reg_no, trial in detailed.items() if reg_no in trials_by_reg_no}
+    detailed = list(detailed.values())
+
+    # 生成报告
+    today = datetime.datetime.now().strftime('%Y%m%d')
+    output_file = os.path.join(output_dir, f"{today}_{label}.md")
+    with open(output_file, 'w', encoding='utf-8') as f:
+        f.write(format_trials_markdown(trials))
+    logging.info(f"已生成试验列表: {output_file}")
+
+    summary_file = write_details_summary(detailed, detail_dir)
+    logging.info(f"已生成汇总文件: {summary_file}")
+
+    if comprehensive:
+        extractor = ChinaDrugTrialsDetailExtractor(save_raw=False)
+        extractor.pages = pages
+        comprehensive_file = extractor.create_comprehensive_summary(trials or detailed, detail_dir, label, filter_keywords)
+        logging.info(f"已生成综合汇总报告: {comprehensive_file}")
+
+    state.save(completed=True)
+    return trials, detailed
+
+
+def main():
+    """
+    主函数
+    """
+    parser = argparse.ArgumentParser(description='离线重新解析本地保存的原始页面，重新生成结构化输出和报告（不访问网站）')
+    parser.add_argument('dirs', nargs='*', help='原始页面所在目录，默认为当前目录和output目录')
+    parser.add_argument('--detail-dir', help='详细信息输出目录，默认为output/details')
+    parser.add_argument('--state-file', help='进度状态文件，默认为output/reprocess_state.json')
+    parser.add_argument('--pack', help='原始页面包文件，默认为output/pages.pack')
+    parser.add_argument('-w', '--workers', type=int, help='工作进程数，默认为CPU核数')
+    parser.add_argument('--chunk-size', type=int, default=50, help='每块的文件数，默认为50')
+    parser.add_argument('-f', '--filter', nargs='+', default=[], help='过滤关键词，只保留匹配的试验')
+    parser.add_argument('--label', default="reprocess", help='报告文件名中的标签，默认为reprocess')
+    parser.add_argument('-c', '--comprehensive', action='store_true', help='生成综合汇总报告')
+    parser.add_argument('--restart', action='store_true', help='忽略上次未完成的进度，重新处理所有文件')
+
+    args = parser.parse_args()
+
+    output_dir = os.path.join(os.getcwd(), "output")
+    directories = args.dirs or [os.getcwd(), output_dir]
+    detail_dir = args.detail_dir or os.path.join(output_dir, "details")
+    state_file = args.state_file or os.path.join(output_dir, "reprocess_state.json")
+
+    trials, detailed = reprocess(directories, output_dir, detail_dir, state_file, args.workers, args.chunk_size,
+                                 args.filter, args.label, args.comprehensive, args.restart,
+                                 args.pack or default_pack_file())
+    if not trials and not detailed:
+        print("没有找到可以解析的本地页面")
+        sys.exit(1)
+    print(f"重新解析了 {len(trials)} 个试验的基本信息、{len(detailed)} 个试验的详细信息")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import re
+import json
+import hashlib
+import tempfile
+import logging
+import datetime
+import threading
+
+# 登记号，例如 CTR20251739
+REG_NO_RE = re.compile(r'CTR\d{8}', re.IGNORECASE)
+
+# 索引中保存的列表页字段（序号和详情URL与搜索有关或可以由试验ID推出，不保存）
+INDEX_FIELDS = ('试验ID', '试验状态', '药物名称', '适应症', '试验通俗题目')
+
+
+def default_index_file():
+    """
+    默认的登记号索引文件路径
+    """
+    return os.path.join(os.getcwd(), "output", "trial_index.json")
+
+
+def default_capabilities_file():
+    """
+    默认的网站能力探测结果文件路径
+    """
+    return os.path.join(os.getcwd(), "output", "capabilities.json")
+
+
+def default_render_cache_file():
+    """
+    默认的渲染缓存文件路径
+    """
+    return os.path.join(os.getcwd(), "output", "render_cache.json")
+
+
+def content_hash(data):
+    """
+    内容的哈希值（十六进制字符串），data 为字符串或字节串
+    """
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def write_atomic(filename, content):
+    """
+    写入文本文件（先写同目录下的临时文件再替换，读取方不会看到写了一半的文件）
+
+    临时文件名是唯一的，多个进程同时写同一个文件时不会互相覆盖临时文件，
+    最后完成替换的内容为准。
+    """
+    directory = os.path.dirname(filename)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory, exist_ok=True)
+    # 临时文件的权限是0600，替换后保持原文件的权限（新文件为0644）
+    try:
+        mode = os.stat(filename).st_mode & 0o777
+    except FileNotFoundError:
+        mode = 0o644
+    with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=directory or None,
+                                     prefix=f".{os.path.basename(filename)}.", suffix=".tmp", delete=False) as f:
+        temp_file = f.name
+        try:
+            f.write(content)
+        except BaseException:
+            f.close()
+            os.unlink(temp_file)
+            raise
+    os.chmod(temp_file, mode)
+    os.replace(temp_file, filename)
+
+
+def load_capabilities(filename):
+    """
+    读取能力探测结果，文件不存在或无法读取时返回None
+    """
+    if not filename or not os.path.exists(filename):
+        return None
+    try:
+        with open(filename, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logging.warning(f"读取能力探测结果 {filename} 失败: {e}")
+        return None
+
+
+def save_capabilities(filename, capabilities):
+    """
+    保存能力探测结果（先写临时文件再替换）
+    """
+    directory = os.path.dirname(filename)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+    temp_file = f"{filename}.tmp"
+    with open(temp_file, 'w', encoding='utf-8') as f:
+        json.dump(capabilities, f, ensure_ascii=False, indent=1)
+    os.replace(temp_file, filename)
+
+
+def read_reg_nos(filename):
+    """
+    从文件中读取登记号（每行一个，或从表格导出的CSV等文本中查找），按出现顺序去重
+    """
+    with open(filename, 'r', encoding='utf-8-sig') as f:
+        content = f.read()
+
+    reg_nos = []
+    seen = set()
+    for match in REG_NO_RE.findall(content):
+        reg_no = match.upper()
+        if reg_no not in seen:
+            seen.add(reg_no)
+            reg_nos.append(reg_no)
+    return reg_nos
+
+
+class TrialIndex:
+    """
+    持久化的 登记号 -> 试验ID 索引
+
+    每次抓取列表页时记录出现的试验，按登记号获取详细信息时先查索引，
+    只有索引中没有的登记号才需要搜索。
+    """
+    def __init__(self, index_file=None):
+        """
+        参数:
+            index_file: 索引文件路径，为None时只保存在内存中
+        """
+        self.index_file = index_file
+        self.entries = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        if not self.index_file or not os.path.exists(self.index_file):
+            return
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+            logging.info(f"已加载登记号索引 {self.index_file}（{len(self.entries)} 个试验）")
+        except (OSError, ValueError) as e:
+            logging.warning(f"读取登记号索引 {self.index_file} 失败: {e}")
+            self.entries = {}
+
+    def save(self):
+        """
+        索引有变化时写回文件（先写临时文件再替换，避免中断时损坏索引）
+        """
+        if not self.index_file:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            directory = os.path.dirname(self.index_file)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            temp_file = f"{self.index_file}.tmp"
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f, ensure_ascii=False, indent=1)
+            os.replace(temp_file, self.index_file)
+            self._dirty = False
+
+    def add(self, trials):
+        """
+        记录列表页中的试验（需要同时有登记号和试验ID）
+        """
+        today = datetime.date.today().isoformat()
+        with self._lock:
+            for trial in trials:
+                reg_no = trial.get('登记号', '').upper()
+                if not reg_no or not trial.get('试验ID'):
+                    continue
+                entry = {key: trial.get(key, '') for key in INDEX_FIELDS}
+                known = self.entries.get(reg_no)
+                if known is None or any(known.get(key) != value for key, value in entry.items()):
+                    entry['更新日期'] = today
+                    self.entries[reg_no] = entry
+                    self._dirty = True
+
+    def get(self, reg_no):
+        """
+        返回登记号对应的试验（列表页字段字典，包含登记号），不在索引中时返回None
+        """
+        entry = self.entries.get(reg_no.upper())
+        if entry is None:
+            return None
+        trial = {'登记号': reg_no.upper()}
+        trial.update({key: value for key, value in entry.items() if key != '更新日期'})
+        return trial
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class RenderCache:
+    """
+    持久化的渲染缓存，使内容没有变化的试验不需要重新解析和渲染
+
+    每个试验记录渲染键（原始页面哈希、渲染器版本和渲染用到的列表页字段的哈希）
+    以及汇总时需要的片段（例如参加机构名称）；每个输出文件记录上次写入内容的哈希、
+    文件大小和修改时间，内容相同且文件没有被其他程序（离线重新解析、手工编辑）
+    修改过时不再写入。
+    """
+    def __init__(self, cache_file=None):
+        """
+        参数:
+            cache_file: 缓存文件路径，为None时只保存在内存中
+        """
+        self.cache_file = cache_file
+        self.trials = {}
+        self.files = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.trials = data.get('trials', {})
+            self.files = data.get('files', {})
+            logging.info(f"已加载渲染缓存 {self.cache_file}（{len(self.trials)} 个试验）")
+        except (OSError, ValueError, AttributeError) as e:
+            logging.warning(f"读取渲染缓存 {self.cache_file} 失败: {e}")
+            self.trials = {}
+            self.files = {}
+
+    def save(self):
+        """
+        缓存有变化时写回文件
+        """
+        if not self.cache_file:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            write_atomic(self.cache_file, json.dumps({'trials': self.trials, 'files': self.files}, ensure_ascii=False))
+            self._dirty = False
+
+    def fresh(self, reg_no, key, filename):
+        """
+        试验的输出文件是否已经是用同样的输入渲染的（渲染键相同，且文件仍是上次写入的内容）
+        """
+        entry = self.trials.get(reg_no)
+        return bool(key) and entry is not None and entry.get('key') == key and self._written(filename) is not None
+
+    def _written(self, filename):
+        """
+        文件仍是上次由本缓存写入的内容（大小和修改时间都没有变化）时返回写入内容的哈希，否则返回None
+        """
+        recorded = self.files.get(os.path.abspath(filename))
+        if not isinstance(recorded, list) or len(recorded) != 3:
+            return None
+        try:
+            stat = os.stat(filename)
+        except OSError:
+            return None
+        digest, size, mtime = recorded
+        if stat.st_size != size or stat.st_mtime_ns != mtime:
+            return None
+        return digest
+
+    def get(self, reg_no):
+        """
+        返回试验缓存的片段字典，不在缓存中时返回None
+        """
+        return self.trials.get(reg_no)
+
+    def put(self, reg_no, key, **fragments):
+        """
+        记录试验的渲染键和片段，key 为None时（无法计算渲染键）删除缓存的记录
+        """
+        with self._lock:
+            if key is None:
+                if self.trials.pop(reg_no, None) is not None:
+                    self._dirty = True
+                return
+            entry = dict(fragments, key=key)
+            if self.trials.get(reg_no) != entry:
+                self.trials[reg_no] = entry
+                self._dirty = True
+
+    def write(self, filename, content):
+        """
+        内容与上次写入的不同、文件不存在或已被其他程序修改时原子地写入文件，返回是否写入
+        """
+        digest = content_hash(content)
+        if self._written(filename) == digest:
+            return False
+        write_atomic(filename, content)
+        stat = os.stat(filename)
+        with self._lock:
+            self.files[os.path.abspath(filename)] = [digest, stat.st_size, stat.st_mtime_ns]
+            self._dirty = True
+        return True